@@ -1,4 +1,4 @@
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, BackgroundTasks, Request
 from fastapi.responses import Response as FastAPIResponse
 from sqlalchemy.orm import Session, joinedload
@@ -14,10 +14,11 @@ import json
 import time
 import base64
 import secrets
-from app.core.database import get_db, SessionLocal
+from app.core.database import get_db, get_read_db, ReadSessionLocal
 from app.core.config import settings
 from app.core.auth import validate_password_strength
 from app.core.domain_config import get_domain_config
+from app.core.layered_cache import get_layered_cache
 from app.schemas.common import ResponseBase
 from app.schemas.subscription import SubscriptionCreate
 from app.models.user import User
@@ -39,6 +40,7 @@ from app.services.package import PackageService
 from app.services.email_queue_processor import EmailQueueProcessor, get_email_queue_processor
 from app.services.logging import log_manager
 from app.services.config_update_service import ConfigUpdateService
+from app.services.subscription_payload import PAYLOAD_CLASH, PAYLOAD_V2RAY, publish_subscription_payload
 from app.utils.security import get_current_admin_user, get_password_hash, verify_password, generate_subscription_url, create_access_token
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -229,7 +231,7 @@ def get_users(
     keyword: str = Query("", description="关键词搜索（邮箱或用户名）"),
     status: str = Query("", description="状态筛选"),
     date_range: str = Query("", description="注册时间范围"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_admin = Depends(get_current_admin_user)
 ) -> Any:
     try:
@@ -304,7 +306,7 @@ def get_users(
         return ResponseBase(success=False, message=f"获取用户列表失败: {str(e)}")
 @router.get("/users/statistics", response_model=ResponseBase)
 def get_user_statistics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_admin = Depends(get_current_admin_user)
 ) -> Any:
     try:
@@ -425,7 +427,7 @@ def get_nodes_stats(
     current_admin = Depends(get_current_admin_user)
 ) -> Any:
     try:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         try:
             node_service = NodeService(db)
             stats = node_service.get_node_statistics()
@@ -671,8 +673,9 @@ def delete_device_admin(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
         result = db.execute(delete_device_query, {'device_id': device_id})
         if result.rowcount > 0:
-            subscription_service = SubscriptionService(db)
-            subscription_service.sync_current_devices(device.subscription_id)
+            if device.is_allowed:
+                subscription_service = SubscriptionService(db)
+                subscription_service.adjust_current_devices(device.subscription_id, -1)
             db.commit()
             return ResponseBase(message="设备删除成功")
         else:
@@ -698,8 +701,9 @@ def delete_user_device_admin(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在或不属于该用户")
         result = db.execute(delete_device_query, {'device_id': device_id})
         if result.rowcount > 0:
-            subscription_service = SubscriptionService(db)
-            subscription_service.sync_current_devices(device.subscription_id)
+            if device.is_allowed:
+                subscription_service = SubscriptionService(db)
+                subscription_service.adjust_current_devices(device.subscription_id, -1)
             db.commit()
             return ResponseBase(message="设备删除成功")
         else:
@@ -721,7 +725,7 @@ def clear_user_devices_admin(
             raise HTTPException(status_code=404, detail="用户没有订阅")
         delete_query = text("DELETE FROM devices WHERE subscription_id = :subscription_id")
         result = db.execute(delete_query, {"subscription_id": subscription.id})
-        subscription_service.sync_current_devices(subscription.id)
+        subscription.current_devices = 0
         db.commit()
         return ResponseBase(message=f"已清理 {result.rowcount} 个设备")
     except HTTPException:
@@ -870,7 +874,7 @@ def login_as_user(
 @router.get("/dashboard", response_model=ResponseBase)
 def get_admin_dashboard(
     current_admin = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> Any:
     try:
         user_service = UserService(db)
@@ -892,39 +896,43 @@ def get_admin_dashboard(
 @router.get("/stats", response_model=ResponseBase)
 def get_admin_stats(
     current_admin = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> Any:
     try:
-        user_service = UserService(db)
-        subscription_service = SubscriptionService(db)
-        order_service = OrderService(db)
-        total_users = user_service.count()
-        active_users = user_service.count_active_users()
-        new_today = user_service.count_recent_users(1)
-        total_subscriptions = subscription_service.count()
-        active_subscriptions = subscription_service.count_active()
-        expiring_soon = subscription_service.count_expiring_soon()
-        order_stats = order_service.get_order_stats()
-        return ResponseBase(data={
-            "totalUsers": total_users,
-            "activeUsers": active_users,
-            "newToday": new_today,
-            "totalSubscriptions": total_subscriptions,
-            "activeSubscriptions": active_subscriptions,
-            "expiringSoon": expiring_soon,
-            "totalOrders": order_stats["total_orders"],
-            "pendingOrders": order_stats["pending_orders"],
-            "paidOrders": order_stats["paid_orders"],
-            "totalRevenue": order_stats["total_revenue"],
-            "todayOrders": order_stats["today_orders"],
-            "todayRevenue": order_stats["today_revenue"]
-        })
+        # 多个管理员同时刷新控制台时只统计一次
+        stats = get_layered_cache("admin_stats", ttl=30).get_or_load("overview", lambda: _build_admin_stats(db))
+        return ResponseBase(data=stats)
     except Exception as e:
         return _handle_error(e, "获取统计信息", db)
+def _build_admin_stats(db: Session) -> Dict[str, Any]:
+    user_service = UserService(db)
+    subscription_service = SubscriptionService(db)
+    order_service = OrderService(db)
+    total_users = user_service.count()
+    active_users = user_service.count_active_users()
+    new_today = user_service.count_recent_users(1)
+    total_subscriptions = subscription_service.count()
+    active_subscriptions = subscription_service.count_active()
+    expiring_soon = subscription_service.count_expiring_soon()
+    order_stats = order_service.get_order_stats()
+    return {
+        "totalUsers": total_users,
+        "activeUsers": active_users,
+        "newToday": new_today,
+        "totalSubscriptions": total_subscriptions,
+        "activeSubscriptions": active_subscriptions,
+        "expiringSoon": expiring_soon,
+        "totalOrders": order_stats["total_orders"],
+        "pendingOrders": order_stats["pending_orders"],
+        "paidOrders": order_stats["paid_orders"],
+        "totalRevenue": order_stats["total_revenue"],
+        "todayOrders": order_stats["today_orders"],
+        "todayRevenue": order_stats["today_revenue"]
+    }
 @router.get("/statistics", response_model=ResponseBase)
 def get_statistics(
     current_admin = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> Any:
     try:
         user_service = UserService(db)
@@ -1335,7 +1343,7 @@ def get_orders(
         return ResponseBase(success=False, message=f"获取订单列表失败: {str(e)}")
 @router.get("/orders/statistics", response_model=ResponseBase)
 def get_orders_statistics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_admin = Depends(get_current_admin_user)
 ) -> Any:
     try:
@@ -1689,6 +1697,7 @@ def save_clash_config(
             category='proxy', display_name='Clash配置',
             description='Clash代理配置文件', sort_order=1
         )
+        publish_subscription_payload(PAYLOAD_CLASH)
         return ResponseBase(message="Clash配置保存成功")
     except Exception as e:
         return _handle_error(e, "保存Clash配置", db)
@@ -1747,6 +1756,7 @@ def save_v2ray_config(
             category='proxy', display_name='V2Ray配置',
             description='V2Ray代理配置文件', sort_order=2
         )
+        publish_subscription_payload(PAYLOAD_V2RAY)
         return ResponseBase(message="V2Ray配置保存成功")
     except Exception as e:
         return _handle_error(e, "保存V2Ray配置", db)
@@ -2323,7 +2333,7 @@ def get_subscriptions(
         return ResponseBase(success=False, message=f"获取订阅列表失败: {str(e)}")
 @router.get("/subscriptions/statistics", response_model=ResponseBase)
 def get_subscriptions_statistics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_admin = Depends(get_current_admin_user)
 ) -> Any:
     try:
@@ -3881,7 +3891,7 @@ def regenerate_clash_config(
         service = ConfigUpdateService(db)
         if service.is_running():
             return ResponseBase(success=False, message="配置更新任务已在运行中")
-        background_tasks.add_task(service.run_update_task)
+        background_tasks.add_task(service.run_update_task, force=True)
         return ResponseBase(message="Clash配置重新生成任务已启动")
     except Exception as e:
         return ResponseBase(
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from app.core.database import get_db
@@ -41,8 +41,8 @@ def stop_config_update(db: Session = Depends(get_db), current_admin = Depends(ge
     return _service_operation("停止", lambda: get_config_update_service(db).stop_update_task())
 
 @router.get("/logs", response_model=ResponseBase)
-def get_update_logs(limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
-    return _service_operation("获取日志", lambda: get_config_update_service(db).get_logs(limit=limit))
+def get_update_logs(limit: int = Query(100, ge=1, le=1000), before_id: Optional[int] = Query(None, ge=1), db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
+    return _service_operation("获取日志", lambda: get_config_update_service(db).get_logs(limit=limit, before_id=before_id))
 
 @router.get("/config", response_model=ResponseBase)
 def get_update_config(db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
@@ -92,7 +92,8 @@ def stop_scheduled_task(db: Session = Depends(get_db), current_admin = Depends(g
 def clear_logs(db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
     try:
         service = get_config_update_service(db)
-        service.logs.clear()
+        service.clear_logs()
+        # 清理旧版本保存在 system_configs 中的日志
         from app.models.config import SystemConfig
         import json
         logs_record = db.query(SystemConfig).filter(SystemConfig.key == "config_update_logs").first()
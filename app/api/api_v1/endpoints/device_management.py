@@ -6,7 +6,7 @@ from app.core.database import get_db
 from app.utils.security import get_current_admin_user
 from app.utils.timezone import format_beijing_time
 from app.schemas.common import ResponseBase
-from app.services.device_manager import DeviceManager
+from app.services.device_manager import DeviceManager, invalidate_software_rules
 from app.services.subscription import SubscriptionService
 from app.api.api_v1.endpoints.common import handle_api_error
 import logging
@@ -102,8 +102,9 @@ def delete_device(device_id: int, db: Session = Depends(get_db), current_admin =
     result = db.execute(text("DELETE FROM devices WHERE id = :device_id"), {'device_id': device_id})
     if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
-    subscription_service = SubscriptionService(db)
-    subscription_service.sync_current_devices(subscription_id)
+    if was_allowed:
+        subscription_service = SubscriptionService(db)
+        subscription_service.adjust_current_devices(subscription_id, -1)
     logger.info(f"管理员删除设备: device_id={device_id}, subscription_id={subscription_id}, was_allowed={was_allowed}")
     db.commit()
     return ResponseBase(message="设备删除成功")
@@ -148,6 +149,12 @@ def get_software_rules(db: Session = Depends(get_db), current_admin = Depends(ge
     rules = device_manager.get_software_rules()
     return ResponseBase(data={'rules': rules})
 
+@router.post("/software-rules/reload", response_model=ResponseBase)
+@handle_api_error("重新加载软件识别规则")
+def reload_software_rules(current_admin = Depends(get_current_admin_user)) -> Any:
+    invalidate_software_rules()
+    return ResponseBase(message="软件识别规则将在下次识别设备时重新加载")
+
 @router.get("/access-logs", response_model=ResponseBase)
 @handle_api_error("获取访问日志")
 def get_access_logs(page: int = Query(1, ge=1), size: int = Query(20, ge=1, le=100), subscription_id: Optional[int] = Query(None), access_type: Optional[str] = Query(None), db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
@@ -173,11 +180,10 @@ def get_access_logs(page: int = Query(1, ge=1), size: int = Query(20, ge=1, le=1
 @handle_api_error("允许设备")
 def allow_device(device_id: int, db: Session = Depends(get_db), current_admin = Depends(get_current_admin_user)) -> Any:
     device_manager = DeviceManager(db)
-    device = db.execute(text("SELECT d.*, s.device_limit FROM devices d JOIN subscriptions s ON d.subscription_id = s.id WHERE d.id = :device_id"), {'device_id': device_id}).fetchone()
+    device = db.execute(text("SELECT d.*, s.device_limit, s.current_devices FROM devices d JOIN subscriptions s ON d.subscription_id = s.id WHERE d.id = :device_id"), {'device_id': device_id}).fetchone()
     if not device:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
-    allowed_count = db.execute(text("SELECT COUNT(*) FROM devices WHERE subscription_id = :subscription_id AND is_allowed = 1"), {'subscription_id': device.subscription_id}).scalar()
-    if allowed_count >= device.device_limit:
+    if (device.current_devices or 0) >= device.device_limit:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"订阅设备数量已达上限（{device.device_limit}个）")
     success = device_manager.update_device_status(device_id, {'is_allowed': True})
     if not success:
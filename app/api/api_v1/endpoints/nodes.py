@@ -47,8 +47,7 @@ def get_node(
 ) -> Any:
     node_service = NodeService(db)
     try:
-        nodes_data = node_service.get_nodes_from_clash_config()
-        node = next((n for n in nodes_data if n.get("id") == node_id), None)
+        node = node_service.get_node(node_id)
         if not node:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="节点不存在")
         return ResponseBase(data={"node": _extract_public_node_data(node)})
@@ -75,7 +74,7 @@ def get_nodes_stats(
 ) -> Any:
     node_service = NodeService(db)
     try:
-        stats = node_service.get_nodes_stats()
+        stats = node_service.get_node_statistics()
         return ResponseBase(data={
             "total_nodes": stats.get("total", 0),
             "online_nodes": stats.get("online", 0),
@@ -11,7 +11,7 @@ from app.core.database import get_db
 from app.core.domain_config import get_domain_config
 from app.utils.timezone import format_beijing_time
 from app.schemas.common import ResponseBase
-from app.services.subscription import SubscriptionService
+from app.services.subscription import SubscriptionService, CLASH_NOT_CONFIGURED_MSG, V2RAY_NOT_CONFIGURED_MSG
 from app.services.email import EmailService
 from app.services.device_manager import DeviceManager
 from app.utils.security import get_current_user, generate_subscription_url
@@ -82,6 +82,26 @@ def _send_reset_email(db, current_user, new_key, subscription_id, reason):
     except Exception as e:
         logger.error(f"发送用户重置订阅通知邮件失败: {e}", exc_info=True)
 
+_NO_CACHE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0"
+}
+
+def _build_payload_response(payload, request):
+    """下发预编译订阅内容：支持 ETag 条件请求和预压缩内容协商"""
+    headers = {
+        "Cache-Control": "no-cache",
+        "ETag": payload.etag,
+        "Vary": "Accept-Encoding"
+    }
+    if payload.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body, encoding = payload.negotiate(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="text/plain", headers=headers)
+
 def _record_device_access(subscription, request, db):
     user_agent = request.headers.get("user-agent", "")
     client_ip = request.client.host if request.client else "unknown"
@@ -230,7 +250,7 @@ def remove_device(
         if not subscription:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="用户没有订阅")
         device_query = text("""
-            SELECT id FROM devices 
+            SELECT id, is_allowed FROM devices 
             WHERE id = :device_id AND subscription_id = :subscription_id
         """)
         device = db.execute(device_query, {'device_id': device_id, 'subscription_id': subscription.id}).fetchone()
@@ -238,7 +258,9 @@ def remove_device(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在或无权限操作")
         result = db.execute(text("DELETE FROM devices WHERE id = :device_id"), {'device_id': device_id})
         if result.rowcount > 0:
-            subscription_service.sync_current_devices(subscription.id)
+            if device.is_allowed:
+                subscription_service.adjust_current_devices(subscription.id, -1)
+            db.commit()
             return ResponseBase(message="设备移除成功")
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
@@ -363,8 +385,8 @@ def clear_user_devices(
         devices = subscription_service.get_devices_by_subscription_id(subscription.id)
         for device in devices:
             subscription_service.db.delete(device)
+        subscription.current_devices = 0
         subscription_service.db.commit()
-        subscription_service.sync_current_devices(subscription.id)
         return ResponseBase(message="所有设备清理成功")
     except Exception as e:
         return ResponseBase(success=False, message=f"清理设备失败: {str(e)}")
@@ -392,15 +414,12 @@ def get_ssr_subscription_by_key(
             return Response(content=invalid_config, media_type="text/plain", status_code=403)
         if settings.DEBUG:
             logger.debug(f"订阅访问允许: {subscription_key}")
-        v2ray_config = subscription_service.get_v2ray_config()
+        v2ray_payload = subscription_service.get_v2ray_payload()
         if settings.DEBUG:
             logger.debug("返回V2Ray配置")
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
-        return Response(content=v2ray_config, media_type="text/plain", headers=headers)
+        if v2ray_payload:
+            return _build_payload_response(v2ray_payload, request)
+        return Response(content=V2RAY_NOT_CONFIGURED_MSG, media_type="text/plain", headers=_NO_CACHE_HEADERS)
     except Exception as e:
         logger.error(f"获取SSR订阅失败: {e}", exc_info=True)
         subscription_service = SubscriptionService(db)
@@ -429,14 +448,11 @@ def get_clash_subscription_by_key(
             invalid_config = subscription_service.get_invalid_clash_config()
             return Response(content=invalid_config, media_type="text/plain", status_code=403)
         logger.debug(f"订阅访问允许: {subscription_key}")
-        clash_config = subscription_service.get_clash_config()
+        clash_payload = subscription_service.get_clash_payload()
         logger.debug("返回Clash配置")
-        headers = {
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
-        return Response(content=clash_config, media_type="text/plain", headers=headers)
+        if clash_payload:
+            return _build_payload_response(clash_payload, request)
+        return Response(content=CLASH_NOT_CONFIGURED_MSG, media_type="text/plain", headers=_NO_CACHE_HEADERS)
     except Exception as e:
         logger.error(f"获取Clash订阅失败: {e}", exc_info=True)
         subscription_service = SubscriptionService(db)
@@ -1,55 +1,269 @@
 """Redis 缓存服务"""
-import json
+import collections
 import logging
-from typing import Any, Optional, Union
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 import redis
-from redis.exceptions import ConnectionError, TimeoutError
+from redis.exceptions import ConnectionError, TimeoutError, WatchError
 
+from app.core import cache_codecs
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+NAMESPACE_GENERATION_PREFIX = "cache:gen:"
+
+_MISSING = object()
+
+
+class CachePipeline:
+    """批量命令：命令先排队，退出 RedisCache.pipeline() 上下文时一次发送，结果按顺序保存在 results 中
+
+    Redis 不可用时命令被丢弃，results 为空列表。
+    """
+
+    def __init__(self, pipe=None):
+        self._pipe = pipe
+        self._decode_flags: List[bool] = []
+        self.results: List[Any] = []
+
+    def _queue(self, decode: bool):
+        self._decode_flags.append(decode)
+        return self
+
+    def get(self, key: str) -> "CachePipeline":
+        if self._pipe is not None:
+            self._pipe.get(key)
+        return self._queue(True)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> "CachePipeline":
+        if self._pipe is not None:
+            self._pipe.set(key, RedisCache.encode(value, key), ex=ttl or None)
+        return self._queue(False)
+
+    def delete(self, *keys: str) -> "CachePipeline":
+        if self._pipe is not None and keys:
+            self._pipe.delete(*keys)
+        return self._queue(False)
+
+    def expire(self, key: str, ttl: int) -> "CachePipeline":
+        if self._pipe is not None:
+            self._pipe.expire(key, ttl)
+        return self._queue(False)
+
+    def execute(self) -> List[Any]:
+        if self._pipe is None or not self._decode_flags:
+            return self.results
+        raw_results = self._pipe.execute()
+        self.results = [
+            RedisCache.decode(result) if decode and isinstance(result, bytes) else result
+            for decode, result in zip(self._decode_flags, raw_results)
+        ]
+        self._decode_flags = []
+        return self.results
+
+
+class CircuitBreaker:
+    """Redis 熔断器
+
+    closed：正常访问。连续 failure_threshold 次连接失败后进入 open：所有缓存操作直接按未命中处理，
+    不再尝试连接。open 期间由一个后台线程按指数退避（base_delay 起，翻倍，最多 max_delay 秒）探测，
+    探测成功进入 half_open；half_open 下只放行一次试探调用，其他调用仍直接跳过，
+    试探成功回到 closed，失败重新进入 open 并沿用之前的退避时间继续退避（回到 closed 后才重置）。
+    试探调用超过 trial_timeout 秒没有结果时允许下一次试探。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, probe: Callable[[], bool], failure_threshold: int = 2,
+                 base_delay: float = 1, max_delay: float = 60, trial_timeout: float = 15):
+        self.probe = probe
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.trial_timeout = trial_timeout
+        self.delay = base_delay
+        self._trial_started_at: Optional[float] = None
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self.last_error: Optional[str] = None
+        self.transitions = collections.deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        with self._lock:
+            if self.state != self.HALF_OPEN:
+                return self.state == self.CLOSED
+            now = time.monotonic()
+            if self._trial_started_at is not None and now - self._trial_started_at < self.trial_timeout:
+                return False
+            self._trial_started_at = now
+            return True
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.delay = self.base_delay
+                self._transition(self.CLOSED, "连接成功")
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._transition(self.OPEN, self.last_error)
+                self.opened_count += 1
+                self._start_probe()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened_count": self.opened_count,
+            "retry_delay": self.delay,
+            "last_error": self.last_error,
+            "transitions": list(self.transitions)
+        }
+
+    def _transition(self, state: str, reason: str):
+        previous, self.state = self.state, state
+        self._trial_started_at = None
+        self.transitions.append({"at": time.time(), "from": previous, "to": state, "reason": reason})
+        if state == self.OPEN:
+            logger.warning(f"Redis 熔断器打开（{previous} -> open），缓存操作将直接跳过: {reason}")
+        else:
+            logger.info(f"Redis 熔断器状态变化: {previous} -> {state}（{reason}）")
+
+    def _start_probe(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._probe_loop, daemon=True, name="RedisCircuitBreaker")
+        self._thread.start()
+
+    def _probe_loop(self):
+        while self.state == self.OPEN and not self._stop_event.wait(self.delay):
+            try:
+                healthy = self.probe()
+            except Exception:
+                healthy = False
+            if healthy:
+                with self._lock:
+                    if self.state == self.OPEN:
+                        self._transition(self.HALF_OPEN, "探测成功")
+                        # 试探失败重新打开时从更长的间隔开始
+                        self.delay = min(self.delay * 2, self.max_delay)
+                return
+            self.delay = min(self.delay * 2, self.max_delay)
+
 
 class RedisCache:
-    """Redis 缓存类"""
+    """Redis 缓存类
+
+    连接失败由熔断器（CircuitBreaker）管理：熔断期间 _get_client 直接返回 None，
+    缓存操作不再在每个请求中等待连接超时。
+    """
 
     def __init__(self):
         self._client: Optional[redis.Redis] = None
         self._connected = False
+        self.breaker = CircuitBreaker(
+            self._probe,
+            failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+            base_delay=settings.REDIS_BREAKER_BASE_DELAY,
+            max_delay=settings.REDIS_BREAKER_MAX_DELAY
+        )
+
+    @staticmethod
+    def _create_client() -> redis.Redis:
+        if settings.REDIS_BACKEND == "memory":
+            from app.core.memory_redis import get_memory_redis
+            return get_memory_redis()
+        return redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
+            db=settings.REDIS_DB,
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            retry_on_timeout=True,
+            health_check_interval=30
+        )
+
+    def _probe(self) -> bool:
+        """熔断器后台探测：用独立连接 PING 一次"""
+        client = self._create_client()
+        try:
+            return bool(client.ping())
+        finally:
+            client.close()
+
+    def _mark_failed(self, error: BaseException):
+        self._connected = False
+        self.breaker.record_failure(error)
 
     def _get_client(self) -> redis.Redis:
-        """获取 Redis 客户端（延迟连接）"""
+        """获取 Redis 客户端（延迟连接），熔断期间返回 None"""
+        if not self.breaker.allow():
+            return None
         if self._client is None or not self._connected:
             try:
                 # 记录连接参数（不记录密码）
                 logger.debug(f"尝试连接 Redis: {settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}")
                 
-                self._client = redis.Redis(
-                    host=settings.REDIS_HOST,
-                    port=settings.REDIS_PORT,
-                    password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-                    db=settings.REDIS_DB,
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5,
-                    retry_on_timeout=True,
-                    health_check_interval=30
-                )
+                self._client = self._create_client()
                 # 测试连接
                 self._client.ping()
                 self._connected = True
-                logger.info(f"Redis 连接成功: {settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}")
+                self.breaker.record_success()
+                if settings.REDIS_BACKEND == "memory":
+                    logger.info("使用进程内 Redis 替身（REDIS_BACKEND=memory），缓存只在本进程内共享")
+                else:
+                    logger.info(f"Redis 连接成功: {settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}")
             except (ConnectionError, TimeoutError) as e:
-                self._connected = False
+                self._mark_failed(e)
                 logger.warning(f"Redis 连接失败，将使用内存缓存: {type(e).__name__}: {e}")
                 return None
             except Exception as e:
-                self._connected = False
+                self._mark_failed(e)
                 logger.warning(f"Redis 连接异常，将使用内存缓存: {type(e).__name__}: {e}")
                 return None
         return self._client
 
+    @staticmethod
+    def encode(value: Any, key: Optional[str] = None) -> bytes:
+        """按键的命名空间编码（见 cache_codecs），默认字符串原样保存、其他值保存为 JSON"""
+        return cache_codecs.encode(value, key)
+
+    @staticmethod
+    def decode(value: bytes, default: Any = None) -> Any:
+        """解码缓存值，无法识别的格式（例如新版本写入的值）按未命中返回 default"""
+        try:
+            return cache_codecs.decode(value)
+        except (cache_codecs.UnsupportedFormat, UnicodeDecodeError, zlib.error) as e:
+            logger.debug(f"缓存值无法解码，按未命中处理: {e}")
+            return default
+
     def get(self, key: str, default: Any = None) -> Any:
         """获取缓存值"""
         client = self._get_client()
@@ -60,14 +274,10 @@ class RedisCache:
             value = client.get(key)
             if value is None:
                 return default
-
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return self.decode(value, default)
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 获取失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return default
         except Exception as e:
             logger.error(f"Redis 获取异常: {e}")
@@ -80,10 +290,7 @@ class RedisCache:
             return False
 
         try:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
-            elif not isinstance(value, str):
-                value = json.dumps(value, ensure_ascii=False)
+            value = self.encode(value, key)
 
             if ttl:
                 result = client.setex(key, ttl, value)
@@ -93,7 +300,7 @@ class RedisCache:
             return bool(result)
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 设置失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return False
         except Exception as e:
             logger.error(f"Redis 设置异常: {e}")
@@ -110,12 +317,134 @@ class RedisCache:
             return bool(result)
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 删除失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return False
         except Exception as e:
             logger.error(f"Redis 删除异常: {e}")
             return False
 
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """一次 MGET 读取多个键，只返回存在的键"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        client = self._get_client()
+        if client is None:
+            return {}
+
+        try:
+            values = client.mget(keys)
+            result = {}
+            for key, value in zip(keys, values):
+                if value is not None:
+                    value = self.decode(value, _MISSING)
+                    if value is not _MISSING:
+                        result[key] = value
+            return result
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 批量获取失败: {e}")
+            self._mark_failed(e)
+            return {}
+        except Exception as e:
+            logger.error(f"Redis 批量获取异常: {e}")
+            return {}
+
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """一次往返写入多个键（有 TTL 时用管道逐个 SET EX，否则用 MSET）"""
+        if not mapping:
+            return True
+        client = self._get_client()
+        if client is None:
+            return False
+
+        try:
+            if ttl:
+                pipe = client.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    pipe.set(key, self.encode(value, key), ex=ttl)
+                return all(pipe.execute())
+            return bool(client.mset({key: self.encode(value, key) for key, value in mapping.items()}))
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 批量设置失败: {e}")
+            self._mark_failed(e)
+            return False
+        except Exception as e:
+            logger.error(f"Redis 批量设置异常: {e}")
+            return False
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """一次删除多个键，返回删除的数量"""
+        keys = list(keys)
+        if not keys:
+            return 0
+        client = self._get_client()
+        if client is None:
+            return 0
+
+        try:
+            return int(client.delete(*keys))
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 批量删除失败: {e}")
+            self._mark_failed(e)
+            return 0
+        except Exception as e:
+            logger.error(f"Redis 批量删除异常: {e}")
+            return 0
+
+    @contextmanager
+    def pipeline(self, transaction: bool = False) -> Iterator[CachePipeline]:
+        """批量发送命令：
+
+            with redis_cache.pipeline() as pipe:
+                pipe.set("a", 1, ttl=60).get("b")
+            pipe.results
+
+        transaction=True 时用 MULTI/EXEC 原子执行。Redis 不可用时命令被丢弃。
+        """
+        client = self._get_client()
+        pipeline = CachePipeline(client.pipeline(transaction=transaction) if client is not None else None)
+        yield pipeline
+        try:
+            pipeline.execute()
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 管道执行失败: {e}")
+            self._mark_failed(e)
+        except Exception as e:
+            logger.error(f"Redis 管道执行异常: {e}")
+
+    def update(self, key: str, func: Callable[[Any], Any], ttl: Optional[int] = None,
+               default: Any = None, retries: int = 5) -> Any:
+        """读-改-写：WATCH 键后读取当前值，写入 func(当前值)；期间键被其他客户端修改时重试
+
+        返回写入的新值，Redis 不可用或重试用尽时返回 None。
+        """
+        client = self._get_client()
+        if client is None:
+            return None
+
+        try:
+            with client.pipeline(transaction=True) as pipe:
+                for _ in range(max(1, retries)):
+                    try:
+                        pipe.watch(key)
+                        current = pipe.get(key)
+                        value = func(self.decode(current, default) if current is not None else default)
+                        pipe.multi()
+                        pipe.set(key, self.encode(value, key), ex=ttl or None)
+                        pipe.execute()
+                        return value
+                    except WatchError:
+                        continue
+            logger.warning(f"Redis 读-改-写冲突过多，放弃更新: {key}")
+            return None
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 读-改-写失败: {e}")
+            self._mark_failed(e)
+            return None
+        except Exception as e:
+            logger.error(f"Redis 读-改-写异常: {e}")
+            return None
+
     def exists(self, key: str) -> bool:
         """检查键是否存在"""
         client = self._get_client()
@@ -126,7 +455,7 @@ class RedisCache:
             return bool(client.exists(key))
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 检查失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return False
         except Exception as e:
             logger.error(f"Redis 检查异常: {e}")
@@ -142,31 +471,151 @@ class RedisCache:
             return bool(client.expire(key, ttl))
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 设置过期时间失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return False
         except Exception as e:
             logger.error(f"Redis 设置过期时间异常: {e}")
             return False
 
-    def clear_pattern(self, pattern: str) -> int:
-        """按模式删除缓存"""
+    def clear_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """按模式删除缓存
+
+        用 SCAN 增量遍历并按批 UNLINK（后台释放内存），不会像 KEYS 那样长时间阻塞 Redis。
+        需要整体失效一类键时优先使用 bump_namespace。
+        """
         client = self._get_client()
         if client is None:
             return 0
 
         try:
-            keys = client.keys(pattern)
-            if keys:
-                return client.delete(*keys)
-            return 0
+            deleted = 0
+            batch = []
+            for key in client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += client.unlink(*batch)
+            return deleted
         except (ConnectionError, TimeoutError) as e:
             logger.warning(f"Redis 批量删除失败: {e}")
-            self._connected = False
+            self._mark_failed(e)
             return 0
         except Exception as e:
             logger.error(f"Redis 批量删除异常: {e}")
             return 0
 
+    @staticmethod
+    def namespaced_key(namespace: str, key: str, generation: int) -> str:
+        return f"{namespace}:g{generation}:{key}"
+
+    def namespace_generation(self, namespace: str) -> int:
+        """返回命名空间当前代次，Redis 不可用时返回 0"""
+        value = self.get(NAMESPACE_GENERATION_PREFIX + namespace)
+        try:
+            return int(value or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def bump_namespace(self, namespace: str) -> Optional[int]:
+        """递增命名空间代次，使该命名空间下所有按代次拼接的键整体失效（O(1)，旧键随 TTL 过期）"""
+        client = self._get_client()
+        if client is None:
+            return None
+
+        try:
+            return int(client.incr(NAMESPACE_GENERATION_PREFIX + namespace))
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 递增命名空间代次失败: {e}")
+            self._mark_failed(e)
+            return None
+        except Exception as e:
+            logger.error(f"Redis 递增命名空间代次异常: {e}")
+            return None
+
+    def acquire_lease(self, key: str, owner: str, ttl: int) -> Optional[bool]:
+        """获取或续期租约（SET NX EX），用于在多个 worker 中选出一个执行某项后台任务
+
+        租约空闲或已由 owner 持有时设置/续期为 ttl 秒并返回 True，由其他 owner 持有时返回 False，
+        Redis 不可用时返回 None（由调用方决定是否在本进程执行）。
+        """
+        client = self._get_client()
+        if client is None:
+            return None
+
+        value = owner.encode("utf-8")
+        try:
+            if client.set(key, value, ex=ttl, nx=True):
+                return True
+            with client.pipeline(transaction=True) as pipe:
+                # WATCH 保证判断持有者和续期之间租约没有易主
+                pipe.watch(key)
+                if pipe.get(key) != value:
+                    return False
+                pipe.multi()
+                pipe.expire(key, ttl)
+                pipe.execute()
+                return True
+        except WatchError:
+            return False
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 获取租约失败: {e}")
+            self._mark_failed(e)
+            return None
+        except Exception as e:
+            logger.error(f"Redis 获取租约异常: {e}")
+            return None
+
+    def release_lease(self, key: str, owner: str) -> bool:
+        """释放由 owner 持有的租约，租约已过期或易主时不做任何操作"""
+        client = self._get_client()
+        if client is None:
+            return False
+
+        try:
+            with client.pipeline(transaction=True) as pipe:
+                pipe.watch(key)
+                if pipe.get(key) != owner.encode("utf-8"):
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+                return True
+        except WatchError:
+            return False
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 释放租约失败: {e}")
+            self._mark_failed(e)
+            return False
+        except Exception as e:
+            logger.error(f"Redis 释放租约异常: {e}")
+            return False
+
+    def publish(self, channel: str, message: str) -> bool:
+        """发布消息到频道"""
+        client = self._get_client()
+        if client is None:
+            return False
+
+        try:
+            client.publish(channel, message)
+            return True
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis 发布消息失败: {e}")
+            self._mark_failed(e)
+            return False
+        except Exception as e:
+            logger.error(f"Redis 发布消息异常: {e}")
+            return False
+
+    def pubsub(self) -> Optional["redis.client.PubSub"]:
+        """获取订阅对象，Redis 不可用时返回 None"""
+        client = self._get_client()
+        if client is None:
+            return None
+        return client.pubsub(ignore_subscribe_messages=True)
+
     def is_connected(self) -> bool:
         """检查 Redis 连接状态"""
         try:
@@ -175,6 +624,9 @@ class RedisCache:
                 client.ping()
                 self._connected = True
                 return True
+        except (ConnectionError, TimeoutError) as e:
+            self._mark_failed(e)
+            logger.debug(f"Redis 连接检查失败: {type(e).__name__}: {e}")
         except Exception as e:
             self._connected = False
             logger.debug(f"Redis 连接检查失败: {type(e).__name__}: {e}")
@@ -186,6 +638,10 @@ class RedisCache:
         self._connected = False
         return self.is_connected()
 
+    def get_state(self) -> Dict[str, Any]:
+        """连接和熔断器状态（用于健康检查）"""
+        return {"connected": self._connected, "breaker": self.breaker.get_state()}
+
 
 # 全局 Redis 缓存实例
 redis_cache = RedisCache()
@@ -0,0 +1,149 @@
+"""缓存值编码 - 按命名空间选择二进制编码，大值 zlib 压缩，带版本头"""
+import json
+import logging
+import zlib
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# 头部：魔数、格式版本、编码器 id、标志位
+MAGIC = 0xCB
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+HEADER_SIZE = 4
+
+
+class JsonCodec:
+    """紧凑 JSON（UTF-8 字节）"""
+    codec_id = 1
+    name = "json"
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack（需要安装 msgpack）"""
+    codec_id = 2
+    name = "msgpack"
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+CODECS = {codec.codec_id: codec for codec in (JsonCodec, MsgpackCodec) if codec is not MsgpackCodec or msgpack}
+CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
+
+
+class UnsupportedFormat(ValueError):
+    """值带有本进程不认识的版本头或编码器（例如新版本写入的值），按未命中处理"""
+
+
+class LegacyTextSerializer:
+    """原有格式：字符串原样保存，其他值保存为 JSON 文本"""
+    name = "text"
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+class BinarySerializer:
+    """带 4 字节版本头的二进制格式，编码后超过 compress_threshold 字节时 zlib 压缩"""
+
+    def __init__(self, codec, compress_threshold: int = 1024, compress_level: int = 1):
+        self.codec = codec
+        self.name = codec.name
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def encode(self, value: Any) -> bytes:
+        data = self.codec.dumps(value)
+        flags = 0
+        if 0 < self.compress_threshold <= len(data):
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                data = compressed
+                flags |= FLAG_ZLIB
+        return bytes((MAGIC, FORMAT_VERSION, self.codec.codec_id, flags)) + data
+
+
+def decode(raw: bytes) -> Any:
+    """解码 Redis 中的值：有版本头的按头部解码，否则按原有文本格式解码"""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if len(raw) >= HEADER_SIZE and raw[0] == MAGIC:
+        version, codec_id, flags = raw[1], raw[2], raw[3]
+        codec = CODECS.get(codec_id)
+        if version != FORMAT_VERSION or codec is None:
+            raise UnsupportedFormat(f"version={version}, codec={codec_id}")
+        data = raw[HEADER_SIZE:]
+        if flags & FLAG_ZLIB:
+            data = zlib.decompress(data)
+        return codec.loads(data)
+    # 0xCB 不是合法的 UTF-8 首字节，原有文本格式不会与版本头混淆
+    text = raw.decode("utf-8")
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text
+
+
+def _build_serializer(codec_name: str, compress_threshold: int):
+    codec = CODECS_BY_NAME.get(codec_name)
+    if codec is None:
+        if codec_name == MsgpackCodec.name:
+            logger.info("未安装 msgpack，二进制缓存编码改用紧凑 JSON")
+        else:
+            logger.warning(f"未知的缓存编码 {codec_name}，改用紧凑 JSON")
+        codec = JsonCodec
+    return BinarySerializer(codec, compress_threshold=compress_threshold)
+
+
+_default_serializer = LegacyTextSerializer()
+_namespace_serializers: Dict[str, Any] = {}
+
+
+def register_namespace(namespace: str, codec_name: Optional[str] = None,
+                       compress_threshold: Optional[int] = None):
+    """指定命名空间（键中第一个冒号之前的部分）使用二进制编码"""
+    _namespace_serializers[namespace] = _build_serializer(
+        codec_name or settings.CACHE_CODEC,
+        settings.CACHE_COMPRESS_THRESHOLD if compress_threshold is None else compress_threshold
+    )
+
+
+def serializer_for(key: Optional[str]):
+    if key and _namespace_serializers:
+        serializer = _namespace_serializers.get(key.split(":", 1)[0])
+        if serializer is not None:
+            return serializer
+    return _default_serializer
+
+
+def encode(value: Any, key: Optional[str] = None) -> bytes:
+    return serializer_for(key).encode(value)
+
+
+for _namespace in settings.CACHE_BINARY_NAMESPACES.split(","):
+    if _namespace.strip():
+        register_namespace(_namespace.strip())
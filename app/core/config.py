@@ -26,6 +26,13 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./cboard.db")
+    # SQLite 性能配置：WAL 等 PRAGMA、单独的只读连接池、写事务串行化
+    SQLITE_WAL_PROFILE: bool = os.getenv("SQLITE_WAL_PROFILE", "true").lower() == "true"
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_READER_POOL_SIZE: int = int(os.getenv("SQLITE_READER_POOL_SIZE", "8"))
+    DB_SUPERVISOR_INTERVAL: int = int(os.getenv("DB_SUPERVISOR_INTERVAL", "30"))
     MYSQL_HOST: str = os.getenv("MYSQL_HOST", "localhost")
     MYSQL_PORT: int = int(os.getenv("MYSQL_PORT", "3306"))
     MYSQL_USER: str = os.getenv("MYSQL_USER", "cboard_user")
@@ -79,6 +86,11 @@ class Settings(BaseSettings):
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "")
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
+    # redis：连接 Redis 服务；memory：进程内替身，用于本地测试和基准
+    REDIS_BACKEND: str = os.getenv("REDIS_BACKEND", "redis").lower()
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", "2"))
+    REDIS_BREAKER_BASE_DELAY: int = int(os.getenv("REDIS_BREAKER_BASE_DELAY", "1"))
+    REDIS_BREAKER_MAX_DELAY: int = int(os.getenv("REDIS_BREAKER_MAX_DELAY", "60"))
     ALIPAY_APP_ID: str = os.getenv("ALIPAY_APP_ID", "your-alipay-app-id")
     ALIPAY_PRIVATE_KEY: str = os.getenv("ALIPAY_PRIVATE_KEY", "your-private-key")
     ALIPAY_PUBLIC_KEY: str = os.getenv("ALIPAY_PUBLIC_KEY", "alipay-public-key")
@@ -88,6 +100,41 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))
     SUBSCRIPTION_URL_PREFIX: str = os.getenv("SUBSCRIPTION_URL_PREFIX", "http://localhost:8000/sub")
     DEVICE_LIMIT_DEFAULT: int = int(os.getenv("DEVICE_LIMIT_DEFAULT", "3"))
+    SUBSCRIPTION_PAYLOAD_REVALIDATE_SECONDS: int = int(os.getenv("SUBSCRIPTION_PAYLOAD_REVALIDATE_SECONDS", "60"))
+    NODE_INDEX_REVALIDATE_SECONDS: int = int(os.getenv("NODE_INDEX_REVALIDATE_SECONDS", "60"))
+    NODE_PROBE_INTERVAL: int = int(os.getenv("NODE_PROBE_INTERVAL", "300"))
+    NODE_PROBE_CONCURRENCY: int = int(os.getenv("NODE_PROBE_CONCURRENCY", "50"))
+    NODE_PROBE_TIMEOUT: int = int(os.getenv("NODE_PROBE_TIMEOUT", "3"))
+    NODE_PROBE_WINDOW: int = int(os.getenv("NODE_PROBE_WINDOW", "20"))
+    ACCESS_LOG_BATCH_SIZE: int = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "200"))
+    ACCESS_LOG_FLUSH_INTERVAL_MS: int = int(os.getenv("ACCESS_LOG_FLUSH_INTERVAL_MS", "500"))
+    ACCESS_LOG_QUEUE_SIZE: int = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+    DEVICE_ACTIVITY_FLUSH_INTERVAL_MS: int = int(os.getenv("DEVICE_ACTIVITY_FLUSH_INTERVAL_MS", "10000"))
+    DEVICE_ACTIVITY_MAX_PENDING: int = int(os.getenv("DEVICE_ACTIVITY_MAX_PENDING", "5000"))
+    SUBSCRIPTION_KEY_CACHE_TTL: int = int(os.getenv("SUBSCRIPTION_KEY_CACHE_TTL", "300"))
+    SUBSCRIPTION_KEY_NEGATIVE_TTL: int = int(os.getenv("SUBSCRIPTION_KEY_NEGATIVE_TTL", "30"))
+    SUBSCRIPTION_KEY_CACHE_SIZE: int = int(os.getenv("SUBSCRIPTION_KEY_CACHE_SIZE", "10000"))
+    DEVICE_COUNT_RECONCILE_INTERVAL: int = int(os.getenv("DEVICE_COUNT_RECONCILE_INTERVAL", "3600"))
+    CONFIG_SOURCE_TIMEOUT: int = int(os.getenv("CONFIG_SOURCE_TIMEOUT", "30"))
+    CONFIG_SOURCE_DEADLINE: int = int(os.getenv("CONFIG_SOURCE_DEADLINE", "180"))
+    CONFIG_SOURCE_PER_HOST_LIMIT: int = int(os.getenv("CONFIG_SOURCE_PER_HOST_LIMIT", "2"))
+    CONFIG_PARSED_NODE_RETENTION_RUNS: int = int(os.getenv("CONFIG_PARSED_NODE_RETENTION_RUNS", "5"))
+    CONFIG_PARSE_WORKERS: int = int(os.getenv("CONFIG_PARSE_WORKERS", "0"))
+    CONFIG_PARSE_CHUNK_SIZE: int = int(os.getenv("CONFIG_PARSE_CHUNK_SIZE", "500"))
+    CONFIG_PARSE_MIN_PARALLEL: int = int(os.getenv("CONFIG_PARSE_MIN_PARALLEL", "2000"))
+    CONFIG_UPDATE_LOG_FLUSH_INTERVAL_MS: int = int(os.getenv("CONFIG_UPDATE_LOG_FLUSH_INTERVAL_MS", "1000"))
+    CONFIG_UPDATE_LOG_BATCH_SIZE: int = int(os.getenv("CONFIG_UPDATE_LOG_BATCH_SIZE", "200"))
+    CONFIG_UPDATE_LOG_RETENTION: int = int(os.getenv("CONFIG_UPDATE_LOG_RETENTION", "1000"))
+    CACHE_INVALIDATION_POLL_INTERVAL: int = int(os.getenv("CACHE_INVALIDATION_POLL_INTERVAL", "5"))
+    CACHE_L1_MAX_ENTRIES: int = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000"))
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "30"))
+    CACHE_GENERATION_CHECK_SECONDS: int = int(os.getenv("CACHE_GENERATION_CHECK_SECONDS", "2"))
+    CACHE_EARLY_REFRESH_BETA: float = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0"))
+    # 使用二进制编码的缓存命名空间（键中第一个冒号之前的部分），其余命名空间保持 JSON 文本
+    CACHE_BINARY_NAMESPACES: str = os.getenv("CACHE_BINARY_NAMESPACES", "nodes,monitoring")
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "msgpack")
+    CACHE_COMPRESS_THRESHOLD: int = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+    CONFIG_GENERATION_RETENTION: int = int(os.getenv("CONFIG_GENERATION_RETENTION", "50"))
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
@@ -1,11 +1,13 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
-from fastapi import HTTPException
 from app.core.config import settings
 import logging
 import os
+import threading
+import time
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -64,109 +66,308 @@ def _create_engine_common(pool_size=10, max_overflow=20, echo=False):
         pool_timeout=30  # 获取连接的超时时间
     )
 
-if "sqlite" in database_url:
+SQLITE_WRITE_LOCK_KEY = "sqlite_write_lock"
+_READ_STATEMENT_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN", "WITH")
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    return isinstance(error, (OperationalError, InterfaceError)) or getattr(error, "connection_invalidated", False)
+
+
+class SQLiteWriteSerializer:
+    """SQLite 写事务串行化
+
+    同一进程内同时只允许一个连接持有写事务：连接执行第一条写语句前取得进程锁，提交或回滚后释放，
+    其他连接的写语句在 Python 层排队，而不是在 SQLite 文件锁上忙等重试。读语句不受影响。
+    同一线程在持有写锁时再用另一个连接写入不会等待自己（交给 SQLite 的 busy_timeout 处理），
+    等待超过 timeout 秒后不再等待，同样交给 busy_timeout 兜底。
+    """
+
+    def __init__(self, timeout: float = 5):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._owner = None
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def attach(self, target_engine):
+        event.listen(target_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(target_engine, "commit", self._release_connection)
+        event.listen(target_engine, "rollback", self._release_connection)
+        # 连接已失效（不能再访问 conn.info）或未提交也未回滚就归还连接池时，由连接池事件兜底释放
+        event.listen(target_engine.pool, "reset", self._on_reset)
+        event.listen(target_engine.pool, "invalidate", self._on_invalidate)
+        event.listen(target_engine.pool, "checkin", self._on_checkin)
+
+    def get_stats(self):
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "wait_ms": round(self.wait_seconds * 1000, 1)
+        }
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        info = conn.info
+        if info.get(SQLITE_WRITE_LOCK_KEY) or statement.lstrip()[:7].upper().startswith(_READ_STATEMENT_PREFIXES):
+            return
+        if self._owner == threading.get_ident():
+            return
+        if self._lock.acquire(blocking=False):
+            acquired = True
+        else:
+            self.contended += 1
+            started = time.perf_counter()
+            acquired = self._lock.acquire(timeout=self.timeout)
+            self.wait_seconds += time.perf_counter() - started
+            if not acquired:
+                self.timeouts += 1
+                logger.warning(f"等待 SQLite 写锁超过 {self.timeout} 秒，交由 busy_timeout 处理")
+                return
+        self._owner = threading.get_ident()
+        self.acquired += 1
+        info[SQLITE_WRITE_LOCK_KEY] = True
+
+    def _release(self, info):
+        if info.pop(SQLITE_WRITE_LOCK_KEY, False):
+            self._owner = None
+            self._lock.release()
+
+    def _release_connection(self, conn):
+        # 失效的连接上读取 conn.info 会抛出 PendingRollbackError，导致 Session.rollback() 失败
+        if conn.invalidated:
+            return
+        self._release(conn.info)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        if connection_record is not None:
+            self._release(connection_record.info)
+
+    def _on_reset(self, dbapi_connection, connection_record, reset_state):
+        self._on_checkin(dbapi_connection, connection_record)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self._on_checkin(dbapi_connection, connection_record)
+
+
+def _sqlite_pragma_listener(read_only: bool):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+            if not read_only:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            if read_only:
+                cursor.execute("PRAGMA query_only=1")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def _is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") not in ("sqlite:", "sqlite+pysqlite:")
+
+
+def create_sqlite_engines(url: str, profile: bool = True, reader_pool_size: int = 8):
+    """创建 SQLite 的写引擎和读引擎，返回 (engine, reader_engine, write_serializer)
+
+    profile=True 时：每个连接设置 WAL、busy_timeout、mmap、cache_size 等 PRAGMA；
+    只读查询使用单独的连接池（query_only），WAL 下读不阻塞写；写事务由 SQLiteWriteSerializer 串行化。
+    profile=False 时保持原来的单连接池配置，读写共用一个引擎。
+    """
     engine = create_engine(
-        database_url,
+        url,
         connect_args={"check_same_thread": False},
         poolclass=QueuePool,
         pool_size=5,
         max_overflow=10,
         pool_pre_ping=True
     )
-elif "mysql" in database_url or "postgresql" in database_url:
-    engine = _create_engine_common(pool_size=10, max_overflow=20, echo=settings.DEBUG)
-else:
-    engine = _create_engine_common(pool_size=5, max_overflow=10)
+    if not profile:
+        return engine, engine, None
+    event.listen(engine, "connect", _sqlite_pragma_listener(read_only=False))
+    write_serializer = SQLiteWriteSerializer(timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    write_serializer.attach(engine)
+    if not _is_sqlite_file(url):
+        return engine, engine, write_serializer
+    reader_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=reader_pool_size,
+        max_overflow=reader_pool_size,
+        pool_pre_ping=True
+    )
+    event.listen(reader_engine, "connect", _sqlite_pragma_listener(read_only=True))
+    return engine, reader_engine, write_serializer
+
+
+def _build_engines():
+    if "sqlite" in database_url:
+        return create_sqlite_engines(database_url, settings.SQLITE_WAL_PROFILE, settings.SQLITE_READER_POOL_SIZE)
+    if "mysql" in database_url or "postgresql" in database_url:
+        built = _create_engine_common(pool_size=10, max_overflow=20, echo=settings.DEBUG)
+    else:
+        built = _create_engine_common(pool_size=5, max_overflow=10)
+    return built, built, None
+
+
+engine, reader_engine, sqlite_write_serializer = _build_engines()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 只读会话（SQLite 性能配置下使用单独的只读连接池，其他数据库与 SessionLocal 相同）
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine)
 Base = declarative_base()
 
-def get_db():
-    """获取数据库会话，带自动重连机制和健康检查"""
-    global engine, SessionLocal
-    db = None
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
+
+class EngineSupervisor:
+    """数据库引擎守护
+
+    请求中遇到连接错误时通知守护线程，由守护线程（以及每 interval 秒一次的例行检查）执行 SELECT 1，
+    失败时丢弃连接池中的连接并按指数退避重试，连续失败 rebuild_after 次后重建引擎，
+    请求线程不再自行探测、重试或 sleep。
+    """
+
+    def __init__(self, interval: float = 30, max_backoff: float = 60, rebuild_after: int = 3):
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.rebuild_after = rebuild_after
+        self.state = "healthy"
+        self.failures = 0
+        self.recoveries = 0
+        self.rebuilds = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def report_failure(self, error: BaseException):
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="EngineSupervisor")
+            self._thread.start()
+            logger.info(f"数据库引擎守护已启动（检查间隔 {self.interval} 秒）")
+
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        logger.info("数据库引擎守护已停止")
+
+    def get_state(self):
+        state = {
+            "state": self.state,
+            "failures": self.failures,
+            "recoveries": self.recoveries,
+            "rebuilds": self.rebuilds,
+            "last_error": self.last_error
+        }
+        if sqlite_write_serializer is not None:
+            state["sqlite_write_lock"] = sqlite_write_serializer.get_stats()
+        return state
+
+    def check(self) -> bool:
         try:
-            db = SessionLocal()
-            # 测试连接是否有效（使用简单查询）
-            try:
-                db.execute(text("SELECT 1"))
-                db.commit()
-            except Exception as test_error:
-                try:
-                    db.rollback()
-                except:
-                    pass
-                try:
-                    db.close()
-                except:
-                    pass
-                db = None
-                raise test_error
-            
-            # 连接成功，返回数据库会话
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+
+    def _rebuild(self):
+        global engine, reader_engine, sqlite_write_serializer
+        old_engines = {engine, reader_engine}
+        engine, reader_engine, sqlite_write_serializer = _build_engines()
+        SessionLocal.configure(bind=engine)
+        ReadSessionLocal.configure(bind=reader_engine)
+        for old in old_engines:
+            old.dispose()
+        self.rebuilds += 1
+        logger.info("数据库连接池已重新创建")
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop_event.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if self.check():
+                if self.state != "healthy":
+                    self.recoveries += 1
+                    logger.info(f"数据库连接已恢复（失败 {self.failures} 次）")
+                self.state = "healthy"
+                self.failures = 0
+                delay = self.interval
+                continue
+            self.failures += 1
+            self.state = "degraded"
+            logger.warning(f"数据库连接检查失败 {self.failures} 次: {self.last_error}")
             try:
-                yield db
+                if self.failures % self.rebuild_after == 0:
+                    self._rebuild()
+                else:
+                    engine.dispose()
+                    if reader_engine is not engine:
+                        reader_engine.dispose()
             except Exception as e:
-                # 如果发生错误，尝试回滚
-                try:
-                    db.rollback()
-                except:
-                    pass
-                raise
-            finally:
-                # 确保连接总是被关闭
-                if db:
-                    try:
-                        db.close()
-                    except Exception as close_error:
-                        logger.warning(f"关闭数据库连接时出错: {close_error}")
-            return  # 成功返回，退出循环
-        except HTTPException:
-            # HTTPException 应该直接抛出，不重试
-            if db:
-                try:
-                    db.rollback()
-                    db.close()
-                except:
-                    pass
-            raise
-        except Exception as e:
-            if db:
-                try:
-                    db.rollback()
-                    db.close()
-                except:
-                    pass
-                db = None
-            retry_count += 1
-            logger.warning(f"数据库连接失败，重试 {retry_count}/{max_retries}: {e}")
-            if retry_count >= max_retries:
-                logger.error(f"数据库连接失败，已达到最大重试次数: {e}")
-                # 尝试重新创建连接池
-                try:
-                    if "sqlite" in database_url:
-                        engine = create_engine(
-                            database_url,
-                            connect_args={"check_same_thread": False},
-                            poolclass=QueuePool,
-                            pool_size=5,
-                            max_overflow=10,
-                            pool_pre_ping=True
-                        )
-                    else:
-                        engine = _create_engine_common(pool_size=10, max_overflow=20, echo=settings.DEBUG)
-                    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-                    logger.info("数据库连接池已重新创建")
-                except Exception as reconnect_error:
-                    logger.error(f"重新创建数据库连接池失败: {reconnect_error}")
-                # 抛出 HTTPException，让 FastAPI 处理
-                raise HTTPException(status_code=503, detail="数据库连接失败，请稍后重试")
-            import time
-            time.sleep(0.1 * retry_count)  # 递增延迟
+                logger.error(f"重置数据库连接池失败: {e}")
+            delay = min(2 ** min(self.failures, 10), self.max_backoff)
+
+
+engine_supervisor = EngineSupervisor(interval=settings.DB_SUPERVISOR_INTERVAL)
+
+
+def get_engine_supervisor() -> EngineSupervisor:
+    return engine_supervisor
+
+
+def _session_scope(session_factory):
+    db = session_factory()
+    try:
+        yield db
+    except Exception as e:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        if _is_connection_error(e):
+            engine_supervisor.report_failure(e)
+        raise
+    finally:
+        try:
+            db.close()
+        except Exception as close_error:
+            logger.warning(f"关闭数据库连接时出错: {close_error}")
+
+
+def get_db():
+    """获取数据库会话
+
+    会话在第一次执行语句时才从连接池取出连接，连接有效性由连接池的 pre_ping 检查；
+    连接错误交给 EngineSupervisor 在后台处理。
+    """
+    yield from _session_scope(SessionLocal)
+
+
+def get_read_db():
+    """获取只读数据库会话（列表、统计等只读接口使用，不能写入）"""
+    yield from _session_scope(ReadSessionLocal)
 
 def test_database_connection():
     try:
@@ -183,7 +384,7 @@ def init_database():
         from app.models import (
             User, Subscription, Device, Order, Package, EmailQueue,
             EmailTemplate, Notification, Node, PaymentTransaction,
-            PaymentConfig, PaymentCallback, SystemConfig, Announcement,
+            PaymentConfig, PaymentCallback, SystemConfig, ConfigUpdateLog, ConfigGeneration, Announcement,
             ThemeConfig, UserActivity, SubscriptionReset, LoginHistory,
             Ticket, TicketReply, TicketAttachment, Coupon, CouponUsage,
             RechargeRecord, LoginAttempt, VerificationAttempt
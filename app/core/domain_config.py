@@ -2,6 +2,7 @@ import os
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from app.core.invalidation_bus import TOPIC_DOMAIN_CONFIG, invalidation_bus
 
 class DomainConfig:
     def __init__(self):
@@ -115,11 +116,13 @@ class DomainConfig:
                 VALUES ('ssl_enabled', :ssl_enabled, 'system', :now, :now)
             """), {'ssl_enabled': str(ssl_enabled).lower(), 'now': now})
             db.commit()
-            self._domain_cache.clear()
-            self._ssl_enabled_cache.clear()
+            invalidation_bus.publish(TOPIC_DOMAIN_CONFIG)
         except Exception as e:
             db.rollback()
             raise e
+    def clear_cache(self):
+        self._domain_cache.clear()
+        self._ssl_enabled_cache.clear()
     def get_domain_info(self, request=None, db: Optional[Session] = None) -> Dict[str, Any]:
         return {
             'base_url': self.get_base_url(request, db),
@@ -138,3 +141,5 @@ domain_config = DomainConfig()
 
 def get_domain_config() -> DomainConfig:
     return domain_config
+
+invalidation_bus.subscribe(TOPIC_DOMAIN_CONFIG, lambda payload: domain_config.clear_cache())
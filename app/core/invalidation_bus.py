@@ -0,0 +1,213 @@
+"""跨进程缓存失效通知 - Redis 发布/订阅，Redis 不可用时轮询 system_configs 中的版本号"""
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import Integer, String, cast
+from sqlalchemy.exc import IntegrityError
+
+from app.core.cache import redis_cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.config import SystemConfig
+
+logger = logging.getLogger(__name__)
+
+TOPIC_SETTINGS = "settings"
+TOPIC_DOMAIN_CONFIG = "domain_config"
+TOPIC_SUBSCRIPTION_PAYLOAD = "subscription_payload"
+TOPIC_SUBSCRIPTION_KEYS = "subscription_keys"
+TOPIC_NODES = "nodes"
+TOPIC_SOFTWARE_RULES = "software_rules"
+
+CHANNEL_PREFIX = "cache:invalidate:"
+VERSION_KEY_PREFIX = "cache_version:"
+
+Handler = Callable[[Optional[Dict[str, Any]]], None]
+
+
+class InvalidationBus:
+    """缓存失效通知总线
+
+    各模块用 subscribe(topic, handler) 注册本进程缓存的失效回调，数据变化后调用 publish(topic, payload)：
+    本进程的回调立即执行；同时递增 system_configs 中该主题的版本号，并通过 Redis 频道通知其他 worker，
+    其他 worker 收到后以相同 payload 调用回调。
+    Redis 不可用时后台线程每 poll_interval 秒读取一次版本号，发现变化时以 payload=None 调用回调，
+    回调收到 None 时应清空该主题的全部缓存。
+    """
+
+    def __init__(self, poll_interval: float = 5, redis_retry_interval: float = 30):
+        self.poll_interval = poll_interval
+        self.redis_retry_interval = redis_retry_interval
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._versions: Dict[str, int] = {}
+        self._versions_loaded = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.mode = "stopped"
+        self.published_count = 0
+        self.received_count = 0
+        self.polled_changes = 0
+
+    def subscribe(self, topic: str, handler: Handler):
+        with self._lock:
+            self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, payload: Optional[Dict[str, Any]] = None):
+        """通知所有 worker 失效 topic 对应的缓存（本进程同步执行）"""
+        self._dispatch(topic, payload)
+        self.published_count += 1
+        version = self._bump_version(topic)
+        message = json.dumps({"origin": self.origin, "topic": topic, "payload": payload, "version": version},
+                             ensure_ascii=False)
+        redis_cache.publish(CHANNEL_PREFIX + topic, message)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="InvalidationBus")
+            self._thread.start()
+            logger.info(f"缓存失效通知已启动（轮询间隔 {self.poll_interval} 秒）")
+
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self.mode = "stopped"
+        logger.info(f"缓存失效通知已停止: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "topics": sorted(self._handlers.keys()),
+            "published": self.published_count,
+            "received": self.received_count,
+            "polled_changes": self.polled_changes
+        }
+
+    def _dispatch(self, topic: str, payload: Optional[Dict[str, Any]]):
+        for handler in list(self._handlers.get(topic, ())):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"缓存失效回调执行失败 topic={topic}: {e}", exc_info=True)
+
+    def _bump_version(self, topic: str) -> Optional[int]:
+        """在数据库中原子递增主题版本号，每次发布都得到不同的版本号（轮询方才不会漏掉并发发布）"""
+        key = VERSION_KEY_PREFIX + topic
+        db = SessionLocal()
+        try:
+            for _ in range(2):
+                updated = db.query(SystemConfig).filter(SystemConfig.key == key).update(
+                    {SystemConfig.value: cast(cast(SystemConfig.value, Integer) + 1, String)},
+                    synchronize_session=False
+                )
+                if updated:
+                    version = int(db.query(SystemConfig.value).filter(SystemConfig.key == key).scalar())
+                else:
+                    version = 1
+                    db.add(SystemConfig(
+                        key=key, value=str(version), type="number", category="system",
+                        display_name="缓存版本", description=f"缓存失效版本号（{topic}）"
+                    ))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # 其他 worker 同时插入了该主题的版本号，回滚后改为递增
+                    db.rollback()
+                    continue
+                self._versions[topic] = version
+                return version
+            return None
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"更新缓存版本号失败 topic={topic}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _poll_versions(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(SystemConfig.key, SystemConfig.value).filter(
+                SystemConfig.key.like(VERSION_KEY_PREFIX + "%")
+            ).all()
+        except Exception as e:
+            logger.warning(f"读取缓存版本号失败: {e}")
+            return
+        finally:
+            db.close()
+        for key, value in rows:
+            topic = key[len(VERSION_KEY_PREFIX):]
+            try:
+                version = int(value or 0)
+            except ValueError:
+                continue
+            previous = self._versions.get(topic)
+            self._versions[topic] = version
+            # 第一次读取只记录当前版本
+            if self._versions_loaded and previous != version:
+                self.polled_changes += 1
+                logger.info(f"检测到缓存版本变化 topic={topic}: {previous} -> {version}")
+                self._dispatch(topic, None)
+        self._versions_loaded = True
+
+    def _handle_message(self, message: Dict[str, Any]):
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        topic = data.get("topic")
+        if data.get("version") is not None:
+            self._versions[topic] = data["version"]
+        if data.get("origin") == self.origin:
+            return
+        self.received_count += 1
+        self._dispatch(topic, data.get("payload"))
+
+    def _listen(self, pubsub):
+        pubsub.psubscribe(CHANNEL_PREFIX + "*")
+        self.mode = "redis"
+        logger.info("缓存失效通知使用 Redis 发布/订阅")
+        # 订阅前可能错过的变化
+        self._poll_versions()
+        while not self._stop_event.is_set():
+            message = pubsub.get_message(timeout=1.0)
+            if message and message.get("type") == "pmessage":
+                self._handle_message(message)
+
+    def _run(self):
+        next_redis_attempt = 0.0
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_redis_attempt:
+                pubsub = redis_cache.pubsub()
+                if pubsub is not None:
+                    try:
+                        self._listen(pubsub)
+                    except Exception as e:
+                        logger.warning(f"Redis 订阅中断，改为轮询缓存版本号: {e}")
+                    finally:
+                        try:
+                            pubsub.close()
+                        except Exception:
+                            pass
+                next_redis_attempt = time.monotonic() + self.redis_retry_interval
+            if self._stop_event.is_set():
+                break
+            self.mode = "polling"
+            self._poll_versions()
+            self._stop_event.wait(self.poll_interval)
+
+
+invalidation_bus = InvalidationBus(poll_interval=settings.CACHE_INVALIDATION_POLL_INTERVAL)
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    return invalidation_bus
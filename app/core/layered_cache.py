@@ -0,0 +1,231 @@
+"""两级缓存 - 进程内 LRU（L1）+ Redis（L2），带单飞加载和概率提前刷新"""
+import collections
+import logging
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.cache import redis_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalTTLCache:
+    """进程内 LRU 缓存，每个条目带过期时间"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, max_entries)
+        self._entries: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _Flight:
+    """一次正在进行的加载，同一进程内等待同一个键的调用方共用结果"""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class LayeredCache:
+    """某个命名空间的两级缓存
+
+    读取顺序为 L1 → L2 → loader。同一进程内同一个键同时只有一个调用方执行 loader，其他调用方等待其结果；
+    Redis 不可用时 L1 和单飞加载仍然生效，缓存过期不会引起同一进程内的重复计算。
+    条目记录过期时间和上次加载耗时，按 XFetch 算法在临近过期时以一定概率提前刷新（beta 越大越早），
+    刷新期间其他调用方继续使用旧值。
+    Redis 中的键带命名空间代次，clear() 递增代次即可让整个命名空间失效，不需要扫描删除；
+    其他 worker 在 generation_check_interval 秒内发现代次变化并丢弃 L1 中的旧条目。
+    """
+
+    def __init__(self, namespace: str, ttl: int = 300, l1_ttl: Optional[int] = None,
+                 max_entries: Optional[int] = None, beta: Optional[float] = None,
+                 generation_check_interval: Optional[float] = None, load_timeout: float = 30):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.l1_ttl = min(ttl, l1_ttl if l1_ttl is not None else settings.CACHE_L1_TTL)
+        self.beta = beta if beta is not None else settings.CACHE_EARLY_REFRESH_BETA
+        self.generation_check_interval = (generation_check_interval if generation_check_interval is not None
+                                          else settings.CACHE_GENERATION_CHECK_SECONDS)
+        self.load_timeout = load_timeout
+        self._l1 = LocalTTLCache(max_entries if max_entries is not None else settings.CACHE_L1_MAX_ENTRIES)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._generation_checked_at = float("-inf")
+        self.stats = collections.Counter()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._get_entry(key)
+        return entry["v"] if entry is not None else default
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, delta: float = 0.0):
+        self._store(key, value, ttl or self.ttl, delta)
+
+    def delete(self, key: str):
+        self._l1.delete(key)
+        redis_cache.delete(self._redis_key(key))
+
+    def clear(self):
+        """使整个命名空间失效"""
+        self._l1.clear()
+        generation = redis_cache.bump_namespace(self.namespace)
+        if generation is not None:
+            self._generation = generation
+            self._generation_checked_at = time.monotonic()
+        self.stats["clears"] += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """返回缓存值，不存在时调用 loader 计算并写入缓存（loader 返回 None 时不缓存；返回值为共享对象，不要修改）"""
+        ttl = ttl or self.ttl
+        entry = self._get_entry(key)
+        if entry is not None:
+            if not self._should_refresh_early(entry):
+                return entry["v"]
+            flight, leader = self._join_flight(key)
+            if not leader:
+                # 其他调用方正在刷新，先用旧值
+                self.stats["stale_served"] += 1
+                return entry["v"]
+            self.stats["early_refreshes"] += 1
+            return self._load(key, loader, ttl, flight)
+
+        flight, leader = self._join_flight(key)
+        if leader:
+            self.stats["misses"] += 1
+            return self._load(key, loader, ttl, flight)
+        self.stats["coalesced"] += 1
+        if not flight.event.wait(self.load_timeout):
+            logger.warning(f"等待缓存加载超时，直接计算: {self.namespace}:{key}")
+            return loader()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        lookups = stats.get("l1_hits", 0) + stats.get("l2_hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = round((lookups - stats.get("misses", 0)) / lookups, 4) if lookups else 0.0
+        stats["l1_entries"] = len(self._l1)
+        stats["generation"] = self._generation
+        return stats
+
+    def _current_generation(self) -> int:
+        now = time.monotonic()
+        if now - self._generation_checked_at >= self.generation_check_interval:
+            generation = redis_cache.namespace_generation(self.namespace)
+            if generation != self._generation:
+                self._l1.clear()
+                self._generation = generation
+            self._generation_checked_at = now
+        return self._generation
+
+    def _redis_key(self, key: str) -> str:
+        return redis_cache.namespaced_key(self.namespace, key, self._current_generation())
+
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        redis_key = self._redis_key(key)
+        entry = self._l1.get(key)
+        if entry is not _MISSING:
+            self.stats["l1_hits"] += 1
+            return entry
+        entry = redis_cache.get(redis_key)
+        if isinstance(entry, dict) and "v" in entry and entry.get("e", 0) > time.time():
+            self.stats["l2_hits"] += 1
+            self._l1.set(key, entry, min(self.l1_ttl, entry["e"] - time.time()))
+            return entry
+        return None
+
+    def _store(self, key: str, value: Any, ttl: int, delta: float):
+        entry = {"v": value, "d": delta, "e": time.time() + ttl}
+        self._l1.set(key, entry, min(self.l1_ttl, ttl))
+        redis_cache.set(self._redis_key(key), entry, ttl=ttl)
+
+    def _should_refresh_early(self, entry: Dict[str, Any]) -> bool:
+        delta = entry.get("d") or 0.0
+        if delta <= 0 or self.beta <= 0:
+            return False
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= entry["e"]
+
+    def _join_flight(self, key: str):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: int, flight: _Flight) -> Any:
+        started = time.monotonic()
+        try:
+            value = loader()
+            self.stats["loads"] += 1
+            if value is not None:
+                self._store(key, value, ttl, time.monotonic() - started)
+            flight.value = value
+            return value
+        except BaseException as e:
+            self.stats["load_errors"] += 1
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+
+_caches: Dict[str, LayeredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_layered_cache(namespace: str, **kwargs) -> LayeredCache:
+    """返回命名空间对应的两级缓存（同一命名空间只创建一次，后续调用忽略参数）"""
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(namespace)
+            if cache is None:
+                cache = _caches[namespace] = LayeredCache(namespace, **kwargs)
+    return cache
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """各命名空间的命中统计"""
+    return {namespace: cache.get_stats() for namespace, cache in list(_caches.items())}
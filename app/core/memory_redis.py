@@ -0,0 +1,359 @@
+"""进程内 Redis 替身 - 实现 RedisCache 用到的命令子集，用于本地测试和基准（REDIS_BACKEND=memory）"""
+import collections
+import fnmatch
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from redis.exceptions import ResponseError, WatchError
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, (int, float)):
+        return str(value).encode("ascii")
+    raise TypeError(f"不支持的值类型: {type(value).__name__}")
+
+
+def _to_str(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+class MemoryRedis:
+    """与 redis.Redis(decode_responses=False) 行为一致的进程内实现
+
+    支持字符串的 GET/SET(EX)/SETEX/MGET/MSET/INCR/DEL/UNLINK/EXISTS/EXPIRE/TTL、SCAN、
+    管道（含 WATCH/MULTI/EXEC）和发布/订阅（SUBSCRIBE/PSUBSCRIBE）。过期键在访问时删除，SCAN 跳过过期键，另外每 1000 次写入清理一次全部过期键。
+    数据只在本进程内共享，多 worker 部署时各 worker 互不可见。
+    """
+
+    def __init__(self):
+        # 键 -> (值, 过期时间, 插入序号)；覆盖已有键不改变序号，字典顺序即序号顺序
+        self._data: Dict[str, Tuple[bytes, Optional[float], int]] = {}
+        self._next_seq = 1
+        self._writes = 0
+        self._versions: Dict[str, int] = collections.defaultdict(int)
+        self._lock = threading.RLock()
+        self._subscribers: List["MemoryPubSub"] = []
+
+    # 键空间
+
+    def _alive(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self._versions[key] += 1
+            return None
+        return value
+
+    def _write(self, key: str, value: bytes, ttl: Optional[float] = None, keep_ttl: bool = False):
+        entry = self._data.get(key)
+        if entry is not None:
+            seq = entry[2]
+            expires_at = entry[1] if keep_ttl else (time.monotonic() + ttl if ttl else None)
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+            expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at, seq)
+        self._versions[key] += 1
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._purge_expired()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at, _) in self._data.items() if expires_at is not None and expires_at <= now]:
+            del self._data[key]
+            self._versions[key] += 1
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            return self._alive(_to_str(key))
+
+    def set(self, key, value, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        key = _to_str(key)
+        with self._lock:
+            if nx and self._alive(key) is not None:
+                return None
+            ttl = ex if ex else (px / 1000 if px else None)
+            self._write(key, _to_bytes(value), ttl)
+            return True
+
+    def setex(self, key, ttl: int, value) -> bool:
+        return bool(self.set(key, value, ex=ttl))
+
+    def mget(self, keys, *args) -> List[Optional[bytes]]:
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        keys.extend(args)
+        with self._lock:
+            return [self._alive(_to_str(key)) for key in keys]
+
+    def mset(self, mapping: Dict[Any, Any]) -> bool:
+        with self._lock:
+            for key, value in mapping.items():
+                self._write(_to_str(key), _to_bytes(value))
+            return True
+
+    def incr(self, key, amount: int = 1) -> int:
+        key = _to_str(key)
+        with self._lock:
+            current = self._alive(key)
+            try:
+                value = int(current or 0) + amount
+            except ValueError:
+                raise ResponseError("value is not an integer or out of range")
+            self._write(key, str(value).encode("ascii"), keep_ttl=True)
+            return value
+
+    def delete(self, *keys) -> int:
+        deleted = 0
+        with self._lock:
+            for key in keys:
+                key = _to_str(key)
+                if self._alive(key) is not None:
+                    del self._data[key]
+                    self._versions[key] += 1
+                    deleted += 1
+        return deleted
+
+    unlink = delete
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._alive(_to_str(key)) is not None)
+
+    def expire(self, key, ttl: int) -> bool:
+        key = _to_str(key)
+        with self._lock:
+            value = self._alive(key)
+            if value is None:
+                return False
+            self._write(key, value, ttl)
+            return True
+
+    def ttl(self, key) -> int:
+        key = _to_str(key)
+        with self._lock:
+            if self._alive(key) is None:
+                return -2
+            expires_at = self._data[key][1]
+            return -1 if expires_at is None else max(0, round(expires_at - time.monotonic()))
+
+    def scan(self, cursor: int = 0, match: Optional[str] = None, count: int = 10) -> Tuple[int, List[bytes]]:
+        """按插入序号分页遍历，cursor 为上一页最后一个键的序号，返回 0 表示结束。
+        遍历期间一直存在的键一定会返回，期间删除其他键不影响遍历"""
+        match = _to_str(match) if match is not None else None
+        now = time.monotonic()
+        with self._lock:
+            result = []
+            examined = 0
+            for key, (_, expires_at, seq) in self._data.items():
+                if seq <= cursor:
+                    continue
+                examined += 1
+                if (expires_at is None or expires_at > now) and (match is None or fnmatch.fnmatchcase(key, match)):
+                    result.append(key.encode("utf-8"))
+                if examined >= count:
+                    return seq, result
+            return 0, result
+
+    def scan_iter(self, match: Optional[str] = None, count: int = 10) -> Iterator[bytes]:
+        # 与 Redis 一样，遍历期间写入的键可能出现也可能不出现
+        cursor = 0
+        while True:
+            cursor, keys = self.scan(cursor, match=match, count=count)
+            yield from keys
+            if cursor == 0:
+                break
+
+    def keys(self, pattern: str = "*") -> List[bytes]:
+        return list(self.scan_iter(match=pattern, count=1 << 30))
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            for key in self._data:
+                self._versions[key] += 1
+            self._data.clear()
+            return True
+
+    # 管道
+
+    def pipeline(self, transaction: bool = True) -> "MemoryPipeline":
+        return MemoryPipeline(self, transaction)
+
+    # 发布/订阅
+
+    def publish(self, channel, message) -> int:
+        channel = _to_str(channel)
+        data = _to_bytes(message)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return sum(subscriber._deliver(channel, data) for subscriber in subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "MemoryPubSub":
+        return MemoryPubSub(self, ignore_subscribe_messages)
+
+
+class MemoryPipeline:
+    """管道：WATCH 之后、MULTI 之前的命令立即执行，其余命令排队到 execute() 时执行；
+    事务模式下 WATCH 的键在 EXEC 前被修改时抛出 WatchError"""
+
+    def __init__(self, client: MemoryRedis, transaction: bool = True):
+        self._client = client
+        self._transaction = transaction
+        self._commands: List[Tuple[str, tuple, dict]] = []
+        self._watched: Dict[str, int] = {}
+        self._immediate = False
+
+    def __enter__(self) -> "MemoryPipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def reset(self):
+        self._commands = []
+        self._watched = {}
+        self._immediate = False
+
+    def watch(self, *keys):
+        with self._client._lock:
+            for key in keys:
+                key = _to_str(key)
+                self._client._alive(key)
+                self._watched[key] = self._client._versions[key]
+        self._immediate = True
+        return True
+
+    def unwatch(self):
+        self._watched = {}
+        return True
+
+    def multi(self):
+        self._immediate = False
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        commands, self._commands = self._commands, []
+        client = self._client
+        try:
+            with client._lock:
+                for key, version in self._watched.items():
+                    client._alive(key)
+                    if client._versions[key] != version:
+                        raise WatchError("Watched variable changed.")
+                results = []
+                for name, args, kwargs in commands:
+                    try:
+                        results.append(getattr(client, name)(*args, **kwargs))
+                    except ResponseError as e:
+                        if raise_on_error:
+                            raise
+                        results.append(e)
+                return results
+        finally:
+            self._watched = {}
+            self._immediate = False
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+
+        def call(*args, **kwargs):
+            if self._immediate:
+                return command(*args, **kwargs)
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return call
+
+
+class MemoryPubSub:
+    """订阅对象，消息格式与 redis-py 的 PubSub.get_message() 一致"""
+
+    def __init__(self, client: MemoryRedis, ignore_subscribe_messages: bool = False):
+        self._client = client
+        self._ignore_subscribe_messages = ignore_subscribe_messages
+        self._channels: set = set()
+        self._patterns: set = set()
+        self._messages: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._registered = False
+
+    def _register(self):
+        if not self._registered:
+            with self._client._lock:
+                self._client._subscribers.append(self)
+            self._registered = True
+
+    def _confirm(self, kind: str, name: str, count: int):
+        if not self._ignore_subscribe_messages:
+            self._messages.put({"type": kind, "pattern": None, "channel": name.encode("utf-8"), "data": count})
+
+    def subscribe(self, *channels):
+        self._register()
+        for channel in channels:
+            self._channels.add(_to_str(channel))
+            self._confirm("subscribe", _to_str(channel), len(self._channels) + len(self._patterns))
+
+    def psubscribe(self, *patterns):
+        self._register()
+        for pattern in patterns:
+            self._patterns.add(_to_str(pattern))
+            self._confirm("psubscribe", _to_str(pattern), len(self._channels) + len(self._patterns))
+
+    def _deliver(self, channel: str, data: bytes) -> int:
+        received = 0
+        if channel in self._channels:
+            self._messages.put({"type": "message", "pattern": None, "channel": channel.encode("utf-8"), "data": data})
+            received += 1
+        for pattern in self._patterns:
+            if fnmatch.fnmatchcase(channel, pattern):
+                self._messages.put({"type": "pmessage", "pattern": pattern.encode("utf-8"),
+                                    "channel": channel.encode("utf-8"), "data": data})
+                received += 1
+        return received
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        try:
+            return self._messages.get(timeout=timeout) if timeout else self._messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        with self._client._lock:
+            if self in self._client._subscribers:
+                self._client._subscribers.remove(self)
+        self._registered = False
+        self._channels.clear()
+        self._patterns.clear()
+
+    reset = close
+
+
+_shared_client: Optional[MemoryRedis] = None
+_shared_lock = threading.Lock()
+
+
+def get_memory_redis() -> MemoryRedis:
+    """进程内共用的实例（RedisCache 每次重连都拿到同一份数据）"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = MemoryRedis()
+    return _shared_client
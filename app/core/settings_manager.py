@@ -2,6 +2,7 @@ from typing import Any, Dict, Optional
 from sqlalchemy.orm import Session
 from app.services.settings import SettingsService
 from app.core.database import get_db
+from app.core.invalidation_bus import TOPIC_SETTINGS, invalidation_bus
 import json
 import re
 
@@ -32,7 +33,7 @@ class SettingsManager:
         settings_service = self.get_settings_service(db)
         success = settings_service.set_config_value(key, value, config_type)
         if success:
-            self._settings_cache.clear()
+            invalidation_bus.publish(TOPIC_SETTINGS)
         return success
     def get_all_settings(self, db: Session = None) -> Dict[str, Any]:
         db = self._get_db(db)
@@ -159,3 +160,8 @@ class SettingsManager:
         }
 
 settings_manager = SettingsManager()
+
+def _on_settings_invalidated(payload):
+    SettingsManager._settings_cache.clear()
+
+invalidation_bus.subscribe(TOPIC_SETTINGS, _on_settings_invalidated)
@@ -7,7 +7,7 @@ from .notification import EmailTemplate, Notification
 from .node import Node
 from .payment import PaymentTransaction, PaymentCallback
 from .payment_config import PaymentConfig
-from .config import SystemConfig, Announcement, ThemeConfig
+from .config import SystemConfig, ConfigUpdateLog, ConfigGeneration, Announcement, ThemeConfig
 from .user_activity import UserActivity, SubscriptionReset, LoginHistory
 from .verification_code import VerificationCode
 from .verification_attempt import VerificationAttempt
@@ -69,6 +69,8 @@ __all__ = [
     "PaymentCallback",
     "Notification",
     "SystemConfig",
+    "ConfigUpdateLog",
+    "ConfigGeneration",
     "Announcement",
     "ThemeConfig",
     "UserActivity",
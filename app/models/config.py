@@ -20,6 +20,32 @@ class SystemConfig(Base):
     def __repr__(self):
         return f"<SystemConfig(id={self.id}, key='{self.key}', category='{self.category}')>"
 
+class ConfigUpdateLog(Base):
+    """配置更新运行日志（只追加，按 id 保留最近若干条）"""
+    __tablename__ = "config_update_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    level = Column(String(20), nullable=False, default='info')
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ConfigUpdateLog(id={self.id}, level='{self.level}')>"
+
+class ConfigGeneration(Base):
+    """已发布的配置代次（每次内容变化记录一条）"""
+    __tablename__ = "config_generations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False, index=True)  # clash, v2ray
+    content_hash = Column(String(64), nullable=False)
+    size = Column(Integer, nullable=False, default=0)
+    file_path = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ConfigGeneration(id={self.id}, kind='{self.kind}', content_hash='{self.content_hash[:12]}')>"
+
 class Announcement(Base):
     __tablename__ = "announcements"
 
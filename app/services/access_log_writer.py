@@ -0,0 +1,153 @@
+"""订阅访问日志异步批量写入服务"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+INSERT_ACCESS_LOG_SQL = text("""
+    INSERT INTO subscription_access_logs (
+        subscription_id, device_id, ip_address, user_agent,
+        access_type, response_status, response_message, access_time
+    ) VALUES (
+        :subscription_id, :device_id, :ip_address, :user_agent,
+        :access_type, :response_status, :response_message, :access_time
+    )
+""")
+
+
+class AccessLogWriter:
+    """访问日志写入器
+
+    请求线程只把日志行放入有界队列，由后台线程每 batch_size 行或每 flush_interval_ms 毫秒
+    合并为一次批量插入并提交。队列满时直接丢弃并计数，请求线程不会等待日志提交。
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval_ms: int = 500, max_queue_size: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.flush_count = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="AccessLogWriter")
+            self._thread.start()
+            logger.info(f"访问日志写入器已启动（批量 {self.batch_size} 行 / {self.flush_interval_ms} 毫秒）")
+
+    def stop(self, timeout: float = 10):
+        """停止写入器并写完队列中剩余的日志"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning("访问日志写入器线程未能及时停止")
+        self._write(self._drain())
+        logger.info(f"访问日志写入器已停止: {self.get_stats()}")
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        """提交一行访问日志，队列已满时丢弃并返回 False"""
+        if not self._stop_event.is_set() and (self._thread is None or not self._thread.is_alive()):
+            self.start()
+        row.setdefault('access_time', datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped_count += 1
+                dropped = self.dropped_count
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"访问日志队列已满，已丢弃 {dropped} 行")
+            return False
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written_count,
+            "dropped": self.dropped_count,
+            "failed": self.failed_count,
+            "flushes": self.flush_count
+        }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = self._collect_batch()
+                if batch:
+                    self._write(batch)
+            except Exception as e:
+                logger.error(f"访问日志写入循环异常: {e}", exc_info=True)
+                time.sleep(1)
+
+    def _collect_batch(self) -> List[Dict[str, Any]]:
+        interval = self.flush_interval_ms / 1000
+        try:
+            batch = [self._queue.get(timeout=interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                db.execute(INSERT_ACCESS_LOG_SQL, rows[start:start + self.batch_size])
+            db.commit()
+            with self._lock:
+                self.written_count += len(rows)
+                self.flush_count += 1
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.failed_count += len(rows)
+            logger.error(f"批量写入访问日志失败（{len(rows)} 行）: {e}")
+        finally:
+            db.close()
+
+
+access_log_writer = AccessLogWriter(
+    batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.ACCESS_LOG_FLUSH_INTERVAL_MS,
+    max_queue_size=settings.ACCESS_LOG_QUEUE_SIZE
+)
+
+
+def get_access_log_writer() -> AccessLogWriter:
+    return access_log_writer
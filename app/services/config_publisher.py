@@ -0,0 +1,97 @@
+"""配置发布 - 按内容哈希生成配置代次，原子写入配置文件"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.config import ConfigGeneration
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigPublisher:
+    """配置发布器
+
+    每种配置（clash / v2ray）每次内容变化记录一条 ConfigGeneration，代次 id 单调递增，
+    下游缓存可以用代次 id 判断配置是否变化。内容哈希与最新代次、数据库中当前生效的配置都相同且文件仍存在时，
+    不再写文件和数据库；管理员手动修改过 system_configs 中的配置时哈希不一致，会重新发布。
+    文件先写入同目录的临时文件再 os.replace 替换，读取方不会看到写了一半的文件。
+    """
+
+    def __init__(self, retention: int = 50):
+        self.retention = max(1, retention)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_latest(db: Session, kind: str) -> Optional[ConfigGeneration]:
+        return db.query(ConfigGeneration).filter(
+            ConfigGeneration.kind == kind
+        ).order_by(ConfigGeneration.id.desc()).first()
+
+    def latest_generation_id(self, db: Session, kind: str) -> int:
+        """返回最新代次 id，还没有发布过时返回 0"""
+        latest = self.get_latest(db, kind)
+        return latest.id if latest else 0
+
+    def is_unchanged(self, db: Session, kind: str, content_hash: str, output_file: str,
+                     stored_content: Optional[str]) -> Optional[ConfigGeneration]:
+        """内容与最新代次、数据库中当前生效的配置（stored_content）都相同且文件存在时返回该代次，否则返回 None"""
+        if stored_content is None or self.content_hash(stored_content) != content_hash:
+            return None
+        latest = self.get_latest(db, kind)
+        if latest is not None and latest.content_hash == content_hash and os.path.exists(output_file):
+            return latest
+        return None
+
+    @staticmethod
+    def write_atomic(output_file: str, content: str):
+        directory = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(output_file)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, output_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def record(self, db: Session, kind: str, content_hash: str, size: int, output_file: str) -> ConfigGeneration:
+        """记录新代次并清理旧代次（不提交，由调用方与配置内容一起提交）"""
+        generation = ConfigGeneration(
+            kind=kind,
+            content_hash=content_hash,
+            size=size,
+            file_path=output_file,
+            created_at=datetime.now()
+        )
+        db.add(generation)
+        db.flush()
+        expired = db.query(ConfigGeneration.id).filter(
+            ConfigGeneration.kind == kind
+        ).order_by(ConfigGeneration.id.desc()).offset(self.retention).first()
+        if expired is not None:
+            db.query(ConfigGeneration).filter(
+                ConfigGeneration.kind == kind,
+                ConfigGeneration.id <= expired.id
+            ).delete(synchronize_session=False)
+        return generation
+
+
+config_publisher = ConfigPublisher(retention=settings.CONFIG_GENERATION_RETENTION)
+
+
+def get_config_publisher() -> ConfigPublisher:
+    return config_publisher
@@ -0,0 +1,222 @@
+"""配置更新运行日志存储 - 内存缓冲、定期批量追加写入，按 id 分页读取"""
+import collections
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+INSERT_LOG_SQL = text("""
+    INSERT INTO config_update_logs (level, message, created_at)
+    VALUES (:level, :message, :created_at)
+""")
+
+
+class ConfigUpdateLogStore:
+    """配置更新日志存储
+
+    append 只把日志放进内存（O(1)），后台线程每 flush_interval_ms 毫秒或积累 batch_size 条时
+    批量插入 config_update_logs 表；每次写入后按 id 只保留最近 retention 条。
+    读取时按 id 倒序取末尾 limit 条，再接上内存中尚未写入的日志，读取不会触发写入。
+    """
+
+    def __init__(self, flush_interval_ms: int = 1000, batch_size: int = 200, retention: int = 1000):
+        self.flush_interval_ms = flush_interval_ms
+        self.batch_size = max(1, batch_size)
+        self.retention = max(1, retention)
+        self._pending: List[Dict[str, Any]] = []
+        # 正在写入的一批日志；_flush_epoch 为顺序锁，写入开始和结束时各递增一次，写入期间为奇数
+        self._inflight: List[Dict[str, Any]] = []
+        self._flush_epoch = 0
+        self._recent = collections.deque(maxlen=self.retention)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.written_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+        self.flush_count = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="ConfigUpdateLogStore")
+            self._thread.start()
+            logger.info(f"配置更新日志写入器已启动（间隔 {self.flush_interval_ms} 毫秒）")
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程并写入剩余日志"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self.flush()
+        logger.info(f"配置更新日志写入器已停止: {self.get_stats()}")
+
+    def append(self, level: str, message: str, created_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """追加一条日志，返回日志内容"""
+        if not self._stop_event.is_set() and (self._thread is None or not self._thread.is_alive()):
+            self.start()
+        row = {'level': level, 'message': message, 'created_at': created_at or datetime.now()}
+        with self._lock:
+            self._pending.append(row)
+            self._recent.append(row)
+            pending_count = len(self._pending)
+        if pending_count >= self.batch_size:
+            self._wakeup.set()
+        return self._format(row)
+
+    def flush(self) -> int:
+        """立即写入缓冲区中的日志，返回写入条数"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._inflight = self._pending
+                self._pending = []
+                self._flush_epoch += 1
+            db = SessionLocal()
+            try:
+                db.execute(INSERT_LOG_SQL, batch)
+                max_id = db.execute(text("SELECT MAX(id) FROM config_update_logs")).scalar()
+                if max_id is not None and max_id > self.retention:
+                    db.execute(text("DELETE FROM config_update_logs WHERE id <= :min_id"),
+                               {'min_id': max_id - self.retention})
+                db.commit()
+                self.written_count += len(batch)
+                self.flush_count += 1
+                return len(batch)
+            except Exception as e:
+                db.rollback()
+                self.failed_count += len(batch)
+                logger.error(f"写入配置更新日志失败（{len(batch)} 条），下次写入时重试: {e}")
+                with self._lock:
+                    self._requeue(batch)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = []
+                    self._flush_epoch += 1
+                db.close()
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """写入失败的日志放回缓冲区最前面（调用方持有 _lock），缓冲区最多保留 retention 条，超出时丢弃最旧的"""
+        self._pending = batch + self._pending
+        overflow = len(self._pending) - self.retention
+        if overflow > 0:
+            self._pending = self._pending[overflow:]
+            self.dropped_count += overflow
+            logger.warning(f"配置更新日志缓冲区已满，丢弃最旧的 {overflow} 条")
+
+    def get_logs(self, limit: int = 100, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按时间顺序返回最近 limit 条日志；传入 before_id 时返回该 id 之前的 limit 条
+
+        最新一页在表中数据之后接上尚未写入数据库的日志（没有 id）。读取前后检查 _flush_epoch，
+        期间有一批日志开始或完成写入时重新读取；多次都不稳定时只返回表中数据（最新几条可能暂时缺失，但不会重复）。
+        """
+        db = SessionLocal()
+        try:
+            params = {'limit': limit}
+            where = ""
+            if before_id is not None:
+                where = "WHERE id < :before_id"
+                params['before_id'] = before_id
+            query = text(f"SELECT id, level, message, created_at FROM config_update_logs {where} ORDER BY id DESC LIMIT :limit")
+            for _ in range(3):
+                with self._lock:
+                    epoch = self._flush_epoch
+                    buffered = self._inflight + self._pending if before_id is None else []
+                if epoch % 2 == 0:
+                    rows = db.execute(query, params).fetchall()
+                    if self._flush_epoch == epoch:
+                        break
+                    db.rollback()
+                # 等待正在进行的写入结束（最多 0.5 秒），只等待不写入
+                if self._flush_lock.acquire(timeout=0.5):
+                    self._flush_lock.release()
+            else:
+                buffered = []
+                rows = db.execute(query, params).fetchall()
+            logs = [self._format(row._mapping) for row in reversed(rows)]
+            logs.extend(self._format(row) for row in buffered)
+            return logs[-limit:]
+        except Exception as e:
+            logger.error(f"读取配置更新日志失败: {e}")
+            if before_id is not None:
+                return []
+            with self._lock:
+                recent = list(self._recent)[-limit:]
+            return [self._format(row) for row in recent]
+        finally:
+            db.close()
+
+    def clear(self):
+        with self._flush_lock:
+            with self._lock:
+                self._pending = []
+                self._inflight = []
+                self._recent.clear()
+            db = SessionLocal()
+            try:
+                db.execute(text("DELETE FROM config_update_logs"))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "written": self.written_count,
+            "failed": self.failed_count,
+            "dropped": self.dropped_count,
+            "flushes": self.flush_count
+        }
+
+    @staticmethod
+    def _format(row) -> Dict[str, Any]:
+        created_at = row['created_at']
+        entry = {
+            # SQLite 返回 "YYYY-MM-DD HH:MM:SS.ffffff" 字符串，统一为 ISO 格式
+            "timestamp": created_at.isoformat() if isinstance(created_at, datetime) else str(created_at).replace(' ', 'T', 1),
+            "level": row['level'],
+            "message": row['message']
+        }
+        if 'id' in row:
+            entry["id"] = row['id']
+        return entry
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000
+        while not self._stop_event.is_set():
+            self._wakeup.wait(timeout=interval)
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"配置更新日志写入循环异常: {e}", exc_info=True)
+
+
+config_update_log_store = ConfigUpdateLogStore(
+    flush_interval_ms=settings.CONFIG_UPDATE_LOG_FLUSH_INTERVAL_MS,
+    batch_size=settings.CONFIG_UPDATE_LOG_BATCH_SIZE,
+    retention=settings.CONFIG_UPDATE_LOG_RETENTION
+)
+
+
+def get_config_update_log_store() -> ConfigUpdateLogStore:
+    return config_update_log_store
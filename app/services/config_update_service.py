@@ -11,12 +11,21 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-import requests
 import yaml
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.config import SystemConfig
+from app.services.config_publisher import config_publisher
+from app.services.config_update_log_store import config_update_log_store
+from app.services.node_ir import NodeIR, NodeIRSet
+from app.services.node_link_extractor import extract_node_links, is_base64_text
+from app.services.node_parse_pool import node_parse_pool
+from app.services.node_source_fetcher import NodeSourceFetcher
+from app.services.parsed_node_store import ParsedNodeStore
+from app.services.region_classifier import region_classifier
+from app.services.subscription_payload import PAYLOAD_CLASH, PAYLOAD_V2RAY, publish_subscription_payload
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +37,10 @@ def unicode_decode(s):
         return s
 
 
+# 节点解析缓存文件（保存在配置输出目录）
+PARSED_NODE_STORE_FILE = ".parsed_nodes.json"
+
+
 class ConfigUpdateService:
     """配置更新服务类"""
 
@@ -38,6 +51,8 @@ class ConfigUpdateService:
         self.scheduled_thread = None
         self.logs = []
         self.max_logs = 100
+        self._node_store = None
+        self._force_publish = False
         self.default_config = {
             "urls": [],
             "target_dir": "./uploads/config",
@@ -45,7 +60,8 @@ class ConfigUpdateService:
             "clash_file": "clash.yaml",
             "update_interval": 3600,
             "enable_schedule": False,
-            "filter_keywords": []
+            "filter_keywords": [],
+            "filter_regions": []
         }
 
     def get_status(self) -> Dict[str, Any]:
@@ -60,11 +76,13 @@ class ConfigUpdateService:
     def is_running(self) -> bool:
         return self.is_running_flag
     
-    def run_update_task(self):
+    def run_update_task(self, force: bool = False):
+        """执行配置更新；force=True 时即使内容未变化也重新写入配置文件和数据库"""
         if self.is_running_flag:
             self._add_log("任务已在运行中", "warning")
             return
         self.is_running_flag = True
+        self._force_publish = force
         self._add_log("开始执行配置更新任务", "info")
         db = SessionLocal()
         try:
@@ -81,14 +99,27 @@ class ConfigUpdateService:
             self._add_log(f"📁 目标目录: {target_dir}", "info")
             nodes = self._download_and_process_nodes(config)
             if nodes:
+                node_store = ParsedNodeStore(
+                    os.path.join(target_dir, PARSED_NODE_STORE_FILE),
+                    retention_runs=settings.CONFIG_PARSED_NODE_RETENTION_RUNS
+                )
+                node_store.load()
+                node_store.begin_run()
+                self._node_store = node_store
                 self._add_log(f"📝 开始生成配置文件，共 {len(nodes)} 个节点", "info")
                 filter_keywords = config.get("filter_keywords", [])
+                node_set = self._build_node_ir(nodes, filter_keywords, config.get("filter_regions", []))
                 v2ray_file = os.path.join(target_dir, config.get("v2ray_file", "xr"))
                 self._add_log(f"🔧 正在生成V2Ray配置文件: {v2ray_file}", "info")
-                self._generate_v2ray_config(nodes, v2ray_file, filter_keywords)
+                self._generate_v2ray_config(node_set, v2ray_file)
                 clash_file = os.path.join(target_dir, config.get("clash_file", "clash.yaml"))
                 self._add_log(f"🔧 正在生成Clash配置文件: {clash_file}", "info")
-                self._generate_clash_config(nodes, clash_file, filter_keywords)
+                self._generate_clash_config(node_set, clash_file)
+                try:
+                    node_store.finish_run()
+                    self._add_log(f"🗃️ 节点解析缓存: 命中 {node_store.hits}，新解析 {node_store.misses}，清除 {node_store.evicted}，共 {len(node_store)} 条", "info")
+                except Exception as e:
+                    self._add_log(f"⚠️ 保存节点解析缓存失败: {str(e)}", "warning")
                 self._add_log(f"🎉 配置更新完成！成功处理了 {len(nodes)} 个节点", "success")
                 self._update_last_update_time()
             else:
@@ -99,7 +130,10 @@ class ConfigUpdateService:
             logger.error(f"配置更新失败: {str(e)}", exc_info=True)
         finally:
             time.sleep(1)
+            self._node_store = None
+            self._force_publish = False
             self.is_running_flag = False
+            config_update_log_store.flush()
             if db:
                 db.close()
     
@@ -147,21 +181,43 @@ class ConfigUpdateService:
             self._add_log("⚠️ 警告：未配置过滤关键词，将不过滤任何节点", "warning")
         else:
             self._add_log(f"🔍 过滤关键词: {', '.join(filter_keywords)} (将根据节点名称过滤)", "info")
-        for i, url in enumerate(urls, 1):
+        source_cache = self._load_source_cache()
+        self._add_log(f"📥 并发下载 {len(urls)} 个节点源（每个主机最多 {settings.CONFIG_SOURCE_PER_HOST_LIMIT} 个连接）", "info")
+        fetcher = NodeSourceFetcher(
+            timeout=settings.CONFIG_SOURCE_TIMEOUT,
+            deadline=settings.CONFIG_SOURCE_DEADLINE,
+            per_host_limit=settings.CONFIG_SOURCE_PER_HOST_LIMIT
+        )
+        results = fetcher.fetch_all(urls, source_cache)
+        new_source_cache = {}
+        for i, (url, result) in enumerate(zip(urls, results), 1):
             try:
-                self._add_log(f"📥 [{i}/{len(urls)}] 正在下载节点源: {url}", "info")
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                content = response.text
-                content_size = len(content)
-                self._add_log(f"📊 下载完成，内容大小: {content_size} 字符", "info")
-                if self._is_base64(content):
-                    try:
-                        content = base64.b64decode(content).decode('utf-8')
-                        self._add_log(f"🔓 Base64解码成功，解码后大小: {len(content)} 字符", "info")
-                    except:
-                        self._add_log(f"⚠️ Base64解码失败，使用原始内容", "warning")
-                node_links = self._extract_node_links(content)
+                cached = source_cache.get(url) or {}
+                if result.not_modified and 'links' in cached:
+                    node_links = cached['links']
+                    new_source_cache[url] = cached
+                    self._add_log(f"♻️ [{i}/{len(urls)}] 节点源未变化(304)，复用上次解析的 {len(node_links)} 个节点链接 ({result.elapsed:.1f}s)", "info")
+                else:
+                    if not result.ok:
+                        raise RuntimeError(result.error)
+                    if result.not_modified:
+                        raise RuntimeError("源站返回304但没有可复用的解析结果")
+                    content = result.content or ""
+                    content_size = len(content)
+                    self._add_log(f"📊 [{i}/{len(urls)}] 下载完成，内容大小: {content_size} 字符 ({result.elapsed:.1f}s)", "info")
+                    if self._is_base64(content):
+                        try:
+                            content = base64.b64decode(content).decode('utf-8')
+                            self._add_log(f"🔓 Base64解码成功，解码后大小: {len(content)} 字符", "info")
+                        except:
+                            self._add_log(f"⚠️ Base64解码失败，使用原始内容", "warning")
+                    node_links = self._extract_node_links(content)
+                    if result.etag or result.last_modified:
+                        new_source_cache[url] = {
+                            'etag': result.etag,
+                            'last_modified': result.last_modified,
+                            'links': node_links
+                        }
                 self._add_log(f"🔗 从 {url} 提取到 {len(node_links)} 个节点链接", "info")
                 if node_links and len(node_links) > 0:
                     sample_url = node_links[0]
@@ -203,40 +259,49 @@ class ConfigUpdateService:
                 self._add_log(f"✅ [{i}/{len(urls)}] 从 {url} 成功获取 {len(node_links)} 个节点", "success")
             except Exception as e:
                 self._add_log(f"❌ [{i}/{len(urls)}] 下载 {url} 失败: {str(e)}", "error")
+                if url in source_cache:
+                    new_source_cache[url] = source_cache[url]
+        self._save_source_cache(new_source_cache)
         total_count = len(nodes)
         self._add_log(f"🎉 节点采集完成！总共获得 {total_count} 个节点", "success")
         return nodes
     
-    def _is_base64(self, text: str) -> bool:
+    def _load_source_cache(self) -> Dict[str, Dict[str, Any]]:
+        """读取各节点源上次的 ETag/Last-Modified 和解析出的节点链接"""
         try:
-            clean_text = ''.join(text.split())
-            if len(clean_text) % 4 != 0:
-                return False
-            base64.b64decode(clean_text)
-            return True
-        except:
-            try:
-                base64.b64decode(text)
-                return True
-            except:
-                return False
+            cache_record = self.db.query(SystemConfig).filter(SystemConfig.key == "config_update_source_cache").first()
+            if cache_record and cache_record.value:
+                return json.loads(cache_record.value)
+        except Exception as e:
+            logger.warning(f"读取节点源缓存失败: {str(e)}")
+        return {}
+
+    def _save_source_cache(self, source_cache: Dict[str, Dict[str, Any]]):
+        """保存节点源缓存，只保留当前配置中的节点源"""
+        try:
+            cache_record = self.db.query(SystemConfig).filter(SystemConfig.key == "config_update_source_cache").first()
+            if cache_record:
+                cache_record.value = json.dumps(source_cache, ensure_ascii=False)
+            else:
+                cache_record = SystemConfig(
+                    key="config_update_source_cache",
+                    value=json.dumps(source_cache, ensure_ascii=False),
+                    type="json",
+                    category="general",
+                    display_name="节点源缓存",
+                    description="节点源条件请求校验信息及上次解析结果"
+                )
+                self.db.add(cache_record)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"保存节点源缓存失败: {str(e)}")
+
+    def _is_base64(self, text: str) -> bool:
+        return is_base64_text(text)
     
     def _extract_node_links(self, content: str) -> List[str]:
-        patterns = [
-            r'vmess://[A-Za-z0-9+/=]+',
-            r'vless://[A-Za-z0-9+/=@:?#%.-]+',
-            r'ss://[A-Za-z0-9+/=@:?#%.-]+',
-            r'ssr://[A-Za-z0-9+/=]+',
-            r'trojan://[A-Za-z0-9-]+@[^:\s]+:\d+(?:[?&][^#\s]*)?(?:#[^\s]*)?',
-            r'hysteria2://[A-Za-z0-9+/=@:?#%.-]+',
-            r'hy2://[A-Za-z0-9+/=@:?#%.-]+',
-            r'tuic://[A-Za-z0-9+/=@:?#%.-]+'
-        ]
-        links = []
-        for pattern in patterns:
-            matches = re.findall(pattern, content)
-            links.extend(matches)
-        return links
+        return extract_node_links(content)
     
     def _filter_nodes(self, nodes: List[str], keywords: List[str]) -> List[str]:
         filtered = []
@@ -245,28 +310,73 @@ class ConfigUpdateService:
                 filtered.append(node)
         return filtered
     
-    def _generate_v2ray_config(self, nodes: List[Dict[str, Any]], output_file: str, filter_keywords: List[str] = None):
-        try:
-            self._add_log(f"📋 开始生成V2Ray配置，节点数量: {len(nodes)}", "info")
-            first_source_nodes = [node for node in nodes if node.get('is_first_source', False)]
-            other_source_nodes = [node for node in nodes if not node.get('is_first_source', False)]
-            ordered_nodes = first_source_nodes + other_source_nodes
-            filtered_count = 0
-            filtered_node_urls = []
-            for node_info in ordered_nodes:
-                node_url = node_info['url']
-                if filter_keywords:
-                    proxy = self._parse_node_without_rename(node_url)
-                    if proxy:
-                        node_name = proxy.get('name')
-                        if not node_name:
-                            node_name = f"{proxy.get('server', 'node')}:{proxy.get('port', '0')}"
-                        if any(keyword in node_name for keyword in filter_keywords):
-                            filtered_count += 1
+    def _build_node_ir(self, nodes: List[Dict[str, Any]], filter_keywords: List[str] = None,
+                       filter_regions: List[str] = None) -> NodeIRSet:
+        """一次完成节点解析、关键词/地区过滤、去重和名称去重，结果供 V2Ray/Clash 输出共用"""
+        self._add_log(f"🔍 开始解析 {len(nodes)} 个节点", "info")
+        ir_nodes = []
+        seen_nodes = set()  # 用于去重
+        name_counter = {}  # 用于确保节点名称唯一
+        failed_count = 0
+        parsed_proxies = self._parse_nodes([node_info['url'] for node_info in nodes])
+        for i, node_info in enumerate(nodes, 1):
+            node = NodeIR(node_info['url'], node_info.get('source_index', 0), node_info.get('is_first_source', False))
+            ir_nodes.append(node)
+            try:
+                proxy = parsed_proxies[i - 1]
+                if proxy:
+                    if not proxy.get('name'):
+                        proxy['name'] = f"{proxy.get('server', 'node')}:{proxy.get('port', '0')}"
+                    node.proxy = proxy
+                    node_name = proxy['name']
+                    node.name = node_name
+                    if i <= 3:
+                        self._add_log(f"   节点 {i} 解析结果: 名称='{node_name}' (长度: {len(node_name)})", "info")
+                    if filter_keywords and any(keyword in node_name for keyword in filter_keywords):
+                        node.filtered = True
+                        continue
+                    if filter_regions:
+                        node.region = region_classifier.classify(node_name)
+                        if node.region in filter_regions:
+                            node.filtered = True
                             continue
-                filtered_node_urls.append(node_url)
-            if filter_keywords and filtered_count > 0:
-                self._add_log(f"🔍 根据节点名称过滤掉 {filtered_count} 个节点（V2Ray配置）", "info")
+                    # 生成节点唯一标识用于去重
+                    node_key = self._get_node_key(proxy)
+                    if node_key in seen_nodes:
+                        node.duplicate = True
+                        continue
+                    seen_nodes.add(node_key)
+                    # 确保节点名称唯一
+                    if node_name in name_counter:
+                        name_counter[node_name] += 1
+                        proxy['name'] = f"{node_name}-{name_counter[node_name]}"
+                    else:
+                        name_counter[node_name] = 0
+                else:
+                    failed_count += 1
+                    if failed_count <= 5:
+                        self._add_log(f"⚠️ 第 {i} 个节点解析失败: {node.node_type} 节点格式错误", "warning")
+            except Exception as e:
+                node.proxy = None
+                failed_count += 1
+                if failed_count <= 5:
+                    self._add_log(f"⚠️ 处理第 {i} 个节点异常: {str(e)}", "warning")
+            if i % 1000 == 0:
+                self._add_log(f"📊 已处理 {i}/{len(nodes)} 个节点", "info")
+        node_set = NodeIRSet(ir_nodes)
+        if (filter_keywords or filter_regions) and node_set.filtered_count > 0:
+            self._add_log(f"🔍 根据节点名称/地区过滤掉 {node_set.filtered_count} 个节点", "info")
+        if node_set.duplicate_count > 0:
+            self._add_log(f"🔄 去重完成: 移除了 {node_set.duplicate_count} 个重复节点", "info")
+        self._add_log(f"📊 解析完成: 成功 {len(ir_nodes) - node_set.failed_count} 个节点，失败 {node_set.failed_count} 个", "info")
+        return node_set
+
+    def _generate_v2ray_config(self, node_set: NodeIRSet, output_file: str):
+        try:
+            self._add_log(f"📋 开始生成V2Ray配置，节点数量: {len(node_set)}", "info")
+            filtered_node_urls = node_set.v2ray_links()
+            if node_set.filtered_count > 0:
+                self._add_log(f"🔍 根据节点名称过滤掉 {node_set.filtered_count} 个节点（V2Ray配置）", "info")
             content = '\n'.join(filtered_node_urls)
             content_size = len(content)
             self._add_log(f"📊 节点内容大小: {content_size} 字符", "info")
@@ -274,96 +384,22 @@ class ConfigUpdateService:
             encoded_size = len(encoded_content)
             self._add_log(f"🔐 Base64编码完成，编码后大小: {encoded_size} 字符", "info")
             
-            # 先保存到文件
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(encoded_content)
-            file_size = os.path.getsize(output_file)
-            self._add_log(f"💾 V2Ray配置文件已保存: {output_file} (大小: {file_size} 字节)", "info")
-            
-            # 立即同步到数据库（确保订阅服务能获取最新配置）
-            self._save_v2ray_config_to_db(encoded_content)
-            self._add_log(f"💾 V2Ray配置已同步到数据库", "info")
-            
+            self._publish_config(PAYLOAD_V2RAY, "V2Ray", encoded_content, output_file,
+                                 ('v2ray_config', 'v2ray'), self._save_v2ray_config_to_db)
             self._add_log(f"✅ V2Ray配置生成完成！文件: {output_file}", "success")
         except Exception as e:
             self._add_log(f"❌ 生成V2Ray配置失败: {str(e)}", "error")
             raise
     
-    def _generate_clash_config(self, nodes: List[Dict[str, Any]], output_file: str, filter_keywords: List[str] = None):
+    def _generate_clash_config(self, node_set: NodeIRSet, output_file: str):
         try:
-            self._add_log(f"📋 开始生成Clash配置，节点数量: {len(nodes)}", "info")
-            proxies = []
-            proxy_names = []
-            node_type_count = {}
-            failed_count = 0
-            filtered_count = 0
-            seen_nodes = set()  # 用于去重
-            name_counter = {}  # 用于确保节点名称唯一
-            self._add_log(f"🔍 开始解析 {len(nodes)} 个节点为Clash格式", "info")
-            for i, node_info in enumerate(nodes, 1):
-                try:
-                    node_url = node_info['url']
-                    if node_url.startswith('ss://'):
-                        node_type = 'SS'
-                    elif node_url.startswith('ssr://'):
-                        node_type = 'SSR'
-                    elif node_url.startswith('vmess://'):
-                        node_type = 'VMess'
-                    elif node_url.startswith('trojan://'):
-                        node_type = 'Trojan'
-                    elif node_url.startswith('vless://'):
-                        node_type = 'VLESS'
-                    elif node_url.startswith('hysteria2://') or node_url.startswith('hy2://'):
-                        node_type = 'Hysteria2'
-                    elif node_url.startswith('tuic://'):
-                        node_type = 'TUIC'
-                    else:
-                        node_type = 'Unknown'
-                    proxy = self._parse_node_without_rename(node_url)
-                    if proxy:
-                        if not proxy.get('name'):
-                            proxy['name'] = f"{proxy.get('server', 'node')}:{proxy.get('port', '0')}"
-                        node_name = proxy['name']
-                        if i <= 3:
-                            self._add_log(f"   节点 {i} 解析结果: 名称='{node_name}' (长度: {len(node_name)})", "info")
-                        if filter_keywords and any(keyword in node_name for keyword in filter_keywords):
-                            filtered_count += 1
-                            continue
-                        # 生成节点唯一标识用于去重
-                        node_key = self._get_node_key(proxy)
-                        if node_key in seen_nodes:
-                            continue  # 跳过重复节点
-                        seen_nodes.add(node_key)
-                        # 确保节点名称唯一
-                        original_name = node_name
-                        if node_name in name_counter:
-                            name_counter[node_name] += 1
-                            node_name = f"{original_name}-{name_counter[node_name]}"
-                            proxy['name'] = node_name
-                        else:
-                            name_counter[node_name] = 0
-                        proxies.append(proxy)
-                        proxy_names.append(node_name)
-                        node_type_count[node_type] = node_type_count.get(node_type, 0) + 1
-                    else:
-                        failed_count += 1
-                        if failed_count <= 5:
-                            self._add_log(f"⚠️ 第 {i} 个节点解析失败: {node_type} 节点格式错误", "warning")
-                    if i % 100 == 0:
-                        self._add_log(f"📊 已处理 {i}/{len(nodes)} 个节点", "info")
-                except Exception as e:
-                    failed_count += 1
-                    if failed_count <= 5:
-                        self._add_log(f"⚠️ 处理第 {i} 个节点异常: {str(e)}", "warning")
-            if filter_keywords and filtered_count > 0:
-                self._add_log(f"🔍 根据节点名称过滤掉 {filtered_count} 个节点", "info")
-            duplicate_count = len(nodes) - len(proxies) - failed_count - filtered_count
-            if duplicate_count > 0:
-                self._add_log(f"🔄 去重完成: 移除了 {duplicate_count} 个重复节点", "info")
+            self._add_log(f"📋 开始生成Clash配置，节点数量: {len(node_set)}", "info")
+            proxies = node_set.clash_proxies()
+            proxy_names = [proxy['name'] for proxy in proxies]
+            node_type_count = node_set.clash_type_count()
             if node_type_count:
                 type_info = ', '.join([f"{k}: {v}" for k, v in node_type_count.items()])
                 self._add_log(f"📈 成功解析节点类型统计: {type_info}", "info")
-            self._add_log(f"📊 解析完成: 成功 {len(proxies)} 个节点，失败 {failed_count} 个", "info")
             if not proxies:
                 self._add_log("❌ 没有有效的节点可以生成Clash配置", "error")
                 return
@@ -372,31 +408,43 @@ class ConfigUpdateService:
             config_size = len(clash_config_content)
             self._add_log(f"📊 Clash配置内容大小: {config_size} 字符", "info")
             
-            # 先保存到文件
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(clash_config_content)
-            file_size = os.path.getsize(output_file)
-            self._add_log(f"💾 Clash配置文件已保存: {output_file} (大小: {file_size} 字节)", "info")
-            
-            # 立即同步到数据库（确保订阅服务能获取最新配置）
-            self._save_clash_config_to_db(clash_config_content)
-            self._add_log(f"💾 Clash配置已同步到数据库", "info")
+            changed = self._publish_config(PAYLOAD_CLASH, "Clash", clash_config_content, output_file,
+                                           ('clash_config', 'clash'), self._save_clash_config_to_db)
             
             # 清除节点服务缓存
-            try:
-                from app.services.node_service import NodeService
-                node_service = NodeService(self.db)
-                node_service.clear_cache()
-                node_service.close()
-                self._add_log(f"🔄 节点服务缓存已清除", "info")
-            except Exception as e:
-                self._add_log(f"⚠️ 清除节点缓存失败: {str(e)}", "warning")
+            if changed:
+                try:
+                    from app.services.node_service import NodeService
+                    node_service = NodeService(self.db)
+                    node_service.clear_cache()
+                    node_service.close()
+                    self._add_log(f"🔄 节点服务缓存已清除", "info")
+                except Exception as e:
+                    self._add_log(f"⚠️ 清除节点缓存失败: {str(e)}", "warning")
             
             self._add_log(f"✅ Clash配置生成完成！文件: {output_file}，共 {len(proxies)} 个节点", "success")
         except Exception as e:
             self._add_log(f"❌ 生成Clash配置失败: {str(e)}", "error")
             raise
     
+    def _publish_config(self, kind: str, label: str, content: str, output_file: str, db_key, save_to_db) -> bool:
+        """按内容哈希发布配置，内容与上次发布及数据库中当前配置都相同时跳过写文件和数据库，返回是否发布了新代次"""
+        content_hash = config_publisher.content_hash(content)
+        if not self._force_publish:
+            stored_content = self._get_stored_config(*db_key)
+            current = config_publisher.is_unchanged(self.db, kind, content_hash, output_file, stored_content)
+            if current is not None:
+                self._add_log(f"⏭️ {label}配置内容未变化（代次 {current.id}），跳过写入", "info")
+                return False
+        # 先原子替换文件，再把新代次和配置内容在同一个事务中写入数据库
+        config_publisher.write_atomic(output_file, content)
+        file_size = os.path.getsize(output_file)
+        self._add_log(f"💾 {label}配置文件已保存: {output_file} (大小: {file_size} 字节)", "info")
+        generation_id = config_publisher.record(self.db, kind, content_hash, file_size, output_file).id
+        save_to_db(content)
+        self._add_log(f"💾 {label}配置已同步到数据库（代次 {generation_id}）", "info")
+        return True
+
     def _create_basic_clash_config_fallback(self, proxies: List[Dict[str, Any]], proxy_names: List[str]) -> str:
         config = {
             "port": 7890,
@@ -516,58 +564,23 @@ class ConfigUpdateService:
             self._add_log(f"使用模板生成Clash配置失败: {str(e)}", "error")
             return self._create_basic_clash_config_fallback(proxies, proxy_names)
     
-    def get_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_logs(self, limit: int = 100, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
         try:
-            if self.logs:
-                return self.logs[-limit:] if len(self.logs) > limit else self.logs
-            if self.db is not None:
-                logs_record = self.db.query(SystemConfig).filter(SystemConfig.key == "config_update_logs").first()
-                if logs_record:
-                    logs_data = json.loads(logs_record.value)
-                    return logs_data[-limit:] if logs_data else []
-            return []
+            return config_update_log_store.get_logs(limit=limit, before_id=before_id)
         except Exception as e:
             logger.error(f"获取日志失败: {str(e)}")
             return self.logs[-limit:] if self.logs else []
     
     def _add_log(self, message: str, level: str = "info"):
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "level": level,
-            "message": message
-        }
+        log_entry = config_update_log_store.append(level, message)
         self.logs.append(log_entry)
         if len(self.logs) > self.max_logs:
-            self.logs = self.logs[-self.max_logs:]
+            del self.logs[0]
+        logger.info(f"配置更新日志: {message}")
 
-        try:
-            if self.db is None:
-                logger.warning("数据库连接无效，仅保存到内存")
-                return
-            logs_record = self.db.query(SystemConfig).filter(SystemConfig.key == "config_update_logs").first()
-            if logs_record:
-                logs_data = json.loads(logs_record.value)
-            else:
-                logs_data = []
-            logs_data.append(log_entry)
-            if len(logs_data) > self.max_logs:
-                logs_data = logs_data[-self.max_logs:]
-            if logs_record:
-                logs_record.value = json.dumps(logs_data)
-            else:
-                logs_record = SystemConfig(
-                    key="config_update_logs",
-                    value=json.dumps(logs_data),
-                    type="json",
-                    category="general",
-                    display_name="配置更新日志",
-                    description="配置更新操作日志"
-                )
-                self.db.add(logs_record)
-            self.db.commit()
-            logger.info(f"日志已保存到数据库: {message}")
-        except Exception as e:
-            logger.error(f"保存日志到数据库失败: {str(e)}")
+    def clear_logs(self):
+        self.logs.clear()
+        config_update_log_store.clear()
 
     def clear_old_logs(self, keep_recent: int = 50):
         """清理旧日志，只保留最近的N条"""
@@ -696,6 +709,8 @@ class ConfigUpdateService:
             validated["enable_schedule"] = config["enable_schedule"]
         if "filter_keywords" in config and isinstance(config["filter_keywords"], list):
             validated["filter_keywords"] = config["filter_keywords"]
+        if "filter_regions" in config and isinstance(config["filter_regions"], list):
+            validated["filter_regions"] = config["filter_regions"]
         return validated
     
     def get_generated_files(self) -> Dict[str, Any]:
@@ -832,6 +847,14 @@ class ConfigUpdateService:
             self._add_log(f"定时更新失败: {str(e)}", "error")
             logger.error(f"定时更新失败: {str(e)}", exc_info=True)
     
+    def _get_stored_config(self, key: str, config_type: str) -> Optional[str]:
+        """数据库中当前生效的配置内容（订阅优先读取这里），不存在时返回 None"""
+        config = self.db.query(SystemConfig.value).filter(
+            SystemConfig.key == key,
+            SystemConfig.type == config_type
+        ).first()
+        return config.value if config else None
+
     def _save_clash_config_to_db(self, config_content: str):
         """保存Clash配置到数据库 - 实时同步，确保订阅服务获取最新配置"""
         try:
@@ -853,6 +876,7 @@ class ConfigUpdateService:
                     "updated_at": current_time
                 })
                 self.db.commit()
+                publish_subscription_payload(PAYLOAD_CLASH)
                 self._add_log(f"✅ Clash配置已实时同步到数据库 (大小: {config_size} 字符)", "success")
             else:
                 insert_query = text("""
@@ -865,6 +889,7 @@ class ConfigUpdateService:
                     "updated_at": current_time
                 })
                 self.db.commit()
+                publish_subscription_payload(PAYLOAD_CLASH)
                 self._add_log(f"✅ Clash配置已创建并保存到数据库 (大小: {config_size} 字符)", "success")
         except Exception as e:
             self.db.rollback()
@@ -893,6 +918,7 @@ class ConfigUpdateService:
                     "updated_at": current_time
                 })
                 self.db.commit()
+                publish_subscription_payload(PAYLOAD_V2RAY)
                 self._add_log(f"✅ V2Ray配置已实时同步到数据库 (大小: {config_size} 字符)", "success")
             else:
                 insert_query = text("""
@@ -905,6 +931,7 @@ class ConfigUpdateService:
                     "updated_at": current_time
                 })
                 self.db.commit()
+                publish_subscription_payload(PAYLOAD_V2RAY)
                 self._add_log(f"✅ V2Ray配置已创建并保存到数据库 (大小: {config_size} 字符)", "success")
         except Exception as e:
             self.db.rollback()
@@ -912,7 +939,18 @@ class ConfigUpdateService:
             logger.error(f"保存V2Ray配置到数据库失败: {str(e)}", exc_info=True)
             raise
     
-    def _parse_node_without_rename(self, node_url: str) -> Optional[Dict[str, Any]]:
+    def _parse_nodes(self, node_urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批量解析节点，结果顺序与 node_urls 一致；已缓存的链接不重复解析"""
+        if self._node_store is not None:
+            return self._node_store.get_or_parse_many(node_urls, self._parse_nodes_uncached)
+        return self._parse_nodes_uncached(node_urls)
+
+    def _parse_nodes_uncached(self, node_urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        if node_parse_pool.should_parallelize(len(node_urls)):
+            self._add_log(f"⚙️ 使用 {node_parse_pool.workers} 个子进程解析 {len(node_urls)} 个新节点", "info")
+        return node_parse_pool.parse_all(node_urls, self._parse_node_uncached)
+
+    def _parse_node_uncached(self, node_url: str) -> Optional[Dict[str, Any]]:
         try:
             if node_url.startswith('vmess://'):
                 return self._parse_vmess_raw(node_url)
@@ -0,0 +1,182 @@
+"""设备活跃信息合并写入服务"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+UPDATE_DEVICE_ACTIVITY_SQL = text("""
+    UPDATE devices
+    SET last_seen = :last_seen,
+        last_access = :last_seen,
+        access_count = access_count + :access_delta,
+        ip_address = :ip_address,
+        user_agent = :user_agent,
+        device_ua = :device_ua,
+        software_name = :software_name,
+        software_version = :software_version,
+        os_name = :os_name,
+        os_version = :os_version,
+        device_model = :device_model,
+        device_brand = :device_brand,
+        device_name = :device_name,
+        device_type = :device_type
+    WHERE id = :device_id AND subscription_id = :subscription_id
+""")
+
+
+class DeviceActivityBuffer:
+    """设备活跃信息缓冲区
+
+    已存在设备的每次订阅拉取只更新最后访问时间、访问次数、IP 和 UA 解析结果，这些字段
+    不参与设备数量限制判断。这里按设备合并增量（访问次数累加，其余字段取最新值），
+    由后台线程每 flush_interval_ms 毫秒用一次批量 UPDATE 写入；待写设备数超过
+    max_pending 时提前写入。新设备创建、允许/禁止状态变更仍在请求内同步写入。
+    """
+
+    def __init__(self, flush_interval_ms: int = 10000, max_pending: int = 5000):
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.recorded_count = 0
+        self.written_count = 0
+        self.flush_count = 0
+        self.failed_count = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="DeviceActivityBuffer")
+            self._thread.start()
+            logger.info(f"设备活跃信息写入器已启动（间隔 {self.flush_interval_ms} 毫秒）")
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程并写入剩余的增量"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self.flush()
+        logger.info(f"设备活跃信息写入器已停止: {self.get_stats()}")
+
+    def record(self, device_id: int, subscription_id: int, ip_address: str,
+               user_agent: str, device_info: Dict[str, str]):
+        """记录一次设备访问，合并到该设备的待写增量中"""
+        if not self._stop_event.is_set() and (self._thread is None or not self._thread.is_alive()):
+            self.start()
+        values = {
+            'device_id': device_id,
+            'subscription_id': subscription_id,
+            'last_seen': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'device_ua': f"{user_agent}|{ip_address}",
+            'software_name': device_info.get('software_name', 'Unknown'),
+            'software_version': device_info.get('software_version', ''),
+            'os_name': device_info.get('os_name', 'Unknown'),
+            'os_version': device_info.get('os_version', ''),
+            'device_model': device_info.get('device_model', ''),
+            'device_brand': device_info.get('device_brand', ''),
+            'device_name': device_info.get('device_name', 'Unknown Device'),
+            'device_type': device_info.get('device_type', 'unknown')
+        }
+        with self._lock:
+            pending = self._pending.get(device_id)
+            values['access_delta'] = (pending['access_delta'] if pending else 0) + 1
+            self._pending[device_id] = values
+            self.recorded_count += 1
+            pending_count = len(self._pending)
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_access_count(self, device_id: int) -> int:
+        """返回尚未写入数据库的访问次数"""
+        pending = self._pending.get(device_id)
+        return pending['access_delta'] if pending else 0
+
+    def discard(self, device_id: Optional[int] = None, subscription_id: Optional[int] = None):
+        """丢弃已删除设备的待写增量"""
+        with self._lock:
+            if device_id is not None:
+                self._pending.pop(device_id, None)
+            if subscription_id is not None:
+                for key in [k for k, v in self._pending.items() if v['subscription_id'] == subscription_id]:
+                    del self._pending[key]
+
+    def flush(self) -> int:
+        """立即写入所有待写增量，返回写入的设备数"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = list(self._pending.values())
+                self._pending = {}
+            db = SessionLocal()
+            try:
+                db.execute(UPDATE_DEVICE_ACTIVITY_SQL, batch)
+                db.commit()
+                self.written_count += len(batch)
+                self.flush_count += 1
+                return len(batch)
+            except Exception as e:
+                db.rollback()
+                self.failed_count += len(batch)
+                self._requeue(batch)
+                logger.error(f"批量更新设备活跃信息失败（{len(batch)} 台设备），下次写入时重试: {e}")
+                return 0
+            finally:
+                db.close()
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """把写入失败的增量合并回缓冲区：期间又有新访问的设备保留最新的字段，访问次数累加"""
+        with self._lock:
+            for values in batch:
+                pending = self._pending.get(values['device_id'])
+                if pending is None:
+                    self._pending[values['device_id']] = values
+                else:
+                    pending['access_delta'] += values['access_delta']
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded_count,
+            "written": self.written_count,
+            "failed": self.failed_count,
+            "flushes": self.flush_count
+        }
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000
+        while not self._stop_event.is_set():
+            self._wakeup.wait(timeout=interval)
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"设备活跃信息写入循环异常: {e}", exc_info=True)
+
+
+device_activity_buffer = DeviceActivityBuffer(
+    flush_interval_ms=settings.DEVICE_ACTIVITY_FLUSH_INTERVAL_MS,
+    max_pending=settings.DEVICE_ACTIVITY_MAX_PENDING
+)
+
+
+def get_device_activity_buffer() -> DeviceActivityBuffer:
+    return device_activity_buffer
@@ -3,15 +3,113 @@ import hashlib
 import json
 import logging
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core.invalidation_bus import TOPIC_SOFTWARE_RULES, invalidation_bus
+from app.services.access_log_writer import access_log_writer
+from app.services.device_activity_buffer import device_activity_buffer
+from app.services.subscription_key_cache import subscription_key_cache
+
 logger = logging.getLogger(__name__)
 
 
+class SoftwareRuleMatcher:
+    """软件识别规则匹配器
+
+    将 software_rules 中的所有 user_agent_pattern 编译为一个正则，规则内容变化时才重建；
+    同时缓存 User-Agent 的解析结果（LRU），规则重建时一并清空。
+    规则每 reload_interval 秒重新读取一次，规则变更后调用 invalidate_software_rules() 让所有 worker 立即重新读取；
+    读取失败时沿用当前规则，下次解析时重试。
+    """
+
+    def __init__(self, reload_interval: int = 300, cache_size: int = 1024):
+        self.reload_interval = reload_interval
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._signature: Optional[Tuple] = None
+        self._regex = None
+        self._pattern_rules: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        self._parsed: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+    def needs_reload(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_interval
+
+    def load(self, rules: List[Dict[str, str]]):
+        """加载规则，内容未变化时不重建匹配器"""
+        signature = tuple(
+            (rule['software_name'], rule['software_category'], rule['user_agent_pattern'])
+            for rule in rules
+        )
+        with self._lock:
+            self._loaded_at = time.monotonic()
+            if signature == self._signature:
+                return
+            pattern_rules = {}
+            for index, rule in enumerate(rules):
+                pattern = (rule.get('user_agent_pattern') or '').lower()
+                if pattern and pattern not in pattern_rules:
+                    pattern_rules[pattern] = (index, rule)
+            if pattern_rules:
+                # 零宽先行断言 + 按长度降序排列，保证每个位置取到最长的重叠匹配
+                alternatives = '|'.join(re.escape(p) for p in sorted(pattern_rules, key=len, reverse=True))
+                self._regex = re.compile(f'(?=({alternatives}))')
+            else:
+                self._regex = None
+            self._pattern_rules = pattern_rules
+            self._signature = signature
+            self._parsed.clear()
+            logger.info(f"软件识别规则已编译: {len(pattern_rules)} 条")
+
+    def invalidate(self):
+        """规则变更后调用，下次解析时重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def match(self, ua_lower: str) -> Optional[Dict[str, str]]:
+        """返回匹配的规则：优先最长的 pattern，长度相同时按规则顺序"""
+        regex = self._regex
+        if regex is None:
+            return None
+        matched = {found.group(1) for found in regex.finditer(ua_lower)}
+        if not matched:
+            return None
+        pattern = min(matched, key=lambda p: (-len(p), self._pattern_rules[p][0]))
+        return self._pattern_rules[pattern][1]
+
+    def get_parsed(self, user_agent: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            result = self._parsed.get(user_agent)
+            if result is not None:
+                self._parsed.move_to_end(user_agent)
+            return result
+
+    def put_parsed(self, user_agent: str, result: Dict[str, str]):
+        with self._lock:
+            self._parsed[user_agent] = result
+            self._parsed.move_to_end(user_agent)
+            while len(self._parsed) > self.cache_size:
+                self._parsed.popitem(last=False)
+
+
+software_rule_matcher = SoftwareRuleMatcher()
+
+
+def invalidate_software_rules():
+    """软件识别规则变更后调用，通知所有 worker 重新加载"""
+    invalidation_bus.publish(TOPIC_SOFTWARE_RULES)
+
+
+invalidation_bus.subscribe(TOPIC_SOFTWARE_RULES, lambda payload: software_rule_matcher.invalidate())
+
+
 class DeviceManager:
     """设备管理器"""
 
@@ -108,7 +206,21 @@ class DeviceManager:
         return is_browser and not is_proxy_client
 
     def parse_user_agent(self, user_agent: str) -> Dict[str, str]:
-        """解析User-Agent，识别软件、操作系统、设备信息"""
+        """解析User-Agent，识别软件、操作系统、设备信息（结果按 UA 缓存）"""
+        if software_rule_matcher.needs_reload():
+            try:
+                software_rule_matcher.load(self._query_software_rules())
+            except Exception as e:
+                # 不缓存失败的结果，沿用当前规则，下次解析时重试
+                logger.error(f"加载软件识别规则失败，沿用当前规则: {e}")
+        cached = software_rule_matcher.get_parsed(user_agent)
+        if cached is not None:
+            return dict(cached)
+        result = self._parse_user_agent_uncached(user_agent)
+        software_rule_matcher.put_parsed(user_agent, result)
+        return dict(result)
+
+    def _parse_user_agent_uncached(self, user_agent: str) -> Dict[str, str]:
         result = {
             'software_name': 'Unknown',
             'software_version': '',
@@ -121,16 +233,9 @@ class DeviceManager:
             'device_type': 'unknown'
         }
 
-        rules = self.get_software_rules()
         ua_lower = user_agent.lower()
 
-        matched_rule = None
-        for rule in rules:
-            pattern = rule['user_agent_pattern'].lower()
-            if pattern in ua_lower:
-                # 检查是否有更精确的匹配
-                if not matched_rule or len(pattern) > len(matched_rule['user_agent_pattern']):
-                    matched_rule = rule
+        matched_rule = software_rule_matcher.match(ua_lower)
 
         if not matched_rule:
             if 'hiddify' in ua_lower:
@@ -515,28 +620,31 @@ class DeviceManager:
     def get_software_rules(self) -> List[Dict[str, str]]:
         """获取软件识别规则"""
         try:
-            result = self.db.execute(text("""
-                SELECT software_name, software_category, user_agent_pattern, 
-                       os_pattern, device_pattern, version_pattern
-                FROM software_rules 
-                WHERE is_active = 1
-                ORDER BY software_name
-            """)).fetchall()
-            
-            return [
-                {
-                    'software_name': row[0],
-                    'software_category': row[1],
-                    'user_agent_pattern': row[2],
-                    'os_pattern': row[3],
-                    'device_pattern': row[4],
-                    'version_pattern': row[5]
-                }
-                for row in result
-            ]
+            return self._query_software_rules()
         except Exception as e:
             logger.error(f"获取软件规则失败: {e}", exc_info=True)
             return []
+
+    def _query_software_rules(self) -> List[Dict[str, str]]:
+        result = self.db.execute(text("""
+            SELECT software_name, software_category, user_agent_pattern, 
+                   os_pattern, device_pattern, version_pattern
+            FROM software_rules 
+            WHERE is_active = 1
+            ORDER BY software_name
+        """)).fetchall()
+        
+        return [
+            {
+                'software_name': row[0],
+                'software_category': row[1],
+                'user_agent_pattern': row[2],
+                'os_pattern': row[3],
+                'device_pattern': row[4],
+                'version_pattern': row[5]
+            }
+            for row in result
+        ]
     
     def check_subscription_access(self, subscription_url: str, user_agent: str, ip_address: str, 
                                  subscription_type: str = 'ssr', device_id: Optional[str] = None) -> Dict[str, Any]:
@@ -564,20 +672,11 @@ class DeviceManager:
                 logger.info(f"浏览器访问，不记录设备和订阅次数: subscription_url={subscription_url}, user_agent={user_agent[:100]}")
                 
                 # 获取订阅信息用于记录日志
-                subscription = self.db.execute(text("""
-                    SELECT s.id, s.user_id
-                    FROM subscriptions s
-                    WHERE s.subscription_url = :subscription_url
-                """), {'subscription_url': subscription_url}).fetchone()
+                subscription = subscription_key_cache.resolve(self.db, subscription_url)
                 
                 if subscription:
                     # 记录浏览器访问日志（但不记录设备和订阅次数）
                     self._log_access(subscription.id, None, ip_address, user_agent, 'browser_access', 200, '浏览器访问', subscription_type)
-                    # 提交事务以确保日志被保存
-                    try:
-                        self.db.commit()
-                    except:
-                        pass
                 
                 result['allowed'] = True
                 result['access_type'] = 'browser_access'
@@ -586,13 +685,7 @@ class DeviceManager:
             # 获取订阅信息
             logger.info(f"检查订阅访问: subscription_url={subscription_url}, user_agent={user_agent[:100]}, ip={ip_address}, device_id={device_id}")
             
-            subscription = self.db.execute(text("""
-                SELECT s.id, s.user_id, s.device_limit, s.expire_time, s.is_active,
-                       u.id as user_id, u.username, u.email
-                FROM subscriptions s
-                JOIN users u ON s.user_id = u.id
-                WHERE s.subscription_url = :subscription_url
-            """), {'subscription_url': subscription_url}).fetchone()
+            subscription = subscription_key_cache.resolve(self.db, subscription_url)
             
             if not subscription:
                 logger.warning(f"订阅地址不存在: {subscription_url}")
@@ -675,38 +768,9 @@ class DeviceManager:
                 # 设备已存在，更新访问信息和UA记录
                 logger.info(f"设备已存在: device_id={existing_device.id}, is_allowed={existing_device.is_allowed}, access_count={existing_device.access_count}")
                 
-                self.db.execute(text("""
-                    UPDATE devices 
-                    SET last_seen = CURRENT_TIMESTAMP, 
-                        last_access = CURRENT_TIMESTAMP,
-                        access_count = access_count + 1,
-                        ip_address = :ip_address, 
-                        user_agent = :user_agent,
-                        device_ua = :device_ua,
-                        software_name = :software_name,
-                        software_version = :software_version,
-                        os_name = :os_name,
-                        os_version = :os_version,
-                        device_model = :device_model,
-                        device_brand = :device_brand,
-                        device_name = :device_name,
-                        device_type = :device_type
-                    WHERE id = :device_id
-                """), {
-                    'device_id': existing_device.id,
-                    'ip_address': ip_address,
-                    'user_agent': user_agent,
-                    'device_ua': f"{user_agent}|{ip_address}",
-                    'software_name': device_info.get('software_name', 'Unknown'),
-                    'software_version': device_info.get('software_version', ''),
-                    'os_name': device_info.get('os_name', 'Unknown'),
-                    'os_version': device_info.get('os_version', ''),
-                    'device_model': device_info.get('device_model', ''),
-                    'device_brand': device_info.get('device_brand', ''),
-                    'device_name': device_info.get('device_name', 'Unknown Device'),
-                    'device_type': device_info.get('device_type', 'unknown')
-                })
-                logger.info(f"设备访问信息已更新: device_id={existing_device.id}, new_access_count={existing_device.access_count + 1}, software_name={device_info.get('software_name', 'Unknown')}")
+                # 访问次数、最后访问时间等不影响设备限制的字段合并后批量写入
+                device_activity_buffer.record(existing_device.id, subscription.id, ip_address, user_agent, device_info)
+                logger.info(f"设备访问信息已记录: device_id={existing_device.id}, new_access_count={existing_device.access_count + device_activity_buffer.pending_access_count(existing_device.id)}, software_name={device_info.get('software_name', 'Unknown')}")
                 
                 if existing_device.is_allowed:
                     result['allowed'] = True
@@ -720,23 +784,17 @@ class DeviceManager:
                     self._log_access(subscription.id, existing_device.id, ip_address, user_agent, 'blocked_device_limit', 403, '设备数量已达上限', subscription_type)
                     logger.warning(f"设备访问被拒绝（已达上限）: device_id={existing_device.id}")
                 
-                # 同步设备数量
-                from app.services.subscription import SubscriptionService
-                subscription_service = SubscriptionService(self.db)
-                subscription_service.sync_current_devices(subscription.id)
-                
-                self.db.commit()
+                # 已存在设备的访问不改变设备数量，无需同步和提交
                 return result
             
-            # 新设备，检查设备数量限制
-            allowed_devices_count = self.db.execute(text("""
-                SELECT COUNT(*) FROM devices 
-                WHERE subscription_id = :subscription_id AND is_allowed = 1
-            """), {'subscription_id': subscription.id}).scalar()
+            # 新设备，检查设备数量限制（按订阅的设备计数占用名额，不再统计设备表）
+            from app.services.subscription import SubscriptionService
+            subscription_service = SubscriptionService(self.db)
+            slot_reserved = subscription_service.reserve_device_slot(subscription.id)
             
-            logger.info(f"设备数量检查: subscription_id={subscription.id}, allowed_devices={allowed_devices_count}, device_limit={subscription.device_limit}")
+            logger.info(f"设备数量检查: subscription_id={subscription.id}, slot_reserved={slot_reserved}, device_limit={subscription.device_limit}")
             
-            if allowed_devices_count >= subscription.device_limit:
+            if not slot_reserved:
                 # 设备数量已达上限，记录但不允许
                 device_id = self._create_device_record(
                     subscription.id, subscription.user_id, device_hash, 
@@ -759,12 +817,7 @@ class DeviceManager:
                 result['access_type'] = 'allowed'
                 self._log_access(subscription.id, device_id, ip_address, user_agent, 'allowed', 200, '访问成功', subscription_type)
             
-            # 同步订阅的设备数量（根据实际设备数量）
-            from app.services.subscription import SubscriptionService
-            subscription_service = SubscriptionService(self.db)
-            sync_result = subscription_service.sync_current_devices(subscription.id)
-            logger.info(f"同步订阅 {subscription.id} 的设备数量: sync_result={sync_result}")
-            
+            # 设备记录与设备计数在同一事务中提交
             self.db.commit()
             logger.info(f"设备访问处理完成: subscription_id={subscription.id}, allowed={result['allowed']}, access_type={result['access_type']}")
             
@@ -832,15 +885,8 @@ class DeviceManager:
                 access_type_with_subscription = access_type
             else:
                 access_type_with_subscription = f"{subscription_type}_{access_type}"
-            self.db.execute(text("""
-                INSERT INTO subscription_access_logs (
-                    subscription_id, device_id, ip_address, user_agent, 
-                    access_type, response_status, response_message, access_time
-                ) VALUES (
-                    :subscription_id, :device_id, :ip_address, :user_agent,
-                    :access_type, :response_status, :response_message, CURRENT_TIMESTAMP
-                )
-            """), {
+            # 交给后台写入器批量插入，请求线程不等待日志提交
+            access_log_writer.enqueue({
                 'subscription_id': subscription_id,
                 'device_id': device_id,
                 'ip_address': ip_address,
@@ -908,7 +954,7 @@ class DeviceManager:
         try:
             # 验证设备存在
             device = self.db.execute(text("""
-                SELECT id FROM devices WHERE id = :device_id
+                SELECT id, subscription_id, is_allowed FROM devices WHERE id = :device_id
             """), {'device_id': device_id}).fetchone()
             
             if not device:
@@ -933,6 +979,11 @@ class DeviceManager:
             """
             
             self.db.execute(text(update_sql), params)
+            if 'is_allowed' in params and bool(params['is_allowed']) != bool(device.is_allowed):
+                from app.services.subscription import SubscriptionService
+                SubscriptionService(self.db).adjust_current_devices(
+                    device.subscription_id, 1 if params['is_allowed'] else -1
+                )
             self.db.commit()
             return True
             
@@ -946,7 +997,7 @@ class DeviceManager:
         try:
             # 验证设备所有权
             device = self.db.execute(text("""
-                SELECT id FROM devices 
+                SELECT id, subscription_id, is_allowed FROM devices 
                 WHERE id = :device_id AND user_id = :user_id
             """), {'device_id': device_id, 'user_id': user_id}).fetchone()
             
@@ -954,11 +1005,15 @@ class DeviceManager:
                 return False
             
             # 删除设备
-            self.db.execute(text("""
+            result = self.db.execute(text("""
                 DELETE FROM devices WHERE id = :device_id
             """), {'device_id': device_id})
+            if result.rowcount > 0 and device.is_allowed:
+                from app.services.subscription import SubscriptionService
+                SubscriptionService(self.db).adjust_current_devices(device.subscription_id, -1)
             
             self.db.commit()
+            device_activity_buffer.discard(device_id=device_id)
             return True
             
         except Exception as e:
@@ -980,8 +1035,12 @@ class DeviceManager:
             self.db.execute(text("""
                 DELETE FROM devices WHERE subscription_id = :subscription_id
             """), {'subscription_id': subscription_id})
+            self.db.execute(text("""
+                UPDATE subscriptions SET current_devices = 0 WHERE id = :subscription_id
+            """), {'subscription_id': subscription_id})
             
             self.db.commit()
+            device_activity_buffer.discard(subscription_id=subscription_id)
             return device_count
             
         except Exception as e:
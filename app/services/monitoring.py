@@ -44,27 +44,20 @@ class SystemMonitor:
                 "process": {"memory": process.memory_info().rss, "cpu_percent": process.cpu_percent(), "pid": process.pid}
             }
             
-            # 保存到 Redis
-            if redis_cache.is_connected():
-                try:
-                    history_key = CACHE_KEY_METRICS_HISTORY
-                    latest_key = CACHE_KEY_LATEST_METRICS
-                    
-                    # 保存最新指标
-                    redis_cache.set(latest_key, metrics, ttl=3600)
-                    
-                    # 添加到历史记录列表
-                    history = redis_cache.get(history_key, default=[])
+            # 保存到 Redis（Redis 不可用时各方法直接返回）
+            try:
+                redis_cache.set(CACHE_KEY_LATEST_METRICS, metrics, ttl=3600)
+
+                # 添加到历史记录列表，多个 worker 同时追加时不会互相覆盖
+                def append_metrics(history):
                     if not isinstance(history, list):
                         history = []
-                    
                     history.append(metrics)
-                    if len(history) > self.max_history:
-                        history = history[-self.max_history:]
-                    
-                    redis_cache.set(history_key, history, ttl=86400)
-                except Exception as e:
-                    logger.warning(f"保存监控指标到 Redis 失败: {e}")
+                    return history[-self.max_history:]
+
+                redis_cache.update(CACHE_KEY_METRICS_HISTORY, append_metrics, ttl=86400, default=[])
+            except Exception as e:
+                logger.warning(f"保存监控指标到 Redis 失败: {e}")
             
             # 后备内存缓存
             self._fallback_history.append(metrics)
@@ -81,17 +74,16 @@ class SystemMonitor:
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
         # 从 Redis 获取
-        if redis_cache.is_connected():
-            try:
-                history = redis_cache.get(CACHE_KEY_METRICS_HISTORY, default=[])
-                if isinstance(history, list) and history:
-                    filtered = [
-                        metric for metric in history
-                        if datetime.fromisoformat(metric["timestamp"]) > cutoff_time
-                    ]
-                    return filtered[-limit:] if len(filtered) > limit else filtered
-            except Exception as e:
-                logger.warning(f"从 Redis 获取监控历史失败: {e}")
+        try:
+            history = redis_cache.get(CACHE_KEY_METRICS_HISTORY, default=[])
+            if isinstance(history, list) and history:
+                filtered = [
+                    metric for metric in history
+                    if datetime.fromisoformat(metric["timestamp"]) > cutoff_time
+                ]
+                return filtered[-limit:] if len(filtered) > limit else filtered
+        except Exception as e:
+            logger.warning(f"从 Redis 获取监控历史失败: {e}")
         
         # 后备内存缓存
         filtered = [
@@ -105,19 +97,19 @@ class SystemMonitor:
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
         # 清理 Redis 缓存
-        if redis_cache.is_connected():
-            try:
-                history = redis_cache.get(CACHE_KEY_METRICS_HISTORY, default=[])
-                if isinstance(history, list):
-                    filtered = [
-                        metric for metric in history
-                        if datetime.fromisoformat(metric["timestamp"]) > cutoff_time
-                    ]
-                    if len(filtered) > self.max_history:
-                        filtered = filtered[-self.max_history:]
-                    redis_cache.set(CACHE_KEY_METRICS_HISTORY, filtered, ttl=86400)
-            except Exception as e:
-                logger.warning(f"清理 Redis 监控历史失败: {e}")
+        def drop_old_metrics(history):
+            if not isinstance(history, list):
+                return []
+            filtered = [
+                metric for metric in history
+                if datetime.fromisoformat(metric["timestamp"]) > cutoff_time
+            ]
+            return filtered[-self.max_history:]
+
+        try:
+            redis_cache.update(CACHE_KEY_METRICS_HISTORY, drop_old_metrics, ttl=86400, default=[])
+        except Exception as e:
+            logger.warning(f"清理 Redis 监控历史失败: {e}")
         
         # 清理内存缓存
         self._fallback_history = [
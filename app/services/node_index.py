@@ -0,0 +1,106 @@
+"""节点索引 - 每代 Clash 配置只解析一次，进程内所有 NodeService 共用"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.invalidation_bus import TOPIC_NODES, TOPIC_SUBSCRIPTION_PAYLOAD, invalidation_bus
+from app.services.subscription_payload import PAYLOAD_CLASH
+
+logger = logging.getLogger(__name__)
+
+
+class NodeIndex:
+    """某一代 Clash 配置的节点索引（只读，调用方不要修改返回的节点）"""
+
+    def __init__(self, nodes: List[Dict[str, Any]], source_digest: Optional[str], generation: int):
+        self.nodes = nodes
+        self.source_digest = source_digest
+        self.generation = generation
+        self.checked_at = time.monotonic()
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_region: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for node in nodes:
+            self.by_id[node["id"]] = node
+            self.by_region.setdefault(node.get("region") or "未知", []).append(node)
+            if node.get("type"):
+                self.by_type.setdefault(node["type"], []).append(node)
+        self.statistics = self._build_statistics()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def page(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        return self.nodes[skip:skip + limit]
+
+    def _build_statistics(self) -> Dict[str, Any]:
+        total = len(self.nodes)
+        if not total:
+            return {"total": 0, "online": 0, "offline": 0, "regions": [], "types": [], "avg_latency": 0, "avg_load": 0}
+        online = sum(1 for n in self.nodes if n.get("status") == "online")
+        return {
+            "total": total,
+            "online": online,
+            "offline": total - online,
+            "regions": [region for region in self.by_region if region != "未知"],
+            "types": list(self.by_type),
+            "avg_latency": round(sum(n.get("latency", 0) for n in self.nodes) / total, 2),
+            "avg_load": round(sum(n.get("load", 0) for n in self.nodes) / total, 2)
+        }
+
+
+class NodeIndexCache:
+    """节点索引缓存
+
+    索引在配置变化（通过缓存失效通知）或手动清理后丢弃；超过 revalidate_interval 后重新读取
+    原始配置，内容摘要不变时继续使用原索引，兜底配置文件被直接修改的情况。
+    """
+
+    def __init__(self, revalidate_interval: int = 60):
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.Lock()
+        self._index: Optional[NodeIndex] = None
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def get(self, read_source: Callable[[], Optional[str]],
+            build_nodes: Callable[[str], List[Dict[str, Any]]]) -> NodeIndex:
+        index = self._index
+        if index is not None and time.monotonic() - index.checked_at < self.revalidate_interval:
+            return index
+        with self._lock:
+            index = self._index
+            if index is not None and time.monotonic() - index.checked_at < self.revalidate_interval:
+                return index
+            source = read_source()
+            source_digest = hashlib.sha256(source.encode('utf-8')).hexdigest() if source else None
+            if index is not None and index.source_digest == source_digest:
+                index.checked_at = time.monotonic()
+                return index
+            self._generation += 1
+            started = time.perf_counter()
+            nodes = build_nodes(source) if source else []
+            index = NodeIndex(nodes, source_digest, self._generation)
+            self._index = index
+            logger.info(f"节点索引已重建: generation={index.generation}, 节点 {len(index)} 个, "
+                        f"耗时 {(time.perf_counter() - started) * 1000:.1f} ms")
+            return index
+
+
+node_index_cache = NodeIndexCache(settings.NODE_INDEX_REVALIDATE_SECONDS)
+
+
+def _on_clash_config_changed(payload: Optional[Dict[str, Any]]):
+    kind = (payload or {}).get("kind")
+    if kind in (None, PAYLOAD_CLASH):
+        node_index_cache.invalidate()
+
+
+invalidation_bus.subscribe(TOPIC_NODES, lambda payload: node_index_cache.invalidate())
+invalidation_bus.subscribe(TOPIC_SUBSCRIPTION_PAYLOAD, _on_clash_config_changed)
@@ -0,0 +1,83 @@
+"""节点中间表示 - 配置更新时一次解析、过滤、去重，供各输出格式共用"""
+from typing import Any, Dict, List, Optional
+
+# 链接前缀 -> 统计用的节点类型名称
+NODE_TYPE_PREFIXES = (
+    ('ss://', 'SS'),
+    ('ssr://', 'SSR'),
+    ('vmess://', 'VMess'),
+    ('trojan://', 'Trojan'),
+    ('vless://', 'VLESS'),
+    ('hysteria2://', 'Hysteria2'),
+    ('hy2://', 'Hysteria2'),
+    ('tuic://', 'TUIC'),
+)
+
+
+def detect_node_type(url: str) -> str:
+    for prefix, node_type in NODE_TYPE_PREFIXES:
+        if url.startswith(prefix):
+            return node_type
+    return 'Unknown'
+
+
+class NodeIR:
+    """单个节点的解析结果
+
+    url: 原始节点链接（V2Ray 输出直接使用）
+    proxy: Clash 代理配置，解析失败时为 None；名称已按输出需要去重
+    region: 按名称识别的地区（配置了地区过滤时才计算）
+    filtered: 名称命中过滤关键词或过滤地区
+    duplicate: 与前面的节点重复（按 _get_node_key 判断）
+    """
+
+    __slots__ = ('url', 'node_type', 'source_index', 'is_first_source', 'proxy', 'name', 'region', 'filtered', 'duplicate')
+
+    def __init__(self, url: str, source_index: int = 0, is_first_source: bool = False):
+        self.url = url
+        self.node_type = detect_node_type(url)
+        self.source_index = source_index
+        self.is_first_source = is_first_source
+        self.proxy: Optional[Dict[str, Any]] = None
+        self.name: Optional[str] = None
+        self.region: Optional[str] = None
+        self.filtered = False
+        self.duplicate = False
+
+    @property
+    def parsed(self) -> bool:
+        return self.proxy is not None
+
+    @property
+    def is_clash_proxy(self) -> bool:
+        """是否输出到 Clash 配置"""
+        return self.proxy is not None and not self.filtered and not self.duplicate
+
+
+class NodeIRSet:
+    """一次配置更新的全部节点及统计信息"""
+
+    def __init__(self, nodes: List[NodeIR]):
+        self.nodes = nodes
+        self.failed_count = sum(1 for node in nodes if not node.parsed)
+        self.filtered_count = sum(1 for node in nodes if node.filtered)
+        self.duplicate_count = sum(1 for node in nodes if node.duplicate)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def v2ray_links(self) -> List[str]:
+        """V2Ray 输出：第一个节点源优先，过滤关键词命中的节点，保留无法解析的原始链接"""
+        first_source = [node.url for node in self.nodes if node.is_first_source and not node.filtered]
+        others = [node.url for node in self.nodes if not node.is_first_source and not node.filtered]
+        return first_source + others
+
+    def clash_proxies(self) -> List[Dict[str, Any]]:
+        return [node.proxy for node in self.nodes if node.is_clash_proxy]
+
+    def clash_type_count(self) -> Dict[str, int]:
+        type_count = {}
+        for node in self.nodes:
+            if node.is_clash_proxy:
+                type_count[node.node_type] = type_count.get(node.node_type, 0) + 1
+        return type_count
@@ -0,0 +1,65 @@
+"""节点链接提取 - 单次扫描源内容提取所有支持协议的节点链接"""
+import re
+from typing import List, Tuple
+
+# (协议, 链接正则)，输出时按此顺序分组，与原来逐个协议扫描的结果顺序一致
+NODE_LINK_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ('vmess', r'vmess://[A-Za-z0-9+/=]+'),
+    ('vless', r'vless://[A-Za-z0-9+/=@:?#%.-]+'),
+    ('ss', r'ss://[A-Za-z0-9+/=@:?#%.-]+'),
+    ('ssr', r'ssr://[A-Za-z0-9+/=]+'),
+    ('trojan', r'trojan://[A-Za-z0-9-]+@[^:\s]+:\d+(?:[?&][^#\s]*)?(?:#[^\s]*)?'),
+    ('hysteria2', r'hysteria2://[A-Za-z0-9+/=@:?#%.-]+'),
+    ('hy2', r'hy2://[A-Za-z0-9+/=@:?#%.-]+'),
+    ('tuic', r'tuic://[A-Za-z0-9+/=@:?#%.-]+'),
+)
+
+def _build_node_link_regex() -> "re.Pattern":
+    """把所有协议合并为一个正则，一次扫描完成
+
+    按协议首字母分组（v(?:mess|less)、s(?:s|sr) ...），正则引擎可以按首字符快速跳过无关位置；
+    协议名是其他协议名的后缀时（ss 与 vmess、vless），前面不能紧跟那个协议名的剩余部分，
+    避免把 vmess:// 或 vless:// 链接的后半段再识别成 ss:// 链接。其他位置不限制前一个字符。
+    """
+    schemes = [scheme for scheme, _ in NODE_LINK_PATTERNS]
+    by_first_char = {}
+    for scheme, pattern in NODE_LINK_PATTERNS:
+        # 首字符已在分组外匹配，反向断言需要带上它
+        guards = ''.join(f'(?<!{other[:-len(scheme)]}{pattern[0]})'
+                         for other in schemes if other != scheme and other.endswith(scheme))
+        by_first_char.setdefault(pattern[0], []).append(f'(?P<{scheme}>{guards}{pattern[1:]})')
+    alternatives = [f"{first}(?:{'|'.join(groups)})" for first, groups in by_first_char.items()]
+    return re.compile('|'.join(alternatives))
+
+
+_NODE_LINK_RE = _build_node_link_regex()
+# 正则分组序号 -> (协议, 在 NODE_LINK_PATTERNS 中的位置)
+_GROUP_SCHEMES = {
+    index: (scheme, [name for name, _ in NODE_LINK_PATTERNS].index(scheme))
+    for scheme, index in _NODE_LINK_RE.groupindex.items()
+}
+_BASE64_RE = re.compile(r'[A-Za-z0-9+/\s]*=?=?\s*')
+_WHITESPACE = (' ', '\n', '\r', '\t')
+
+
+def extract_node_links(content: str) -> List[str]:
+    """提取全部节点链接，按协议分组返回"""
+    groups = [[] for _ in NODE_LINK_PATTERNS]
+    appenders = {index: groups[position].append for index, (_, position) in _GROUP_SCHEMES.items()}
+    for match in _NODE_LINK_RE.finditer(content):
+        appenders[match.lastindex](match.group())
+    links = []
+    for group in groups:
+        links.extend(group)
+    return links
+
+
+def is_base64_text(text: str) -> bool:
+    """判断内容是否为标准 Base64（忽略空白），只检查字符集和长度，不做解码
+
+    字符集不含 ':'，明文节点链接在第一个 '://' 处就会匹配失败，不需要扫描全文。
+    """
+    if not text or _BASE64_RE.fullmatch(text) is None:
+        return False
+    length = len(text) - sum(text.count(ch) for ch in _WHITESPACE)
+    return length > 0 and length % 4 == 0
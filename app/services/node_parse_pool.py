@@ -0,0 +1,75 @@
+"""节点并行解析 - 节点较多时在子进程中分块解析，避免长时间占用 Web 进程的 GIL"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_worker_parse = None
+
+
+def _parse_chunk(links: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """子进程入口：解析一块节点链接，返回顺序与输入一致"""
+    global _worker_parse
+    if _worker_parse is None:
+        # 在子进程中导入，避免与 config_update_service 循环导入
+        from app.services.config_update_service import ConfigUpdateService
+        _worker_parse = ConfigUpdateService(None)._parse_node_uncached
+    return [_worker_parse(link) for link in links]
+
+
+class NodeParsePool:
+    """节点解析进程池
+
+    workers <= 0 时不启用；链接数少于 min_parallel 时直接在当前线程解析，省去启动子进程的开销。
+    链接按 chunk_size 分块提交，结果按提交顺序合并，与串行解析的结果顺序完全一致。
+    子进程使用 forkserver 方式启动，不会复制 Web 进程里的线程和数据库连接；进程池只在一次解析期间存在。
+    """
+
+    def __init__(self, workers: int = 0, chunk_size: int = 500, min_parallel: int = 2000):
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self.min_parallel = max(1, min_parallel)
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def should_parallelize(self, count: int) -> bool:
+        return self.enabled and count >= self.min_parallel
+
+    @staticmethod
+    def _get_context():
+        if 'forkserver' not in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('spawn')
+        context = multiprocessing.get_context('forkserver')
+        # forkserver 进程预先导入解析代码，之后每次创建子进程只需 fork，不再重复导入
+        context.set_forkserver_preload(['app.services.config_update_service'])
+        return context
+
+    def parse_all(self, links: List[str],
+                  parse: Callable[[str], Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """解析全部链接；未启用、数量较少或进程池异常时使用 parse 在当前线程解析"""
+        if not self.should_parallelize(len(links)):
+            return [parse(link) for link in links]
+        chunks = [links[i:i + self.chunk_size] for i in range(0, len(links), self.chunk_size)]
+        try:
+            context = self._get_context()
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)), mp_context=context) as executor:
+                results = []
+                for chunk_result in executor.map(_parse_chunk, chunks):
+                    results.extend(chunk_result)
+            return results
+        except Exception as e:
+            logger.warning(f"进程池解析节点失败，改为当前线程解析: {e}")
+            return [parse(link) for link in links]
+
+
+node_parse_pool = NodeParsePool(
+    workers=settings.CONFIG_PARSE_WORKERS,
+    chunk_size=settings.CONFIG_PARSE_CHUNK_SIZE,
+    min_parallel=settings.CONFIG_PARSE_MIN_PARALLEL
+)
@@ -0,0 +1,247 @@
+"""节点延迟探测 - 定时对节点 server:port 做 TCP 连接测速，保存滚动百分位"""
+import asyncio
+import collections
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.cache import redis_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PROBE_PREFIX = "nodes:probe:"
+PROBER_LEASE_KEY = "lease:node_prober"
+# 只监听 UDP/QUIC 的协议，TCP 连接必然失败，不探测
+UDP_ONLY_TYPES = frozenset({"hysteria", "hysteria2", "tuic", "wireguard"})
+
+Target = Tuple[str, int]
+
+
+def _percentile(sorted_values: List[float], percent: float) -> Optional[float]:
+    """最近秩百分位"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(percent / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class NodeProbeStats:
+    """单个节点最近 window 次探测结果，失败记为 None"""
+
+    def __init__(self, window: int = 20):
+        self.samples = collections.deque(maxlen=window)
+        self.checked_at: Optional[float] = None
+
+    def record(self, latency_ms: Optional[float]):
+        self.samples.append(latency_ms)
+        self.checked_at = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(value for value in self.samples if value is not None)
+        total = len(self.samples)
+        last = self.samples[-1] if total else None
+        return {
+            "online": last is not None,
+            "last": round(last, 1) if last is not None else None,
+            "p50": round(_percentile(latencies, 50), 1) if latencies else None,
+            "p90": round(_percentile(latencies, 90), 1) if latencies else None,
+            "p99": round(_percentile(latencies, 99), 1) if latencies else None,
+            "loss": round((total - len(latencies)) * 100 / total, 1) if total else 0.0,
+            "samples": total,
+            "checked_at": self.checked_at
+        }
+
+
+class NodeLatencyProber:
+    """节点延迟探测器
+
+    后台线程每 interval 秒探测一次所有节点：asyncio 并发建立 TCP 连接（最多 concurrency 个同时进行，
+    单次超时 timeout 秒），连接建立耗时即延迟，失败或超时记为丢失。每个节点保留最近 window 次结果，
+    计算 p50/p90/p99 和丢失率；摘要同时写入 Redis，供其他 worker 读取。
+    探测在独立线程的事件循环中进行，不占用处理请求的事件循环。
+    多个 worker 通过 Redis 租约选出一个执行探测（每轮续期），其他 worker 只读取 Redis 中的摘要，
+    持有者退出后租约过期，由其他 worker 接替；Redis 不可用时各 worker 各自探测。
+    只能探测基于 TCP 的节点：hysteria、hysteria2、tuic、wireguard 只监听 UDP，不参与探测，保持默认状态。
+    """
+
+    def __init__(self, interval: int = 300, concurrency: int = 50, timeout: float = 3, window: int = 20):
+        self.interval = interval
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.window = max(1, window)
+        self._stats: Dict[Target, NodeProbeStats] = {}
+        self._summaries: Dict[Target, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.rounds = 0
+        self.last_round_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if not self.enabled:
+            logger.info("节点延迟探测未启用（NODE_PROBE_INTERVAL=0）")
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="NodeLatencyProber")
+            self._thread.start()
+            logger.info(f"节点延迟探测已启动（间隔 {self.interval} 秒，并发 {self.concurrency}，超时 {self.timeout} 秒）")
+
+    def stop(self, timeout: float = 10):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self.is_leader:
+            redis_cache.release_lease(PROBER_LEASE_KEY, self.owner)
+            self.is_leader = False
+        logger.info("节点延迟探测已停止")
+
+    async def probe(self, host: str, port: int) -> Optional[float]:
+        """探测一次，返回连接耗时（毫秒），失败返回 None"""
+        started = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        latency = (time.perf_counter() - started) * 1000
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return latency
+
+    async def probe_all(self, targets: Iterable[Target]) -> Dict[Target, Optional[float]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        targets = list(dict.fromkeys(targets))
+
+        async def run(target: Target) -> Optional[float]:
+            async with semaphore:
+                return await self.probe(*target)
+
+        results = await asyncio.gather(*(run(target) for target in targets))
+        return dict(zip(targets, results))
+
+    def run_once(self, targets: Iterable[Target]) -> Dict[Target, Dict[str, Any]]:
+        """探测一轮并更新统计（在没有事件循环的线程中调用），返回本轮节点的摘要"""
+        started = time.monotonic()
+        results = asyncio.run(self.probe_all(targets))
+        summaries = {}
+        with self._lock:
+            for target, latency in results.items():
+                stats = self._stats.get(target)
+                if stats is None:
+                    stats = self._stats[target] = NodeProbeStats(self.window)
+                stats.record(latency)
+                summaries[target] = stats.summary()
+            # 不再出现的节点不再保留
+            for target in [t for t in self._stats if t not in results]:
+                del self._stats[target]
+            self._summaries = summaries
+        self.rounds += 1
+        self.last_round_seconds = time.monotonic() - started
+        self._publish(summaries)
+        online = sum(1 for summary in summaries.values() if summary["online"])
+        logger.info(f"节点延迟探测完成: {len(summaries)} 个节点，在线 {online} 个，耗时 {self.last_round_seconds:.1f} 秒")
+        return summaries
+
+    def get_summaries(self, targets: Iterable[Target]) -> Dict[Target, Dict[str, Any]]:
+        """返回节点的探测摘要：本进程负责探测且已有结果时直接使用，否则读取探测 worker 写入 Redis 的结果"""
+        targets = [(host, self.normalize_port(port)) for host, port in targets]
+        summaries = self._summaries
+        if self.is_leader and summaries:
+            return {target: summaries[target] for target in targets if target in summaries}
+        keys = {self._cache_key(target): target for target in targets}
+        cached = redis_cache.get_many(keys)
+        return {keys[key]: summary for key, summary in cached.items() if isinstance(summary, dict)}
+
+    def _publish(self, summaries: Dict[Target, Dict[str, Any]]):
+        ttl = max(self.interval * 3, 60)
+        redis_cache.set_many({self._cache_key(target): summary for target, summary in summaries.items()}, ttl=ttl)
+
+    def _targets(self) -> List[Target]:
+        from app.services.node_service import NodeService
+        node_service = NodeService()
+        try:
+            nodes = node_service.get_index().nodes
+        finally:
+            node_service.close()
+        targets = []
+        for node in nodes:
+            port = self.normalize_port(node.get("port"))
+            if node.get("server") and port and self.is_probeable(node):
+                targets.append((node["server"], port))
+        return targets
+
+    @staticmethod
+    def is_probeable(node: Dict[str, Any]) -> bool:
+        """节点能否用 TCP 连接探测（UDP 协议的节点不能）"""
+        return str(node.get("type") or "").lower() not in UDP_ONLY_TYPES
+
+    @staticmethod
+    def normalize_port(port) -> Optional[int]:
+        try:
+            return int(port)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _cache_key(target: Target) -> str:
+        return f"{CACHE_KEY_PROBE_PREFIX}{target[0]}:{target[1]}"
+
+    def _lease_ttl(self) -> int:
+        # 持有者每轮续期，ttl 覆盖一个间隔加一轮探测的耗时
+        return int(max(self.interval * 2, self.interval + self.last_round_seconds * 2, 60))
+
+    def _acquire_lease(self) -> bool:
+        """获取或续期探测租约，返回本进程是否负责本轮探测"""
+        acquired = redis_cache.acquire_lease(PROBER_LEASE_KEY, self.owner, self._lease_ttl())
+        # Redis 不可用时无法选主，也无法共享结果，由本进程自行探测
+        leader = acquired is not False
+        if leader != self.is_leader:
+            if leader:
+                logger.info(f"本进程负责节点延迟探测（{self.owner}）")
+            else:
+                logger.info("节点延迟探测由其他 worker 负责，本进程只读取 Redis 中的结果")
+                with self._lock:
+                    self._stats.clear()
+                    self._summaries = {}
+            self.is_leader = leader
+        return leader
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self._acquire_lease():
+                    targets = self._targets()
+                    if targets:
+                        self.run_once(targets)
+            except Exception as e:
+                logger.error(f"节点延迟探测异常: {e}", exc_info=True)
+            self._stop_event.wait(self.interval)
+
+
+node_latency_prober = NodeLatencyProber(
+    interval=settings.NODE_PROBE_INTERVAL,
+    concurrency=settings.NODE_PROBE_CONCURRENCY,
+    timeout=settings.NODE_PROBE_TIMEOUT,
+    window=settings.NODE_PROBE_WINDOW
+)
+
+
+def get_node_latency_prober() -> NodeLatencyProber:
+    return node_latency_prober
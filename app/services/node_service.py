@@ -1,63 +1,53 @@
 """节点服务"""
-import base64
-import json
 import logging
-import random
-import re
-import time
-import urllib.parse
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import yaml
 from sqlalchemy import text
 
-from app.core.cache import redis_cache
 from app.core.database import SessionLocal
+from app.core.invalidation_bus import TOPIC_NODES, invalidation_bus
+from app.services.node_index import NodeIndex, node_index_cache
+from app.services.node_prober import node_latency_prober
+from app.services.region_classifier import region_classifier
 
-logger = logging.getLogger(__name__)
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
-CACHE_KEY_NODES = "nodes:clash_config"
-CACHE_KEY_TIMESTAMP = "nodes:cache_timestamp"
+logger = logging.getLogger(__name__)
 
 
 class NodeService:
-    """节点服务类"""
+    """节点服务类
+
+    节点列表来自 Clash 配置，解析结果保存在进程级的节点索引中（见 node_index），
+    每个请求创建的 NodeService 共用同一份索引。状态、延迟和丢包率在返回时从延迟探测结果
+    （见 node_prober）叠加到节点副本上，尚未探测过的节点保持默认值。
+    """
 
     def __init__(self, db=None):
         self.db = db or SessionLocal()
-        self._cache_ttl = 300
-        self._max_cache_size = 500
-        self._fallback_cache = None
-        self._fallback_timestamp = None
 
     def clear_cache(self):
-        """清理节点缓存，释放内存"""
-        redis_cache.delete(CACHE_KEY_NODES)
-        redis_cache.delete(CACHE_KEY_TIMESTAMP)
-        self._fallback_cache = None
-        self._fallback_timestamp = None
+        """丢弃所有 worker 的节点索引，下次访问时重新解析配置"""
+        invalidation_bus.publish(TOPIC_NODES)
+
+    def get_index(self) -> NodeIndex:
+        return node_index_cache.get(self._read_clash_config, self._parse_clash_config)
 
     def get_nodes_from_clash_config(self, clash_config_content: str = None) -> List[Dict[str, Any]]:
-        current_time = time.time()
-        
-        # 尝试从 Redis 获取缓存
-        if redis_cache.is_connected():
-            cache_timestamp = redis_cache.get(CACHE_KEY_TIMESTAMP)
-            if cache_timestamp and current_time - cache_timestamp < self._cache_ttl:
-                cached_nodes = redis_cache.get(CACHE_KEY_NODES)
-                if cached_nodes:
-                    logger.debug("从 Redis 缓存获取节点数据")
-                    return cached_nodes
-        
-        # 如果 Redis 不可用，使用内存缓存作为后备
-        if (self._fallback_cache is not None and self._fallback_timestamp is not None and 
-            current_time - self._fallback_timestamp < self._cache_ttl):
-            logger.debug("从内存缓存获取节点数据")
-            return self._fallback_cache
+        # 提供了配置内容参数时直接解析，不影响索引（用于导入功能）
+        if clash_config_content:
+            return self._parse_clash_config(clash_config_content)
+        return self._apply_probe_results(self.get_index().nodes)
+
+    def _read_clash_config(self) -> Optional[str]:
         config_content = None
         # 优先从数据库读取
         try:
-            from sqlalchemy import text
             query = text('SELECT value FROM system_configs WHERE "key" = :key AND type = :type')
             result = self.db.execute(query, {'key': 'clash_config', 'type': 'clash'}).first()
             if result and result.value:
@@ -67,8 +57,6 @@ class NodeService:
             logger.warning(f"从数据库读取Clash配置失败: {e}")
         # 如果数据库没有，从文件读取
         if not config_content:
-            import os
-            from pathlib import Path
             clash_path = Path("uploads/config/clash.yaml")
             if clash_path.exists():
                 try:
@@ -80,14 +68,13 @@ class NodeService:
                     config_content = None
             else:
                 logger.warning(f"Clash配置文件不存在: {clash_path}")
-        # 如果提供了配置内容参数，使用参数（用于导入功能）
-        if clash_config_content:
-            config_content = clash_config_content
         if not config_content:
             logger.warning("未找到Clash配置")
-            return []
+        return config_content
+
+    def _parse_clash_config(self, config_content: str) -> List[Dict[str, Any]]:
         try:
-            config_data = yaml.safe_load(config_content)
+            config_data = yaml.load(config_content, Loader=SafeLoader)
             if not config_data or 'proxies' not in config_data:
                 logger.warning("Clash配置格式错误或没有proxies部分")
                 return []
@@ -99,23 +86,9 @@ class NodeService:
             for i, proxy in enumerate(proxies, 1):
                 if not isinstance(proxy, dict):
                     continue
-                if len(nodes) >= self._max_cache_size:
-                    logger.warning(f"节点数量超过缓存限制 {self._max_cache_size}，已截断")
-                    break
                 node_data = self._build_node_data(proxy, i)
                 if node_data:
                     nodes.append(node_data)
-            
-            # 保存到 Redis 缓存
-            if redis_cache.is_connected():
-                redis_cache.set(CACHE_KEY_NODES, nodes, ttl=self._cache_ttl)
-                redis_cache.set(CACHE_KEY_TIMESTAMP, current_time, ttl=self._cache_ttl)
-                logger.debug("节点数据已保存到 Redis 缓存")
-            
-            # 同时保存到内存缓存作为后备
-            self._fallback_cache = nodes
-            self._fallback_timestamp = current_time
-            
             return nodes
         except yaml.YAMLError as e:
             logger.warning(f"YAML解析失败: {e}")
@@ -134,7 +107,7 @@ class NodeService:
             "region": self._detect_region(node_name),
             "type": node_type,
             "status": "online",
-            "load": self._generate_load(),
+            "load": 0.0,
             "speed": 0.0,
             "uptime": 0,
             "latency": 0,
@@ -196,112 +169,72 @@ class NodeService:
                 node_data = self._build_node_data(current_node, node_id)
                 if node_data:
                     nodes.append(node_data)
-            self._nodes_cache = nodes
-            self._cache_timestamp = time.time()
             return nodes
         except Exception as e:
             logger.error(f"手动解析失败: {e}", exc_info=True)
             return []
 
     def _detect_region(self, node_name: str) -> str:
-        region_keywords = {
-            '香港': ['香港', 'HK', 'Hong Kong', 'hongkong'],
-            '美国': ['美国', 'US', 'United States', 'america', 'usa'],
-            '日本': ['日本', 'JP', 'Japan', 'japan'],
-            '新加坡': ['新加坡', 'SG', 'Singapore', 'singapore'],
-            '英国': ['英国', 'UK', 'United Kingdom', 'britain'],
-            '德国': ['德国', 'DE', 'Germany', 'germany'],
-            '法国': ['法国', 'FR', 'France', 'france'],
-            '加拿大': ['加拿大', 'CA', 'Canada', 'canada'],
-            '澳洲': ['澳洲', 'AU', 'Australia', 'australia'],
-            '台湾': ['台湾', 'TW', 'Taiwan', 'taiwan'],
-            '韩国': ['韩国', 'KR', 'Korea', 'korea'],
-            '俄罗斯': ['俄罗斯', 'RU', 'Russia', 'russia'],
-            '印度': ['印度', 'IN', 'India', 'india'],
-            '巴西': ['巴西', 'BR', 'Brazil', 'brazil'],
-            '荷兰': ['荷兰', 'NL', 'Netherlands', 'netherlands'],
-            '瑞士': ['瑞士', 'CH', 'Switzerland', 'switzerland'],
-            '瑞典': ['瑞典', 'SE', 'Sweden', 'sweden'],
-            '挪威': ['挪威', 'NO', 'Norway', 'norway'],
-            '丹麦': ['丹麦', 'DK', 'Denmark', 'denmark'],
-            '芬兰': ['芬兰', 'FI', 'Finland', 'finland'],
-            '意大利': ['意大利', 'IT', 'Italy', 'italy'],
-            '西班牙': ['西班牙', 'ES', 'Spain', 'spain'],
-            '波兰': ['波兰', 'PL', 'Poland', 'poland'],
-            '捷克': ['捷克', 'CZ', 'Czech', 'czech'],
-            '奥地利': ['奥地利', 'AT', 'Austria', 'austria'],
-            '比利时': ['比利时', 'BE', 'Belgium', 'belgium'],
-            '葡萄牙': ['葡萄牙', 'PT', 'Portugal', 'portugal'],
-            '希腊': ['希腊', 'GR', 'Greece', 'greece'],
-            '土耳其': ['土耳其', 'TR', 'Turkey', 'turkey'],
-            '以色列': ['以色列', 'IL', 'Israel', 'israel'],
-            '阿联酋': ['阿联酋', 'AE', 'UAE', 'uae'],
-            '沙特': ['沙特', 'SA', 'Saudi', 'saudi'],
-            '埃及': ['埃及', 'EG', 'Egypt', 'egypt'],
-            '南非': ['南非', 'ZA', 'South Africa', 'south africa'],
-            '阿根廷': ['阿根廷', 'AR', 'Argentina', 'argentina'],
-            '智利': ['智利', 'CL', 'Chile', 'chile'],
-            '墨西哥': ['墨西哥', 'MX', 'Mexico', 'mexico'],
-            '泰国': ['泰国', 'TH', 'Thailand', 'thailand'],
-            '越南': ['越南', 'VN', 'Vietnam', 'vietnam'],
-            '菲律宾': ['菲律宾', 'PH', 'Philippines', 'philippines'],
-            '印尼': ['印尼', 'ID', 'Indonesia', 'indonesia'],
-            '马来西亚': ['马来西亚', 'MY', 'Malaysia', 'malaysia'],
-            '新西兰': ['新西兰', 'NZ', 'New Zealand', 'new zealand']
-        }
-        node_name_lower = node_name.lower()
-        for region, keywords in region_keywords.items():
-            if any(keyword.lower() in node_name_lower for keyword in keywords):
-                return region
-        return '未知'
-
-    def _generate_load(self) -> float:
-        return round(random.uniform(5, 25), 1)
+        return region_classifier.classify(node_name)
 
     def _is_recommended(self, node_name: str) -> bool:
         recommended_keywords = ['推荐', 'recommended', 'premium', '高速', 'fast', '稳定', 'stable']
         node_name_lower = node_name.lower()
         return any(keyword.lower() in node_name_lower for keyword in recommended_keywords)
 
+    def _apply_probe_results(self, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把延迟探测结果叠加到节点副本上（不修改索引中的节点）"""
+        summaries = node_latency_prober.get_summaries(
+            (node.get("server"), node.get("port")) for node in nodes if node_latency_prober.is_probeable(node)
+        )
+        if not summaries:
+            return nodes
+        result = []
+        for node in nodes:
+            summary = summaries.get((node.get("server"), node_latency_prober.normalize_port(node.get("port"))))
+            # 与 TCP 节点共用 server:port 的 UDP 节点也不使用 TCP 探测结果
+            if summary and node_latency_prober.is_probeable(node):
+                node = dict(node)
+                node["status"] = "online" if summary["online"] else "offline"
+                node["latency"] = summary["p50"] or 0
+                node["latency_p90"] = summary["p90"]
+                node["latency_p99"] = summary["p99"]
+                node["load"] = summary["loss"]
+                node["checked_at"] = summary["checked_at"]
+            result.append(node)
+        return result
+
     def get_node_statistics(self) -> Dict[str, Any]:
-        nodes = self.get_nodes_from_clash_config()
-        if not nodes:
-            return {"total": 0, "online": 0, "offline": 0, "regions": [], "types": [], "avg_latency": 0, "avg_load": 0}
-        total_nodes = len(nodes)
-        online_nodes = len([n for n in nodes if n.get("status") == "online"])
-        offline_nodes = total_nodes - online_nodes
-        regions = list(set([n["region"] for n in nodes if n.get("region") and n["region"] != "未知"]))
-        types = list(set([n["type"] for n in nodes if n.get("type")]))
-        avg_latency = sum([n.get("latency", 0) for n in nodes]) / total_nodes if total_nodes > 0 else 0
-        avg_load = sum([n.get("load", 0) for n in nodes]) / total_nodes if total_nodes > 0 else 0
-        return {
-            "total": total_nodes,
-            "online": online_nodes,
-            "offline": offline_nodes,
-            "regions": regions,
-            "types": types,
-            "avg_latency": round(avg_latency, 2),
-            "avg_load": round(avg_load, 2)
-        }
+        index = self.get_index()
+        stats = dict(index.statistics)
+        nodes = self._apply_probe_results(index.nodes)
+        if nodes is not index.nodes and nodes:
+            online = sum(1 for node in nodes if node.get("status") == "online")
+            latencies = [node["latency"] for node in nodes if node.get("latency")]
+            stats["online"] = online
+            stats["offline"] = len(nodes) - online
+            stats["avg_latency"] = round(sum(latencies) / len(latencies), 2) if latencies else 0
+            stats["avg_load"] = round(sum(node.get("load", 0) for node in nodes) / len(nodes), 2)
+        return stats
     
     def get_nodes_with_pagination(self, skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
         """从文件获取节点列表（分页）"""
-        nodes = self.get_nodes_from_clash_config()
-        return nodes[skip:skip + limit]
+        return self._apply_probe_results(self.get_index().page(skip, limit))
     
     def get_total_nodes(self) -> int:
         """获取节点总数"""
-        nodes = self.get_nodes_from_clash_config()
-        return len(nodes)
+        return len(self.get_index())
     
     def get_node(self, node_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取节点"""
-        nodes = self.get_nodes_from_clash_config()
-        return next((n for n in nodes if n.get("id") == node_id), None)
+        node = self.get_index().by_id.get(node_id)
+        return self._apply_probe_results([node])[0] if node else None
 
-    def clear_cache(self):
-        self._nodes_cache = None
-        self._cache_timestamp = None
+    def get_nodes_by_region(self, region: str) -> List[Dict[str, Any]]:
+        return self._apply_probe_results(self.get_index().by_region.get(region, []))
+
+    def get_nodes_by_type(self, node_type: str) -> List[Dict[str, Any]]:
+        return self._apply_probe_results(self.get_index().by_type.get(node_type, []))
 
     def close(self):
         if self.db:
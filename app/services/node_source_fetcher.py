@@ -0,0 +1,108 @@
+"""节点源并发下载 - 按主机限流、总时限和条件请求"""
+import asyncio
+import logging
+import time
+import urllib.parse
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class SourceFetchResult:
+    """单个节点源的下载结果"""
+
+    def __init__(self, url: str, content: Optional[str] = None, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, not_modified: bool = False,
+                 error: Optional[str] = None, elapsed: float = 0.0):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class NodeSourceFetcher:
+    """节点源下载器
+
+    所有节点源并发下载，同一主机最多 per_host_limit 个并发连接；单个请求超时 timeout 秒，
+    全部下载超过 deadline 秒后未完成的节点源按失败处理。传入上次保存的 ETag/Last-Modified
+    时发送条件请求，源站返回 304 时 not_modified 为 True，由调用方复用上次的解析结果。
+    """
+
+    def __init__(self, timeout: float = 30, deadline: float = 180, per_host_limit: int = 2,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.per_host_limit = max(1, per_host_limit)
+        self.transport = transport
+
+    def fetch_all(self, urls: List[str], validators: Optional[Dict[str, Dict[str, str]]] = None) -> List[SourceFetchResult]:
+        """下载全部节点源，结果顺序与 urls 一致（在没有事件循环的线程中调用）"""
+        return asyncio.run(self.fetch_all_async(urls, validators or {}))
+
+    async def fetch_all_async(self, urls: List[str], validators: Dict[str, Dict[str, str]]) -> List[SourceFetchResult]:
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        for url in urls:
+            host = urllib.parse.urlsplit(url).netloc.lower()
+            host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+
+        limits = httpx.Limits(max_connections=max(len(urls), 1) * self.per_host_limit)
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True,
+                                     limits=limits, transport=self.transport) as client:
+            tasks = [
+                asyncio.create_task(self._fetch_one(
+                    client, url, validators.get(url) or {},
+                    host_limits[urllib.parse.urlsplit(url).netloc.lower()]
+                ))
+                for url in urls
+            ]
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline) if tasks else (set(), set())
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        results = []
+        for url, task in zip(urls, tasks):
+            if task in done and not task.cancelled():
+                results.append(task.result())
+            else:
+                results.append(SourceFetchResult(url, error=f"超过总时限 {self.deadline} 秒", elapsed=self.deadline))
+        return results
+
+    async def _fetch_one(self, client: httpx.AsyncClient, url: str, validator: Dict[str, str],
+                         host_limit: asyncio.Semaphore) -> SourceFetchResult:
+        headers = {}
+        if validator.get('etag'):
+            headers['If-None-Match'] = validator['etag']
+        if validator.get('last_modified'):
+            headers['If-Modified-Since'] = validator['last_modified']
+        async with host_limit:
+            started = time.monotonic()
+            try:
+                response = await client.get(url, headers=headers)
+                elapsed = time.monotonic() - started
+                if response.status_code == 304:
+                    return SourceFetchResult(
+                        url, etag=validator.get('etag'), last_modified=validator.get('last_modified'),
+                        not_modified=True, elapsed=elapsed
+                    )
+                response.raise_for_status()
+                return SourceFetchResult(
+                    url, content=response.text,
+                    etag=response.headers.get('etag'),
+                    last_modified=response.headers.get('last-modified'),
+                    elapsed=elapsed
+                )
+            except Exception as e:
+                logger.warning(f"下载节点源失败 {url}: {e}")
+                return SourceFetchResult(url, error=str(e) or e.__class__.__name__,
+                                         elapsed=time.monotonic() - started)
@@ -0,0 +1,98 @@
+"""节点解析结果存储 - 按原始链接内容哈希保存解析后的代理配置"""
+import copy
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+
+class ParsedNodeStore:
+    """节点解析结果存储
+
+    以原始节点链接的 SHA-256 为键保存解析结果（解析失败也会记录），每次配置更新只解析新出现的链接。
+    每条记录保存最后一次出现的运行序号，连续 retention_runs 次更新都没出现的链接会被清除。
+    数据保存为 JSON 文件，写入时先写临时文件再替换，避免中途退出留下损坏的文件。
+    """
+
+    def __init__(self, path: str, retention_runs: int = 5):
+        self.path = path
+        self.retention_runs = max(1, retention_runs)
+        self.run = 0
+        self._entries: Dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @staticmethod
+    def link_key(link: str) -> str:
+        return hashlib.sha256(link.encode('utf-8')).hexdigest()[:32]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != STORE_VERSION:
+                logger.info(f"节点解析存储版本不一致，重新建立: {self.path}")
+                return
+            self.run = int(data.get('run', 0))
+            self._entries = data.get('entries', {})
+        except Exception as e:
+            logger.warning(f"读取节点解析存储失败，重新建立: {e}")
+            self.run = 0
+            self._entries = {}
+
+    def begin_run(self) -> int:
+        self.run += 1
+        self.hits = self.misses = self.evicted = 0
+        return self.run
+
+    def get_or_parse_many(self, links: List[str],
+                          parse_many: Callable[[List[str]], List[Optional[Dict[str, Any]]]]) -> List[Optional[Dict[str, Any]]]:
+        """返回各链接解析结果的副本（调用方会修改名称等字段），顺序与 links 一致；
+        未命中的链接去重后一次交给 parse_many 解析并保存"""
+        keys = [self.link_key(link) for link in links]
+        missing = {}
+        for key, link in zip(keys, links):
+            if key not in self._entries and key not in missing:
+                missing[key] = link
+        if missing:
+            parsed = parse_many(list(missing.values()))
+            for key, proxy in zip(missing.keys(), parsed):
+                self._entries[key] = [self.run, proxy]
+        self.misses += len(missing)
+        self.hits += len(links) - len(missing)
+        results = []
+        for key in keys:
+            entry = self._entries[key]
+            entry[0] = self.run
+            results.append(copy.deepcopy(entry[1]))
+        return results
+
+    def finish_run(self):
+        """清除过期链接并保存到文件"""
+        min_run = self.run - self.retention_runs + 1
+        expired = [key for key, entry in self._entries.items() if entry[0] < min_run]
+        for key in expired:
+            del self._entries[key]
+        self.evicted = len(expired)
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'run': self.run, 'entries': self._entries},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,100 @@
+"""节点地区识别 - 按优先级把地区关键词编译为一个正则"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+UNKNOWN_REGION = '未知'
+
+# (地区, 关键词)，按优先级排列：节点名称命中多个地区时取排在前面的地区
+DEFAULT_REGION_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('香港', ('香港', 'HK', 'Hong Kong', 'hongkong')),
+    ('美国', ('美国', 'US', 'United States', 'america', 'usa')),
+    ('日本', ('日本', 'JP', 'Japan', 'japan')),
+    ('新加坡', ('新加坡', 'SG', 'Singapore', 'singapore')),
+    ('英国', ('英国', 'UK', 'United Kingdom', 'britain')),
+    ('德国', ('德国', 'DE', 'Germany', 'germany')),
+    ('法国', ('法国', 'FR', 'France', 'france')),
+    ('加拿大', ('加拿大', 'CA', 'Canada', 'canada')),
+    ('澳洲', ('澳洲', 'AU', 'Australia', 'australia')),
+    ('台湾', ('台湾', 'TW', 'Taiwan', 'taiwan')),
+    ('韩国', ('韩国', 'KR', 'Korea', 'korea')),
+    ('俄罗斯', ('俄罗斯', 'RU', 'Russia', 'russia')),
+    ('印度', ('印度', 'IN', 'India', 'india')),
+    ('巴西', ('巴西', 'BR', 'Brazil', 'brazil')),
+    ('荷兰', ('荷兰', 'NL', 'Netherlands', 'netherlands')),
+    ('瑞士', ('瑞士', 'CH', 'Switzerland', 'switzerland')),
+    ('瑞典', ('瑞典', 'SE', 'Sweden', 'sweden')),
+    ('挪威', ('挪威', 'NO', 'Norway', 'norway')),
+    ('丹麦', ('丹麦', 'DK', 'Denmark', 'denmark')),
+    ('芬兰', ('芬兰', 'FI', 'Finland', 'finland')),
+    ('意大利', ('意大利', 'IT', 'Italy', 'italy')),
+    ('西班牙', ('西班牙', 'ES', 'Spain', 'spain')),
+    ('波兰', ('波兰', 'PL', 'Poland', 'poland')),
+    ('捷克', ('捷克', 'CZ', 'Czech', 'czech')),
+    ('奥地利', ('奥地利', 'AT', 'Austria', 'austria')),
+    ('比利时', ('比利时', 'BE', 'Belgium', 'belgium')),
+    ('葡萄牙', ('葡萄牙', 'PT', 'Portugal', 'portugal')),
+    ('希腊', ('希腊', 'GR', 'Greece', 'greece')),
+    ('土耳其', ('土耳其', 'TR', 'Turkey', 'turkey')),
+    ('以色列', ('以色列', 'IL', 'Israel', 'israel')),
+    ('阿联酋', ('阿联酋', 'AE', 'UAE', 'uae')),
+    ('沙特', ('沙特', 'SA', 'Saudi', 'saudi')),
+    ('埃及', ('埃及', 'EG', 'Egypt', 'egypt')),
+    ('南非', ('南非', 'ZA', 'South Africa', 'south africa')),
+    ('阿根廷', ('阿根廷', 'AR', 'Argentina', 'argentina')),
+    ('智利', ('智利', 'CL', 'Chile', 'chile')),
+    ('墨西哥', ('墨西哥', 'MX', 'Mexico', 'mexico')),
+    ('泰国', ('泰国', 'TH', 'Thailand', 'thailand')),
+    ('越南', ('越南', 'VN', 'Vietnam', 'vietnam')),
+    ('菲律宾', ('菲律宾', 'PH', 'Philippines', 'philippines')),
+    ('印尼', ('印尼', 'ID', 'Indonesia', 'indonesia')),
+    ('马来西亚', ('马来西亚', 'MY', 'Malaysia', 'malaysia')),
+    ('新西兰', ('新西兰', 'NZ', 'New Zealand', 'new zealand')),
+)
+
+
+class RegionClassifier:
+    """节点地区识别器
+
+    关键词不区分大小写、按子串匹配，命中多个地区时取优先级最高的，结果与原来逐个地区检查一致。
+    所有关键词按首字母合并为一个零宽前瞻正则，名称的每个位置上取从该位置开始的最长关键词；
+    同一位置能匹配的关键词互为前缀，因此给每个关键词预先计算"自身及其所有前缀关键词"中的最高优先级，
+    扫描一遍名称即可得到结果。
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, Iterable[str]]] = DEFAULT_REGION_RULES):
+        self.regions = tuple(region for region, _ in rules)
+        priorities: Dict[str, int] = {}
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                priorities[keyword] = min(priorities.get(keyword, priority), priority)
+        self._priorities = {
+            keyword: min(p for prefix, p in priorities.items() if keyword.startswith(prefix))
+            for keyword in priorities
+        }
+        by_first_char: Dict[str, List[str]] = {}
+        for keyword in sorted(priorities, key=len, reverse=True):
+            by_first_char.setdefault(keyword[0], []).append(re.escape(keyword[1:]))
+        first_chars = ''.join(re.escape(char) for char in sorted(by_first_char))
+        alternatives = '|'.join(f"{re.escape(char)}(?:{'|'.join(rest)})" for char, rest in by_first_char.items())
+        # 先用字符集快速跳过不可能是关键词开头的位置
+        self._pattern = re.compile(f'(?=[{first_chars}])(?=({alternatives}))')
+
+    def classify(self, name: str) -> str:
+        """返回节点名称对应的地区，无法识别时返回 UNKNOWN_REGION"""
+        priority = self.priority(name)
+        return self.regions[priority] if priority is not None else UNKNOWN_REGION
+
+    def priority(self, name: str) -> Optional[int]:
+        """返回命中地区的优先级序号（越小越优先），未命中时返回 None"""
+        matched = self._pattern.findall(name.lower())
+        if not matched:
+            return None
+        return min(self._priorities[keyword] for keyword in matched)
+
+
+region_classifier = RegionClassifier()
+
+
+def get_region_classifier() -> RegionClassifier:
+    return region_classifier
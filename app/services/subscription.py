@@ -15,10 +15,19 @@ from app.models.subscription import Device, Subscription
 from app.models.user import User
 from app.models.user_activity import SubscriptionReset
 from app.schemas.subscription import SubscriptionCreate
+from app.services.subscription_payload import (
+    PAYLOAD_CLASH,
+    PAYLOAD_V2RAY,
+    CompiledPayload,
+    subscription_payload_cache,
+)
 from app.utils.security import generate_subscription_url
 
 logger = logging.getLogger(__name__)
 
+V2RAY_NOT_CONFIGURED_MSG = "# V2Ray配置未设置\n# 请联系管理员配置V2Ray节点信息"
+CLASH_NOT_CONFIGURED_MSG = "# Clash配置未设置\n# 请联系管理员配置Clash节点信息"
+
 
 class SubscriptionService:
     """订阅服务类"""
@@ -55,19 +64,6 @@ class SubscriptionService:
             return dt.replace(tzinfo=timezone.utc)
         return dt
 
-    def _sync_device_count(self, subscription_id: int):
-        try:
-            actual_count = self.db.query(Device).filter(
-                Device.subscription_id == subscription_id,
-                Device.is_active == True
-            ).count()
-            subscription = self.get(subscription_id)
-            if subscription:
-                subscription.current_devices = actual_count
-                self.db.commit()
-        except Exception as e:
-            logger.warning(f"同步设备数量失败: {e}")
-
     def _get_project_root(self) -> Path:
         return Path(__file__).parent.parent.parent.parent.resolve()
 
@@ -157,9 +153,10 @@ class SubscriptionService:
             return False
         subscription_id = device.subscription_id
         try:
+            if device.is_allowed:
+                self.adjust_current_devices(subscription_id, -1)
             self.db.delete(device)
             self.db.commit()
-            self._sync_device_count(subscription_id)
             return True
         except Exception as e:
             logger.error(f"删除设备失败: {e}", exc_info=True)
@@ -456,16 +453,13 @@ rules:
   }
 }"""
 
-    def get_v2ray_config(self) -> str:
-        v2ray_path = self._get_config_file_path('v2ray_file', 'xr')
-        return self._read_config_file(v2ray_path, 'v2ray_config', 'v2ray', "# V2Ray配置未设置\n# 请联系管理员配置V2Ray节点信息")
+    def _read_config_source(self, file_path: str, config_key: str, config_type: str) -> Optional[str]:
+        content = self._read_config_file(file_path, config_key, config_type, "")
+        return content if content and content.strip() else None
 
-    def get_clash_config(self) -> str:
-        clash_path = self._get_config_file_path('clash_file', 'clash.yaml')
-        config_str = self._read_config_file(clash_path, 'clash_config', 'clash', "# Clash配置未设置\n# 请联系管理员配置Clash节点信息")
+    def _compile_clash_config(self, config_str: str) -> str:
         if config_str and not config_str.startswith("#"):
             try:
-                import yaml
                 config = yaml.safe_load(config_str)
                 if config and isinstance(config, dict):
                     if 'proxy-groups' in config and isinstance(config['proxy-groups'], list):
@@ -484,6 +478,30 @@ rules:
                 logger.warning(f"清理Clash配置中的重复proxy-groups失败: {e}")
         return config_str
 
+    def get_v2ray_payload(self) -> Optional[CompiledPayload]:
+        """获取预编译的V2Ray订阅内容，未配置时返回 None"""
+        return subscription_payload_cache.get(
+            PAYLOAD_V2RAY,
+            lambda: self._read_config_source(self._get_config_file_path('v2ray_file', 'xr'), 'v2ray_config', 'v2ray'),
+            lambda source: source
+        )
+
+    def get_clash_payload(self) -> Optional[CompiledPayload]:
+        """获取预编译的Clash订阅内容，未配置时返回 None"""
+        return subscription_payload_cache.get(
+            PAYLOAD_CLASH,
+            lambda: self._read_config_source(self._get_config_file_path('clash_file', 'clash.yaml'), 'clash_config', 'clash'),
+            self._compile_clash_config
+        )
+
+    def get_v2ray_config(self) -> str:
+        payload = self.get_v2ray_payload()
+        return payload.text if payload else V2RAY_NOT_CONFIGURED_MSG
+
+    def get_clash_config(self) -> str:
+        payload = self.get_clash_payload()
+        return payload.text if payload else CLASH_NOT_CONFIGURED_MSG
+
     def send_subscription_email(self, user_id: int, request=None) -> bool:
         try:
             user = self.db.query(User).filter(User.id == user_id).first()
@@ -640,7 +658,57 @@ rules:
             and_(Subscription.expire_time.isnot(None), Subscription.expire_time <= now)
         ).scalar() or 0
 
+    def adjust_current_devices(self, subscription_id: int, delta: int):
+        """在当前事务中增减订阅的允许设备计数（不提交）"""
+        if not delta:
+            return
+        self.db.execute(text("""
+            UPDATE subscriptions
+            SET current_devices = CASE
+                WHEN COALESCE(current_devices, 0) + :delta < 0 THEN 0
+                ELSE COALESCE(current_devices, 0) + :delta
+            END
+            WHERE id = :subscription_id
+        """), {'subscription_id': subscription_id, 'delta': delta})
+
+    def reserve_device_slot(self, subscription_id: int) -> bool:
+        """未达设备上限时占用一个名额并返回 True（不提交）
+
+        计数检查与递增在同一条 UPDATE 中完成，并发的新设备不会超过上限；
+        上限直接读取表中的 device_limit，不使用可能过期的缓存对象。
+        """
+        result = self.db.execute(text("""
+            UPDATE subscriptions
+            SET current_devices = COALESCE(current_devices, 0) + 1
+            WHERE id = :subscription_id AND COALESCE(current_devices, 0) < device_limit
+        """), {'subscription_id': subscription_id})
+        return result.rowcount > 0
+
+    def reconcile_device_counts(self) -> int:
+        """按设备表重新计算所有订阅的允许设备数，返回被修正的订阅数"""
+        try:
+            result = self.db.execute(text("""
+                UPDATE subscriptions
+                SET current_devices = (
+                    SELECT COUNT(*) FROM devices d
+                    WHERE d.subscription_id = subscriptions.id AND d.is_allowed = 1
+                )
+                WHERE COALESCE(current_devices, -1) <> (
+                    SELECT COUNT(*) FROM devices d
+                    WHERE d.subscription_id = subscriptions.id AND d.is_allowed = 1
+                )
+            """))
+            self.db.commit()
+            if result.rowcount:
+                logger.warning(f"设备计数校准: 修正了 {result.rowcount} 个订阅的设备数量")
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"设备计数校准失败: {e}", exc_info=True)
+            self.db.rollback()
+            return 0
+
     def sync_current_devices(self, subscription_id: int) -> bool:
+        """按设备表重新统计单个订阅的设备数量（用于校准，日常增删改使用 adjust_current_devices）"""
         try:
             device_count_query = text("SELECT COUNT(*) FROM devices WHERE subscription_id = :subscription_id AND is_allowed = 1")
             actual_count = self.db.execute(device_count_query, {'subscription_id': subscription_id}).scalar() or 0
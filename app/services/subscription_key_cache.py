@@ -0,0 +1,168 @@
+"""订阅密钥解析缓存 - 缓存订阅密钥到订阅基本信息的映射"""
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation_bus import TOPIC_SUBSCRIPTION_KEYS, invalidation_bus
+from app.models.subscription import Subscription
+
+logger = logging.getLogger(__name__)
+
+SubscriptionKeyEntry = namedtuple(
+    'SubscriptionKeyEntry', ['id', 'user_id', 'device_limit', 'expire_time', 'is_active', 'status']
+)
+
+# 这些字段变化时需要让缓存失效（current_devices 等计数字段不影响密钥解析）
+_TRACKED_FIELDS = ('subscription_url', 'user_id', 'device_limit', 'expire_time', 'is_active', 'status')
+
+_PENDING_KEYS_INFO = 'subscription_key_cache_pending'
+
+
+class SubscriptionKeyCache:
+    """订阅密钥解析缓存
+
+    订阅拉取接口每次都要用订阅密钥查询订阅和用户，这里把结果按密钥缓存 ttl 秒。
+    不存在的密钥缓存 negative_ttl 秒，扫描随机密钥的请求不再访问数据库。
+    订阅通过 ORM 修改（重置地址、续费、管理员编辑、删除）并提交后，会自动让新旧密钥失效。
+    """
+
+    def __init__(self, ttl: int = 300, negative_ttl: int = 30, max_size: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def resolve(self, db: Session, subscription_key: str) -> Optional[SubscriptionKeyEntry]:
+        """解析订阅密钥，不存在时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(subscription_key)
+            if cached is not None and cached[0] > now:
+                self._entries.move_to_end(subscription_key)
+                if cached[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return cached[1]
+            self.misses += 1
+            version = self._version
+
+        row = db.execute(text("""
+            SELECT s.id, s.user_id, s.device_limit, s.expire_time, s.is_active, s.status
+            FROM subscriptions s
+            JOIN users u ON s.user_id = u.id
+            WHERE s.subscription_url = :subscription_url
+        """), {'subscription_url': subscription_key}).fetchone()
+        entry = SubscriptionKeyEntry(*row) if row else None
+
+        with self._lock:
+            # 查询期间发生过失效则不写入，避免缓存旧数据
+            if version == self._version:
+                ttl = self.ttl if entry is not None else self.negative_ttl
+                self._entries[subscription_key] = (time.monotonic() + ttl, entry)
+                self._entries.move_to_end(subscription_key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, subscription_key: Optional[str] = None, subscription_id: Optional[int] = None):
+        """按密钥或订阅ID失效缓存"""
+        with self._lock:
+            self._version += 1
+            if subscription_key is not None:
+                self._entries.pop(subscription_key, None)
+            if subscription_id is not None:
+                for key in [k for k, v in self._entries.items() if v[1] is not None and v[1].id == subscription_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses
+        }
+
+
+subscription_key_cache = SubscriptionKeyCache(
+    ttl=settings.SUBSCRIPTION_KEY_CACHE_TTL,
+    negative_ttl=settings.SUBSCRIPTION_KEY_NEGATIVE_TTL,
+    max_size=settings.SUBSCRIPTION_KEY_CACHE_SIZE
+)
+
+
+def get_subscription_key_cache() -> SubscriptionKeyCache:
+    return subscription_key_cache
+
+
+def _collect_subscription_refs(obj: Subscription, check_changes: bool) -> Set[tuple]:
+    state = inspect(obj)
+    if check_changes and not any(state.attrs[name].history.has_changes() for name in _TRACKED_FIELDS):
+        return set()
+    # 旧密钥在属性过期后不一定出现在 history 中，因此同时按订阅ID失效
+    refs = {('id', obj.id)} if obj.id is not None else set()
+    history = state.attrs.subscription_url.history
+    for values in (history.added, history.unchanged, history.deleted):
+        refs.update(('key', value) for value in values or () if value)
+    return refs
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_subscription_changes(session, flush_context):
+    refs = set()
+    for obj in session.new:
+        if isinstance(obj, Subscription):
+            refs |= _collect_subscription_refs(obj, check_changes=False)
+    for obj in session.dirty:
+        if isinstance(obj, Subscription):
+            refs |= _collect_subscription_refs(obj, check_changes=True)
+    for obj in session.deleted:
+        if isinstance(obj, Subscription):
+            refs |= _collect_subscription_refs(obj, check_changes=False)
+    if refs:
+        session.info.setdefault(_PENDING_KEYS_INFO, set()).update(refs)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_subscriptions(session):
+    refs = session.info.pop(_PENDING_KEYS_INFO, None)
+    if refs:
+        invalidation_bus.publish(TOPIC_SUBSCRIPTION_KEYS, {
+            "keys": [value for kind, value in refs if kind == 'key'],
+            "ids": [value for kind, value in refs if kind == 'id']
+        })
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_subscriptions(session):
+    session.info.pop(_PENDING_KEYS_INFO, None)
+
+
+def _on_subscription_keys_invalidated(payload: Optional[dict]):
+    if payload is None:
+        subscription_key_cache.clear()
+        return
+    for key in payload.get("keys", ()):
+        subscription_key_cache.invalidate(subscription_key=key)
+    for subscription_id in payload.get("ids", ()):
+        subscription_key_cache.invalidate(subscription_id=subscription_id)
+    logger.debug(f"订阅密钥缓存已失效: {payload}")
+
+
+invalidation_bus.subscribe(TOPIC_SUBSCRIPTION_KEYS, _on_subscription_keys_invalidated)
@@ -0,0 +1,173 @@
+"""订阅内容预编译缓存 - 按配置代次缓存可直接下发的订阅内容"""
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.invalidation_bus import TOPIC_SUBSCRIPTION_PAYLOAD, invalidation_bus
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_CLASH = "clash"
+PAYLOAD_V2RAY = "v2ray"
+
+# 小于该大小的内容不做预压缩
+COMPRESS_MIN_SIZE = 1024
+
+
+def _parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    encodings = {}
+    for item in (accept_encoding or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        encodings[parts[0].lower()] = quality
+    return encodings
+
+
+class CompiledPayload:
+    """已编译的订阅内容（只读）"""
+
+    def __init__(self, kind: str, generation: int, body: bytes, source_digest: str):
+        self.kind = kind
+        self.generation = generation
+        self.body = body
+        self.source_digest = source_digest
+        self.compiled_at = time.monotonic()
+        # 强 ETag 取自编译结果摘要，多进程下同一代次内容的 ETag 一致
+        self.etag = f'"{kind}-{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.variants: Dict[str, bytes] = {}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8')
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """判断条件请求的 If-None-Match 是否命中当前内容"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """根据 Accept-Encoding 选择预压缩内容，返回 (内容, 编码)"""
+        if not self.variants:
+            return self.body, None
+        accepted = _parse_accept_encoding(accept_encoding)
+        best_encoding = None
+        best_quality = 0.0
+        for encoding in ('br', 'gzip'):
+            if encoding not in self.variants:
+                continue
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if quality > best_quality:
+                best_encoding, best_quality = encoding, quality
+        if best_encoding is None:
+            return self.body, None
+        return self.variants[best_encoding], best_encoding
+
+
+class SubscriptionPayloadCache:
+    """订阅内容缓存
+
+    每次 ConfigUpdateService 发布配置时代次递增，订阅接口直接返回已编译的字节内容，
+    不再逐次请求读取数据库/文件并解析 YAML。超过 revalidate_interval 后会重新读取原始配置，
+    仅当内容摘要变化时才重新编译，用于兜底其他进程或手工修改配置文件的情况。
+    """
+
+    def __init__(self, revalidate_interval: int = 60):
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._payloads: Dict[str, CompiledPayload] = {}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def publish(self, kind: Optional[str] = None) -> int:
+        """发布新配置：代次递增并丢弃对应的已编译内容"""
+        with self._lock:
+            self._generation += 1
+            if kind:
+                self._payloads.pop(kind, None)
+            else:
+                self._payloads.clear()
+            logger.info(f"订阅内容缓存已失效: kind={kind or 'all'}, generation={self._generation}")
+            return self._generation
+
+    def get(self, kind: str, read_source: Callable[[], Optional[str]],
+            compile_source: Callable[[str], str]) -> Optional[CompiledPayload]:
+        """获取已编译内容，缺失或到期时重新读取并编译
+
+        Args:
+            kind: 内容类型（PAYLOAD_CLASH / PAYLOAD_V2RAY）
+            read_source: 读取原始配置，未配置时返回 None
+            compile_source: 将原始配置编译为最终下发的文本
+        """
+        payload = self._payloads.get(kind)
+        if payload is not None and time.monotonic() - payload.compiled_at < self.revalidate_interval:
+            return payload
+        with self._lock:
+            payload = self._payloads.get(kind)
+            if payload is not None and time.monotonic() - payload.compiled_at < self.revalidate_interval:
+                return payload
+            source = read_source()
+            if not source:
+                return None
+            source_digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+            if payload is not None and payload.source_digest == source_digest:
+                payload.compiled_at = time.monotonic()
+                return payload
+            if payload is not None:
+                self._generation += 1
+            compiled = compile_source(source)
+            payload = CompiledPayload(kind, self._generation, compiled.encode('utf-8'), source_digest)
+            self._payloads[kind] = payload
+            logger.info(f"订阅内容已编译: kind={kind}, generation={payload.generation}, size={len(payload.body)}")
+            return payload
+
+
+subscription_payload_cache = SubscriptionPayloadCache(settings.SUBSCRIPTION_PAYLOAD_REVALIDATE_SECONDS)
+
+
+def get_subscription_payload_cache() -> SubscriptionPayloadCache:
+    return subscription_payload_cache
+
+
+def publish_subscription_payload(kind: Optional[str] = None):
+    """配置内容变化后调用，通知所有 worker 丢弃对应的已编译内容"""
+    invalidation_bus.publish(TOPIC_SUBSCRIPTION_PAYLOAD, {"kind": kind})
+
+
+def _on_payload_invalidated(payload: Optional[Dict[str, str]]):
+    subscription_payload_cache.publish((payload or {}).get("kind"))
+
+
+invalidation_bus.subscribe(TOPIC_SUBSCRIPTION_PAYLOAD, _on_payload_invalidated)
@@ -0,0 +1,76 @@
+"""
+设备计数校准定时任务
+订阅的 current_devices 在设备增删、允许/禁止时增量维护，这里定期按设备表重新统计修正偏差
+"""
+import threading
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.subscription import SubscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceCountReconciler:
+    """设备计数校准调度器"""
+
+    def __init__(self, interval: int = 3600):
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """启动定时任务"""
+        if self.running:
+            logger.warning("设备计数校准任务已在运行")
+            return
+
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="DeviceCountReconciler")
+        self.thread.start()
+        logger.info(f"设备计数校准任务已启动（间隔 {self.interval} 秒）")
+
+    def stop(self):
+        """停止定时任务"""
+        self.running = False
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+            if self.thread.is_alive():
+                logger.warning("设备计数校准线程未能在5秒内停止")
+        logger.info("设备计数校准任务已停止")
+
+    def _run(self):
+        # 启动后先校准一次，修正升级前或异常退出留下的偏差
+        while self.running:
+            self.reconcile()
+            if self._stop_event.wait(timeout=self.interval):
+                break
+
+    def reconcile(self) -> int:
+        """执行一次校准，返回被修正的订阅数"""
+        db = SessionLocal()
+        try:
+            return SubscriptionService(db).reconcile_device_counts()
+        except Exception as e:
+            logger.error(f"设备计数校准执行错误: {e}", exc_info=True)
+            return 0
+        finally:
+            db.close()
+
+
+# 全局调度器实例
+device_count_reconciler = DeviceCountReconciler(settings.DEVICE_COUNT_RECONCILE_INTERVAL)
+
+
+def start_device_count_reconciler():
+    """启动设备计数校准任务"""
+    device_count_reconciler.start()
+
+
+def stop_device_count_reconciler():
+    """停止设备计数校准任务"""
+    device_count_reconciler.stop()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+缓存编码微基准
+
+用合成 Clash 配置经 NodeService 解析得到真实结构的节点列表，以及 SystemMonitor 结构的监控历史，
+对比原来的 JSON 文本与 cache_codecs 中各二进制编码（紧凑 JSON / msgpack，是否 zlib 压缩）的
+编码、解码耗时和体积，并校验解码结果一致。未安装 msgpack 时跳过 msgpack。
+
+用法:
+    SECRET_KEY=... python benchmark_cache_codecs.py --nodes 5000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.cache_codecs import CODECS_BY_NAME, BinarySerializer, LegacyTextSerializer, decode
+from app.services.node_service import NodeService
+
+REGIONS = ["香港", "美国", "日本", "新加坡", "台湾", "韩国", "英国", "德国"]
+TYPES = ["ss", "vmess", "trojan", "vless", "hysteria2"]
+
+
+def generate_nodes(count, rng):
+    lines = ["proxies:"]
+    for i in range(count):
+        lines.append(
+            f"  - {{name: '{rng.choice(REGIONS)} {i:05d} 高速', type: {rng.choice(TYPES)}, "
+            f"server: n{i}.example.com, port: {rng.randint(1000, 65000)}, password: pw{i}}}"
+        )
+    service = NodeService.__new__(NodeService)
+    return service._parse_clash_config("\n".join(lines))
+
+
+def generate_metrics(count, rng):
+    now = datetime.now()
+    history = []
+    for i in range(count):
+        history.append({
+            "timestamp": (now - timedelta(minutes=count - i)).isoformat(),
+            "cpu": {"percent": round(rng.uniform(0, 100), 1), "count": 8, "load_avg": [rng.random() * 4 for _ in range(3)]},
+            "memory": {"percent": round(rng.uniform(20, 90), 1), "used": rng.randint(1, 16) << 30,
+                       "total": 16 << 30, "available": rng.randint(1, 16) << 30},
+            "disk": {"percent": rng.uniform(10, 90), "used": rng.randint(1, 500) << 30,
+                     "total": 500 << 30, "free": rng.randint(1, 500) << 30},
+            "network": {"bytes_sent": rng.getrandbits(40), "bytes_recv": rng.getrandbits(40),
+                        "packets_sent": rng.getrandbits(30), "packets_recv": rng.getrandbits(30)},
+            "process": {"memory": rng.getrandbits(30), "cpu_percent": rng.uniform(0, 50), "pid": 1234}
+        })
+    return history
+
+
+def timed(func, arg, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缓存编码微基准")
+    parser.add_argument("--nodes", type=int, default=5000, help="合成节点数量")
+    parser.add_argument("--metrics", type=int, default=100, help="监控历史条数")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数（取最快一次）")
+    parser.add_argument("--threshold", type=int, default=1024, help="压缩阈值（字节）")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = [
+        (f"节点列表({args.nodes})", generate_nodes(args.nodes, rng)),
+        (f"监控历史({args.metrics})", generate_metrics(args.metrics, rng)),
+    ]
+    serializers = [("JSON 文本（原实现）", LegacyTextSerializer())]
+    for name, codec in CODECS_BY_NAME.items():
+        serializers.append((f"{name}", BinarySerializer(codec, compress_threshold=0)))
+        serializers.append((f"{name} + zlib", BinarySerializer(codec, compress_threshold=args.threshold)))
+
+    for label, value in payloads:
+        print(f"\n{label}")
+        baseline = None
+        for name, serializer in serializers:
+            encode_time, raw = timed(serializer.encode, value, args.repeat)
+            decode_time, decoded = timed(decode, raw, args.repeat)
+            # JSON 往返会把元组变成列表，按 JSON 规范化后比较
+            same = json.loads(json.dumps(decoded)) == json.loads(json.dumps(value))
+            if baseline is None:
+                baseline = (len(raw), encode_time + decode_time)
+            print(f"  {name:<20} 体积 {len(raw) / 1024:9.1f} KB ({len(raw) / baseline[0]:5.0%})   "
+                  f"编码 {encode_time * 1000:7.2f} ms   解码 {decode_time * 1000:7.2f} ms   "
+                  f"往返 {(encode_time + decode_time) / baseline[1]:5.0%}   一致: {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
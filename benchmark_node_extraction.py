@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+节点链接提取微基准
+
+生成数 MB 的合成节点源（明文和 Base64 两种），对比原来逐协议多次正则扫描 + 解码判断 Base64
+与单次扫描提取器的耗时，并校验两者结果一致（原实现会把 vmess:// / vless:// 链接后半段重复识别为 ss://，
+对比时去掉这部分）。
+
+用法:
+    python benchmark_node_extraction.py --links 50000 --repeat 5
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.node_link_extractor import NODE_LINK_PATTERNS, extract_node_links, is_base64_text
+
+
+def legacy_extract(content):
+    links = []
+    for _, pattern in NODE_LINK_PATTERNS:
+        links.extend(re.findall(pattern, content))
+    return links
+
+
+def legacy_is_base64(text):
+    try:
+        clean_text = ''.join(text.split())
+        if len(clean_text) % 4 != 0:
+            return False
+        base64.b64decode(clean_text)
+        return True
+    except Exception:
+        try:
+            base64.b64decode(text)
+            return True
+        except Exception:
+            return False
+
+
+def generate_source(count, rng):
+    lines = []
+    for i in range(count):
+        kind = i % 6
+        host = f"n{i}.example.com"
+        port = rng.randint(1000, 65000)
+        if kind == 0:
+            data = {"v": "2", "ps": f"香港-{i}", "add": host, "port": str(port), "id": f"{rng.getrandbits(128):032x}", "aid": "0", "net": "ws"}
+            lines.append("vmess://" + base64.b64encode(json.dumps(data, ensure_ascii=False).encode()).decode())
+        elif kind == 1:
+            lines.append(f"ss://{base64.b64encode(f'aes-256-gcm:pw{i}'.encode()).decode()}@{host}:{port}#%E6%97%A5%E6%9C%AC-{i}")
+        elif kind == 2:
+            lines.append(f"trojan://pw{i}@{host}:{port}?sni={host}#US-{i}")
+        elif kind == 3:
+            lines.append(f"vless://{rng.getrandbits(128):032x}@{host}:{port}?security=tls#SG-{i}")
+        elif kind == 4:
+            lines.append(f"hysteria2://pw{i}@{host}:{port}?sni={host}#JP-{i}")
+        else:
+            lines.append(f"ssr://{base64.urlsafe_b64encode(f'{host}:{port}:origin:aes-256-cfb:plain:cHc'.encode()).decode().rstrip('=')}")
+    return "\n".join(lines)
+
+
+def timed(func, arg, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="节点链接提取微基准")
+    parser.add_argument("--links", type=int, default=50000, help="合成节点链接数量")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数（取最快一次）")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    args = parser.parse_args()
+
+    plain = generate_source(args.links, random.Random(args.seed))
+    encoded = base64.b64encode(plain.encode("utf-8")).decode("ascii")
+    print(f"合成节点源: {args.links} 个链接，明文 {len(plain) / 1024 / 1024:.1f} MB，Base64 {len(encoded) / 1024 / 1024:.1f} MB")
+
+    legacy_time, legacy_links = timed(legacy_extract, plain, args.repeat)
+    new_time, new_links = timed(extract_node_links, plain, args.repeat)
+    # 原实现会把 vmess:// 和 vless:// 链接的后半段重复识别为 ss:// 链接
+    bogus_ss = {"ss://" + link.split("://", 1)[1] for link in legacy_links if link.startswith(("vmess://", "vless://"))}
+    expected = [link for link in legacy_links if link not in bogus_ss]
+    print(f"提取链接  原实现: {legacy_time * 1000:8.1f} ms ({len(legacy_links)} 条)   "
+          f"单次扫描: {new_time * 1000:8.1f} ms ({len(new_links)} 条)   加速 {legacy_time / new_time:.1f}x")
+    print(f"结果一致（去除原实现误识别的 {len(legacy_links) - len(expected)} 条 ss:// 链接）: {expected == new_links}")
+
+    for label, text in (("Base64", encoded), ("明文", plain)):
+        legacy_b64_time, legacy_b64 = timed(legacy_is_base64, text, args.repeat)
+        new_b64_time, new_b64 = timed(is_base64_text, text, args.repeat)
+        print(f"Base64判断({label})  原实现: {legacy_b64_time * 1000:8.1f} ms -> {legacy_b64}   "
+              f"新实现: {new_b64_time * 1000:8.1f} ms -> {new_b64}   加速 {legacy_b64_time / max(new_b64_time, 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
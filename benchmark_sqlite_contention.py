@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+SQLite 锁竞争基准
+
+在临时数据库上同时运行写线程（读一行再更新并提交，模拟请求中的写事务）和读线程（统计、分页查询），
+分别使用原来的单连接池配置和 SQLite 性能配置（WAL + 只读连接池 + 写事务串行化），
+对比吞吐、延迟分位数、"database is locked" 错误数和写锁等待情况。
+
+用法:
+    SECRET_KEY=... python benchmark_sqlite_contention.py --writers 8 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import create_sqlite_engines
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def prepare(url, rows):
+    engine, _, _ = create_sqlite_engines(url, profile=False)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, owner INTEGER, balance INTEGER, note TEXT)"))
+        connection.execute(text("CREATE INDEX ix_items_owner ON items (owner)"))
+        connection.execute(
+            text("INSERT INTO items (owner, balance, note) VALUES (:owner, :balance, :note)"),
+            [{"owner": i % 100, "balance": 0, "note": "x" * 64} for i in range(rows)]
+        )
+    engine.dispose()
+
+
+def run(url, profile, writers, readers, seconds, rows):
+    engine, reader_engine, serializer = create_sqlite_engines(url, profile=profile, reader_pool_size=readers)
+    Session = sessionmaker(bind=engine)
+    ReadSession = sessionmaker(bind=reader_engine)
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"write": [], "read": [], "errors": 0}
+
+    def writer(index):
+        n = index
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = Session()
+            try:
+                item_id = n % rows + 1
+                balance = db.execute(text("SELECT balance FROM items WHERE id = :id"), {"id": item_id}).scalar()
+                db.execute(text("UPDATE items SET balance = :balance WHERE id = :id"), {"balance": balance + 1, "id": item_id})
+                db.commit()
+                with lock:
+                    results["write"].append(time.perf_counter() - started)
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    results["errors"] += 1
+            finally:
+                db.close()
+            n += writers
+
+    def reader(index):
+        n = index
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = ReadSession()
+            try:
+                db.execute(text("SELECT owner, COUNT(*), SUM(balance) FROM items GROUP BY owner")).fetchall()
+                db.execute(text("SELECT * FROM items WHERE owner = :owner ORDER BY id LIMIT 20"), {"owner": n % 100}).fetchall()
+                with lock:
+                    results["read"].append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    results["errors"] += 1
+            finally:
+                db.close()
+            n += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    reader_engine.dispose()
+    return results, serializer.get_stats() if serializer else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 锁竞争基准")
+    parser.add_argument("--writers", type=int, default=8, help="写线程数")
+    parser.add_argument("--readers", type=int, default=8, help="读线程数")
+    parser.add_argument("--seconds", type=float, default=5, help="每种配置运行秒数")
+    parser.add_argument("--rows", type=int, default=20000, help="表行数")
+    args = parser.parse_args()
+
+    for label, profile in (("原配置", False), ("性能配置", True)):
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            prepare(url, args.rows)
+            results, serializer_stats = run(url, profile, args.writers, args.readers, args.seconds, args.rows)
+        print(f"\n{label}")
+        for kind in ("write", "read"):
+            latencies = results[kind]
+            print(f"  {kind:<5} {len(latencies) / args.seconds:8.0f} 次/秒   "
+                  f"p50 {percentile(latencies, 50) * 1000:7.1f} ms   p99 {percentile(latencies, 99) * 1000:7.1f} ms   "
+                  f"max {max(latencies, default=0) * 1000:7.1f} ms")
+        print(f"  database is locked 等错误: {results['errors']}")
+        if serializer_stats:
+            print(f"  写锁: {serializer_stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
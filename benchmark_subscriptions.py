@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+订阅拉取压测脚本
+
+生成带种子的 SQLite 测试库（用户、订阅、设备、访问日志、Clash/V2Ray 配置），
+在进程内用 ASGI 直接回放多种客户端 UA 对 /subscriptions/clash/{key} 和
+/subscriptions/ssr/{key} 的请求，输出 p50/p95/p99 延迟、吞吐量和每请求 SQL 语句数。
+不需要网络，同样的参数和种子可重复得到相同的数据集与请求序列。
+
+用法:
+    python benchmark_subscriptions.py --users 2000 --requests 5000 --concurrency 32
+    python benchmark_subscriptions.py --reuse --requests 5000     # 复用已生成的数据库
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 客户端 UA 及权重（浏览器和扫描器用于覆盖非客户端路径）
+CLIENT_PROFILES = [
+    ("ClashForWindows/0.20.39", "clash", 18),
+    ("clash-verge/v1.3.8", "clash", 12),
+    ("Clash.Meta/1.16.0 mihomo", "clash", 10),
+    ("Stash/2.4.7 Clash/1.9.0", "clash", 6),
+    ("ClashX Pro/1.118.0", "clash", 5),
+    ("Shadowrocket/2070 CFNetwork/1410.0.3 Darwin/22.6.0", "ssr", 12),
+    ("v2rayN/6.23", "ssr", 12),
+    ("v2rayNG/1.8.5", "ssr", 8),
+    ("Quantumult%20X/1.4.1 CFNetwork/1410.0.3 Darwin/22.6.0", "ssr", 5),
+    ("sing-box 1.7.0", "ssr", 4),
+    ("HiddifyNext/0.13.6 (android)", "clash", 3),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36", "ssr", 3),
+]
+
+# 后台写入线程执行的 SQL 单独统计，不计入请求路径
+BACKGROUND_THREADS = ("AccessLogWriter", "DeviceActivityBuffer", "DeviceCountReconciler")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="订阅拉取压测")
+    parser.add_argument("--db", default="./benchmark.db", help="SQLite 数据库路径")
+    parser.add_argument("--reuse", action="store_true", help="复用已有数据库，不重新生成数据")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--users", type=int, default=1000, help="用户/订阅数量")
+    parser.add_argument("--devices-per-sub", type=int, default=3, help="每个订阅预置的设备数")
+    parser.add_argument("--device-limit", type=int, default=5, help="订阅设备上限")
+    parser.add_argument("--logs", type=int, default=50000, help="预置访问日志行数")
+    parser.add_argument("--nodes", type=int, default=300, help="生成配置中的节点数")
+    parser.add_argument("--requests", type=int, default=3000, help="计时请求数")
+    parser.add_argument("--warmup", type=int, default=200, help="预热请求数（不计入统计）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--new-device-ratio", type=float, default=0.05, help="新设备请求比例")
+    parser.add_argument("--unknown-key-ratio", type=float, default=0.05, help="不存在订阅密钥的请求比例")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """必须在导入 app 之前设置数据库地址"""
+    db_path = os.path.abspath(args.db)
+    if not args.reuse and os.path.exists(db_path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+    os.environ.setdefault("DEBUG", "false")
+    return db_path
+
+
+def generate_nodes(rng, count):
+    regions = ["香港", "台湾", "日本", "新加坡", "美国", "韩国", "英国", "德国"]
+    nodes = []
+    for i in range(count):
+        region = regions[i % len(regions)]
+        server = f"{region_code(i)}{i}.node.example.com"
+        port = rng.randint(10000, 60000)
+        kind = ("vmess", "ss", "trojan")[i % 3]
+        name = f"{region}-{kind.upper()}-{i:03d}"
+        nodes.append({"name": name, "type": kind, "server": server, "port": port, "uuid": str(uuid.UUID(int=rng.getrandbits(128)))})
+    return nodes
+
+
+def region_code(i):
+    return ("hk", "tw", "jp", "sg", "us", "kr", "uk", "de")[i % 8]
+
+
+def build_clash_config(nodes):
+    import yaml
+    proxies = []
+    for node in nodes:
+        if node["type"] == "vmess":
+            proxies.append({"name": node["name"], "type": "vmess", "server": node["server"], "port": node["port"],
+                            "uuid": node["uuid"], "alterId": 0, "cipher": "auto", "tls": True, "network": "ws",
+                            "ws-opts": {"path": "/ws", "headers": {"Host": node["server"]}}})
+        elif node["type"] == "ss":
+            proxies.append({"name": node["name"], "type": "ss", "server": node["server"], "port": node["port"],
+                            "cipher": "aes-256-gcm", "password": node["uuid"]})
+        else:
+            proxies.append({"name": node["name"], "type": "trojan", "server": node["server"], "port": node["port"],
+                            "password": node["uuid"], "sni": node["server"], "skip-cert-verify": False})
+    names = [p["name"] for p in proxies]
+    config = {
+        "port": 7890,
+        "socks-port": 7891,
+        "allow-lan": False,
+        "mode": "rule",
+        "log-level": "info",
+        "proxies": proxies,
+        "proxy-groups": [
+            {"name": "节点选择", "type": "select", "proxies": ["自动选择"] + names},
+            {"name": "自动选择", "type": "url-test", "url": "http://www.gstatic.com/generate_204", "interval": 300, "proxies": names},
+        ],
+        "rules": [f"DOMAIN-SUFFIX,site{i}.example.com,节点选择" for i in range(500)] + ["MATCH,节点选择"],
+    }
+    return yaml.dump(config, allow_unicode=True, default_flow_style=False, sort_keys=False)
+
+
+def build_v2ray_config(nodes):
+    links = []
+    for node in nodes:
+        if node["type"] == "vmess":
+            vmess = {"v": "2", "ps": node["name"], "add": node["server"], "port": str(node["port"]), "id": node["uuid"],
+                     "aid": "0", "net": "ws", "type": "none", "host": node["server"], "path": "/ws", "tls": "tls"}
+            links.append("vmess://" + base64.b64encode(json.dumps(vmess, ensure_ascii=False).encode("utf-8")).decode("ascii"))
+        elif node["type"] == "ss":
+            userinfo = base64.b64encode(f"aes-256-gcm:{node['uuid']}".encode()).decode("ascii")
+            links.append(f"ss://{userinfo}@{node['server']}:{node['port']}#{node['name']}")
+        else:
+            links.append(f"trojan://{node['uuid']}@{node['server']}:{node['port']}?sni={node['server']}#{node['name']}")
+    return base64.b64encode("\n".join(links).encode("utf-8")).decode("utf-8")
+
+
+def client_ip(sub_index, device_index):
+    return f"10.{(sub_index >> 8) & 255}.{sub_index & 255}.{device_index + 1}"
+
+
+def create_schema(engine):
+    from sqlalchemy import text
+    from app.core.database import Base
+    import app.models  # noqa: F401 注册全部模型
+
+    for table in Base.metadata.sorted_tables:
+        try:
+            table.create(bind=engine, checkfirst=True)
+        except Exception as e:
+            print(f"⚠️  创建表 {table.name} 时出错（继续）: {e.__class__.__name__}")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS subscription_access_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subscription_id INTEGER, device_id INTEGER, ip_address VARCHAR(45), user_agent TEXT,
+                access_type VARCHAR(50), response_status INTEGER, response_message TEXT, access_time DATETIME
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_sal_subscription ON subscription_access_logs (subscription_id, access_time)"))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS software_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                software_name VARCHAR(100), software_category VARCHAR(50), user_agent_pattern VARCHAR(255),
+                os_pattern VARCHAR(255), device_pattern VARCHAR(255), version_pattern VARCHAR(255), is_active BOOLEAN DEFAULT 1
+            )
+        """))
+
+
+def seed_database(args, rng):
+    from sqlalchemy import text
+    from app.core.database import SessionLocal, engine
+    from app.services.device_manager import DeviceManager
+
+    print(f"生成数据: {args.users} 个订阅, 每订阅 {args.devices_per_sub} 台设备, {args.logs} 条访问日志, {args.nodes} 个节点")
+    started = time.perf_counter()
+    create_schema(engine)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        device_manager = DeviceManager(db)
+        users, subscriptions, devices = [], [], []
+        for i in range(args.users):
+            user_id = i + 1
+            users.append({"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com",
+                          "hashed_password": "!", "is_active": True, "is_verified": True, "is_admin": False,
+                          "balance": 0, "created_at": now})
+            device_count = min(args.devices_per_sub, args.device_limit)
+            subscriptions.append({"id": user_id, "user_id": user_id, "subscription_url": f"bench{user_id:06d}{rng.getrandbits(32):08x}",
+                                  "device_limit": args.device_limit, "current_devices": device_count, "is_active": True,
+                                  "status": "active", "expire_time": now + timedelta(days=rng.randint(1, 365)), "created_at": now})
+            for d in range(device_count):
+                ua, _, _ = CLIENT_PROFILES[(i + d) % (len(CLIENT_PROFILES) - 1)]
+                ip = client_ip(i, d)
+                info = device_manager.parse_user_agent(ua)
+                devices.append({"user_id": user_id, "subscription_id": user_id,
+                                "device_hash": device_manager.generate_device_hash(ua, ip, None),
+                                "device_fingerprint": device_manager.generate_device_hash(ua, ip, None),
+                                "device_ua": f"{ua}|{ip}", "device_name": info.get("device_name", "Unknown Device"),
+                                "device_type": info.get("device_type", "unknown"), "ip_address": ip, "user_agent": ua,
+                                "software_name": info.get("software_name", "Unknown"), "os_name": info.get("os_name", "Unknown"),
+                                "is_allowed": True, "is_active": True, "first_seen": now, "last_seen": now,
+                                "last_access": now, "access_count": rng.randint(1, 500)})
+
+        from app.models.user import User
+        from app.models.subscription import Subscription, Device
+        db.execute(User.__table__.insert(), users)
+        db.execute(Subscription.__table__.insert(), subscriptions)
+        db.execute(Device.__table__.insert(), devices)
+
+        log_rows = []
+        for _ in range(args.logs):
+            sub_index = rng.randrange(args.users)
+            log_rows.append({"subscription_id": sub_index + 1, "device_id": None, "ip_address": client_ip(sub_index, 0),
+                             "user_agent": CLIENT_PROFILES[rng.randrange(len(CLIENT_PROFILES))][0],
+                             "access_type": rng.choice(["clash_allowed", "ssr_allowed", "browser_access"]),
+                             "response_status": 200, "response_message": "访问成功",
+                             "access_time": (now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))).strftime("%Y-%m-%d %H:%M:%S")})
+        if log_rows:
+            db.execute(text("""
+                INSERT INTO subscription_access_logs (subscription_id, device_id, ip_address, user_agent,
+                    access_type, response_status, response_message, access_time)
+                VALUES (:subscription_id, :device_id, :ip_address, :user_agent,
+                    :access_type, :response_status, :response_message, :access_time)
+            """), log_rows)
+
+        nodes = generate_nodes(rng, args.nodes)
+        from app.models.config import SystemConfig
+        db.execute(SystemConfig.__table__.insert(), [
+            {"key": "clash_config", "value": build_clash_config(nodes), "type": "clash", "category": "proxy",
+             "display_name": "Clash配置", "is_public": False, "sort_order": 0, "created_at": now},
+            {"key": "v2ray_config", "value": build_v2ray_config(nodes), "type": "v2ray", "category": "proxy",
+             "display_name": "V2Ray配置", "is_public": False, "sort_order": 0, "created_at": now},
+        ])
+        db.commit()
+    finally:
+        db.close()
+    print(f"✅ 数据生成完成，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+def build_request_plan(args, rng, keys, total):
+    """生成请求序列：(路径, UA)"""
+    weights = [w for _, _, w in CLIENT_PROFILES]
+    plan = []
+    for _ in range(total):
+        ua, kind, _ = rng.choices(CLIENT_PROFILES, weights=weights)[0]
+        roll = rng.random()
+        if roll < args.unknown_key_ratio:
+            key = uuid.UUID(int=rng.getrandbits(128)).hex
+            sub_index, device_index = 0, 0
+        else:
+            sub_index = rng.randrange(len(keys))
+            key = keys[sub_index]
+            if roll < args.unknown_key_ratio + args.new_device_ratio:
+                device_index = rng.randint(args.devices_per_sub, 250)
+            else:
+                device_index = rng.randrange(max(args.devices_per_sub, 1))
+                ua = CLIENT_PROFILES[(sub_index + device_index) % (len(CLIENT_PROFILES) - 1)][0]
+                kind = CLIENT_PROFILES[(sub_index + device_index) % (len(CLIENT_PROFILES) - 1)][1]
+        plan.append((f"/api/v1/subscriptions/{kind}/{key}", ua, client_ip(sub_index, device_index)))
+    return plan
+
+
+class StatementCounter:
+    """按线程统计 SQL 语句数"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.lock = threading.Lock()
+        self.request_statements = 0
+        self.background_statements = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        background = threading.current_thread().name.startswith(BACKGROUND_THREADS)
+        with self.lock:
+            if background:
+                self.background_statements += 1
+            else:
+                self.request_statements += 1
+
+    def reset(self):
+        with self.lock:
+            self.request_statements = 0
+            self.background_statements = 0
+
+
+def build_app():
+    """只挂载订阅路由，避免启动邮件、通知等后台任务"""
+    from fastapi import FastAPI
+    from app.api.api_v1.endpoints import subscriptions
+
+    app = FastAPI()
+    app.include_router(subscriptions.router, prefix="/api/v1/subscriptions")
+    return app
+
+
+def with_client_ip(app):
+    """按请求头设置 ASGI scope 中的客户端地址，使设备识别与预置设备一致"""
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope.get("headers", []):
+                if name == b"x-benchmark-client-ip":
+                    scope = dict(scope, client=(value.decode("ascii"), 50000))
+                    break
+        await app(scope, receive, send)
+    return wrapped
+
+
+async def replay(app, plan, concurrency):
+    import httpx
+
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=with_client_ip(app))
+
+    async def send(client, path, ua, ip):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers={"User-Agent": ua, "X-Benchmark-Client-IP": ip, "Accept-Encoding": "gzip"})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await asyncio.gather(*(send(client, path, ua, ip) for path, ua, ip in plan))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    db_path = configure_environment(args)
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    from sqlalchemy import text
+    from app.core.database import SessionLocal, engine
+
+    if not args.reuse:
+        seed_database(args, rng)
+    else:
+        print(f"复用数据库: {db_path}")
+
+    db = SessionLocal()
+    try:
+        keys = [row[0] for row in db.execute(text("SELECT subscription_url FROM subscriptions ORDER BY id")).fetchall()]
+    finally:
+        db.close()
+    if not keys:
+        print("❌ 数据库中没有订阅，请去掉 --reuse 重新生成数据")
+        return 1
+
+    app = build_app()
+    counter = StatementCounter(engine)
+    plan = build_request_plan(args, random.Random(args.seed + 1), keys, args.warmup + args.requests)
+
+    if args.warmup:
+        asyncio.run(replay(app, plan[:args.warmup], args.concurrency))
+    counter.reset()
+    latencies, statuses, elapsed = asyncio.run(replay(app, plan[args.warmup:], args.concurrency))
+
+    # 写完后台缓冲区，统计摊销到每个请求的后台 SQL
+    try:
+        from app.services.access_log_writer import get_access_log_writer
+        from app.services.device_activity_buffer import get_device_activity_buffer
+        get_device_activity_buffer().stop()
+        get_access_log_writer().stop()
+    except ImportError:
+        pass
+
+    latencies.sort()
+    count = len(latencies)
+    result = {
+        "requests": count,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0,
+        },
+        "sql_per_request": round(counter.request_statements / count, 2) if count else 0,
+        "background_sql_per_request": round(counter.background_statements / count, 2) if count else 0,
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+    print("\n===== 订阅拉取压测结果 =====")
+    print(f"请求数: {count}  并发: {args.concurrency}  用时: {result['elapsed_seconds']} 秒")
+    print(f"吞吐量: {result['throughput_rps']} 请求/秒")
+    print(f"延迟(ms): p50={result['latency_ms']['p50']}  p95={result['latency_ms']['p95']}  "
+          f"p99={result['latency_ms']['p99']}  max={result['latency_ms']['max']}")
+    print(f"每请求 SQL 语句数: {result['sql_per_request']}（后台批量写入摊销: {result['background_sql_per_request']}）")
+    print(f"状态码分布: {result['status_codes']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -184,6 +184,48 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"用户清理调度器启动失败（不影响应用运行）: {e}", exc_info=True)
 
+    try:
+        from app.tasks.device_count_tasks import start_device_count_reconciler
+        start_device_count_reconciler()
+    except Exception as e:
+        logger.warning(f"设备计数校准任务启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.services.access_log_writer import get_access_log_writer
+        get_access_log_writer().start()
+    except Exception as e:
+        logger.warning(f"访问日志写入器启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.services.device_activity_buffer import get_device_activity_buffer
+        get_device_activity_buffer().start()
+    except Exception as e:
+        logger.warning(f"设备活跃信息写入器启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.core.database import get_engine_supervisor
+        get_engine_supervisor().start()
+    except Exception as e:
+        logger.warning(f"数据库引擎守护启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.core.invalidation_bus import get_invalidation_bus
+        get_invalidation_bus().start()
+    except Exception as e:
+        logger.warning(f"缓存失效通知启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.services.config_update_log_store import get_config_update_log_store
+        get_config_update_log_store().start()
+    except Exception as e:
+        logger.warning(f"配置更新日志写入器启动失败（不影响应用运行）: {e}", exc_info=True)
+
+    try:
+        from app.services.node_prober import get_node_latency_prober
+        get_node_latency_prober().start()
+    except Exception as e:
+        logger.warning(f"节点延迟探测启动失败（不影响应用运行）: {e}", exc_info=True)
+
     async def periodic_memory_cleanup():
         """定期清理内存"""
         while True:
@@ -207,13 +249,19 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭时停止邮件队列处理器"""
     try:
-        email_processor = get_email_queue_processor()
-        email_processor.stop_processing()
-        logger.info("邮件队列处理器已停止")
+        try:
+            email_processor = get_email_queue_processor()
+            email_processor.stop_processing()
+            logger.info("邮件队列处理器已停止")
+        except Exception as e:
+            logger.warning(f"停止邮件队列处理器失败: {e}")
         
         # 停止通知调度器
-        stop_notification_scheduler()
-        logger.info("通知调度器已停止")
+        try:
+            stop_notification_scheduler()
+            logger.info("通知调度器已停止")
+        except Exception as e:
+            logger.warning(f"停止通知调度器失败: {e}")
         
         # 停止用户清理调度器
         try:
@@ -222,6 +270,51 @@ async def shutdown_event():
             logger.info("用户清理调度器已停止")
         except Exception as e:
             logger.warning(f"停止用户清理调度器失败: {e}")
+
+        try:
+            from app.tasks.device_count_tasks import stop_device_count_reconciler
+            stop_device_count_reconciler()
+        except Exception as e:
+            logger.warning(f"停止设备计数校准任务失败: {e}")
+
+        # 写入尚未落库的设备活跃信息
+        try:
+            from app.services.device_activity_buffer import get_device_activity_buffer
+            get_device_activity_buffer().stop()
+        except Exception as e:
+            logger.warning(f"停止设备活跃信息写入器失败: {e}")
+
+        # 写完缓冲区中的访问日志
+        try:
+            from app.services.access_log_writer import get_access_log_writer
+            get_access_log_writer().stop()
+        except Exception as e:
+            logger.warning(f"停止访问日志写入器失败: {e}")
+
+        try:
+            from app.core.database import get_engine_supervisor
+            get_engine_supervisor().stop()
+        except Exception as e:
+            logger.warning(f"停止数据库引擎守护失败: {e}")
+
+        try:
+            from app.core.invalidation_bus import get_invalidation_bus
+            get_invalidation_bus().stop()
+        except Exception as e:
+            logger.warning(f"停止缓存失效通知失败: {e}")
+
+        # 写完缓冲区中的配置更新日志
+        try:
+            from app.services.config_update_log_store import get_config_update_log_store
+            get_config_update_log_store().stop()
+        except Exception as e:
+            logger.warning(f"停止配置更新日志写入器失败: {e}")
+
+        try:
+            from app.services.node_prober import get_node_latency_prober
+            get_node_latency_prober().stop()
+        except Exception as e:
+            logger.warning(f"停止节点延迟探测失败: {e}")
     except Exception as e:
         logger.error(f"停止服务失败: {e}", exc_info=True)
 
@@ -255,7 +348,22 @@ async def health_check():
             db.close()
         except Exception as e:
             db_health = {"status": "error", "message": f"数据库连接失败: {str(e)}"}
+        try:
+            from app.core.database import get_engine_supervisor
+            db_health["supervisor"] = get_engine_supervisor().get_state()
+        except Exception as e:
+            logger.warning(f"获取数据库守护状态失败: {e}")
         
+        cache_stats = {}
+        redis_health = {}
+        try:
+            from app.core.cache import redis_cache
+            from app.core.layered_cache import get_cache_stats
+            cache_stats = get_cache_stats()
+            redis_health = redis_cache.get_state()
+        except Exception as e:
+            logger.warning(f"获取缓存统计失败: {e}")
+
         # 确定整体状态
         overall_status = "healthy"
         if db_health["status"] != "healthy":
@@ -268,6 +376,8 @@ async def health_check():
             "timestamp": datetime.now().isoformat(),
             "system": system_health,
             "database": db_health,
+            "cache": cache_stats,
+            "redis": redis_health,
             "version": settings.VERSION
         }
     except Exception as e: